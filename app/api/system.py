@@ -107,6 +107,12 @@ def get_system_health(current_user=Depends(deps.get_current_user)):
         "os": f"{platform.system()} {platform.release()}"
     }
 
+@router.get("/cache/conditioning")
+def get_conditioning_cache_stats(current_user=Depends(deps.get_current_user)):
+    """v5.1: Hit/miss counters and disk usage of the conditioned-footage cache."""
+    from app.services.ingest_service import ingest_manager
+    return ingest_manager.cache.stats()
+
 @router.get("/stats")
 def get_dashboard_stats(db: Session = Depends(deps.get_db), current_user=Depends(deps.get_current_user)):
     from app.models.models import Video, VehicleDetection, VideoStatus, RecheckStatus
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, UploadFile, File, BackgroundTasks, HTTPException, Query
+from fastapi import APIRouter, Depends, UploadFile, File, Form, BackgroundTasks, HTTPException, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -23,6 +23,7 @@ from app.worker import process_video_task
 async def upload_video(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    camera_id: Optional[str] = Form(None),
     db: Session = Depends(get_db),
     current_user = Depends(deps.get_current_user)
 ):
@@ -31,7 +32,7 @@ async def upload_video(
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
     
-    db_video = Video(filename=file.filename, filepath=file_path, owner_id=current_user.id)
+    db_video = Video(filename=file.filename, filepath=file_path, owner_id=current_user.id, camera_id=camera_id)
     db.add(db_video)
     db.commit()
     db.refresh(db_video)
@@ -48,6 +49,35 @@ async def upload_video(
     
     return db_video
 
+@router.post("/live", response_model=schemas.Video)
+def start_live_stream(
+    stream: schemas.LiveStreamCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(deps.get_current_user)
+):
+    """v5.1: Registers a camera stream as a Video row and analyses it until stopped."""
+    db_video = Video(filename=stream.name or stream.url, filepath=stream.url, owner_id=current_user.id,
+                     camera_id=stream.camera_id)
+    db.add(db_video)
+    db.commit()
+    db.refresh(db_video)
+
+    video_service.start_stream(db_video.id)
+    return db_video
+
+@router.post("/live/{video_id}/stop")
+def stop_live_stream(
+    video_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(deps.get_current_user)
+):
+    video = db.query(Video).filter(Video.id == video_id, Video.owner_id == current_user.id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if not video_service.stop_stream(video_id):
+        raise HTTPException(status_code=404, detail="Stream not running")
+    return {"message": "Stream stopping; pending tracks are being flushed"}
+
 @router.get("/", response_model=List[schemas.Video])
 def list_videos(
     skip: int = 0,
@@ -82,6 +112,10 @@ def stream_video(
         raise HTTPException(status_code=404, detail="Video not found")
     
     path = video.filepath if original else video.output_path
+    if not original and (not path or not os.path.exists(path)) and video.status == VideoStatus.COMPLETED:
+        # v5.1: Annotated clip is rendered from stored track boxes on first request
+        from app.services.render_service import render_manager
+        path = render_manager.render_annotated(video, db)
     if not path or not os.path.exists(path):
         raise HTTPException(status_code=404, detail="File not found")
         
@@ -108,11 +142,16 @@ def delete_video(
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    # Delete files
-    if os.path.exists(video.filepath):
+    video_service.stop_stream(video.id)
+
+    # Delete files (virtual chunks only reference the parent's file)
+    if video.range_end_frame is None and os.path.exists(video.filepath):
         os.remove(video.filepath)
     if video.output_path and os.path.exists(video.output_path):
         os.remove(video.output_path)
+    from app.services.render_service import render_manager
+    if os.path.exists(render_manager.tracks_path(video.id)):
+        os.remove(render_manager.tracks_path(video.id))
         
     db.delete(video)
     db.commit()
@@ -126,7 +165,7 @@ def get_video_report(
     current_user = Depends(deps.get_current_user)
 ):
     video = db.query(Video).filter(Video.id == video_id, Video.owner_id == current_user.id).first()
-    if not video or not video.output_path:
+    if not video or video.status != VideoStatus.COMPLETED:
         raise HTTPException(status_code=404, detail="Report not generated")
         
     json_path = os.path.join(settings.STORAGE_PATH, "results", f"results_{video.id}_{video.filename}.json")
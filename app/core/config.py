@@ -4,6 +4,11 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./vehicle_detect.db"
     YOLO_MODEL_PATH: str = "weights/yolov8n.pt"
     PLATE_MODEL_PATH: str = "weights/license_plate_detector.pt"
+    INFERENCE_BACKEND: str = "torch" # v5.1: torch | onnx (ONNX Runtime on CPU, export cached next to the .pt) | int8
+    ONNX_THREADS: int = 0 # ONNX Runtime intra-op threads. 0 = physical cores
+    QUANT_CALIBRATION_FRAMES: int = 200 # Frames sampled from stored videos for INT8 calibration
+    QUANT_MAX_MAP_DRIFT: float = 0.02 # INT8 is only loaded if bench_quantization.py stayed within these
+    QUANT_MAX_PLATE_RECALL_DRIFT: float = 0.02
     STORAGE_PATH: str = "storage"
     FRAME_SAMPLING_RATE: float = 0.5
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -17,6 +22,12 @@ class Settings(BaseSettings):
     GEMINI_API_KEY: str = "" # Set in .env
     RECHECK_CONFIDENCE_THRESHOLD: float = 0.85
     ENABLE_GLOBAL_RECHECK: bool = True
+    ENABLE_PLATE_CONSENSUS: bool = True # v5.1: Tracks with a confident multi-frame fused plate skip the cloud
+    CONSENSUS_MIN_READS: int = 2 # Distinct local reads a fused plate needs
+    CONSENSUS_MIN_CONF: float = 0.85 # Fused confidence (weakest character) needed to skip the cloud
+    PLATE_REGIONS: str = "IN,IN-BH" # v5.1: Plate grammars accepted as well-formed (comma-separated region keys)
+    PLATE_FORMATS_PATH: str = "storage/plate_formats.json" # Optional extra/overriding region format declarations
+    PLATE_MAX_CORRECTIONS: int = 1 # Confusable-character swaps allowed to make a malformed local read well-formed
     
     # v2.3 Agentic & Collage Settings
     COLLAGE_SIZE: int = 9 # Match 3x3 grid
@@ -28,23 +39,69 @@ class Settings(BaseSettings):
     # Optimization & Chunking
     CHUNK_DURATION_MINUTES: int = 15
     CHUNK_OVERLAP_SECONDS: int = 5
+    VIRTUAL_CHUNKING: bool = True # v5.1: Chunks are frame ranges of the original file (no split copies)
     MAX_GEMINI_CALLS_PER_VIDEO: int = 50
     # For long videos, we might disable generating the full output video to save space/time
     # and rely on the JSON metadata + frontend overlays.
     ENABLE_FULL_VIDEO_OUTPUT: bool = True 
+    VIDEO_OUTPUT_MODE: str = "ON_DEMAND" # v5.1: ON_DEMAND (render from stored tracks on first view) or ASYNC (writer thread)
+    VIDEO_WRITER_DEPTH: int = 16 # Frame slots between the analysis loop and the ASYNC writer thread
     
     # v2.1 Advanced Optimizations
     FRAME_SKIP_AI: int = 3 # Run YOLO/OCR every 3rd frame (effectively 20fps for 60fps video)
+    AI_SAMPLE_FPS: float = 0.0 # v5.1: >0 analyses N frames per second of source instead (overrides FRAME_SKIP_AI)
+    DECODE_PREFETCH_DEPTH: int = 8 # v5.1: Decoded-frame ring between decoder thread and detection loop (0 = inline)
+    DETECTION_BATCH_SIZE: int = 0 # v5.1: Sampled frames per YOLO forward pass (0 = auto-tune)
+    DETECTION_BATCH_MAX: int = 16 # Largest batch size the auto-tuner tries
+    PLATE_BATCH_MAX: int = 32 # v5.1: Vehicle crops per plate-model forward pass
+    GOVERNOR_TARGET_SPEED: float = 0.0 # v5.1: Media sec per wall sec to hold (1.0 = real time, 3.0 = 15-min chunk in 5 min). 0 = off
+    GOVERNOR_INTERVAL_SEC: float = 10.0 # Wall time between governor decisions
+    OCR_TOP_K: int = 3 # v5.1: Best plate crops kept per track for OCR
+    OCR_MIN_PLATE_HEIGHT: int = 12 # Plate crops shorter than this (px) are never OCR'd
+    OCR_BUDGET_PER_TRACK: int = 4 # OCR reads per track, one of them held back for track finalization
+    OCR_MIN_GAIN: float = 1.15 # A crop must out-score the best read crop by this factor to be read immediately
+    OCR_SHARPNESS_REF: float = 100.0 # Laplacian variance at which a plate crop counts as fully sharp
+    OCR_BATCH_SIZE: int = 0 # v5.1: Plate crops per OCR engine call (0 = engine default: EasyOCR 8 CPU / 16 GPU, Paddle 6)
+    OCR_QUEUE_MAX_WAIT_SEC: float = 0.05 # Oldest queued crop waits at most this long for its batch to fill
+    OCR_CACHE_SIZE: int = 512 # v5.1: Cached OCR reads per video (LRU), keyed by plate-crop perceptual hash per track
+    OCR_CACHE_MAX_HAMMING: int = 4 # Hash bits (of 64) two crops may differ by and still share a read
     ROI_MASK_PATH: str = "storage/roi_mask.png" # Optional mask for motion detection
+    ROI_POLYGONS_PATH: str = "storage/roi_polygons.json" # v5.1: Per-camera polygon ROIs (override the mask)
+    ROI_PRECROP: bool = False # v5.1: Feed YOLO only the ROI bounding rectangle
+    ENABLE_MOTION_GATE: bool = True # v5.1: Skip YOLO on sampled frames with no motion inside the ROI
+    MOTION_MIN_AREA_RATIO: float = 0.002 # Fraction of ROI pixels that must change to count as motion
+    MOTION_HANGOVER_SEC: float = 2.0 # Keep detecting after motion stops so tracks can exit
+    MOTION_IDLE_STRIDE: int = 3 # Sampling stride multiplier while the scene is idle
 
     # v4.0 Hyper-Resolution Settings
+    ENABLE_SLICING: bool = False # v5.1: Tiled inference on the full-res frame for small/distant vehicles
     SLICE_HEIGHT: int = 640
     SLICE_WIDTH: int = 640
     OVERLAP_RATIO: float = 0.2
+    ENABLE_ADAPTIVE_SLICING: bool = True # v5.1: Tile only the far-field band where small vehicles appear
+    SLICING_SMALL_OBJECT_PX: int = 24 # Box height (px at the full-frame pass input) below which a vehicle needs tiles
+    SLICING_WARMUP_FRAMES: int = 30 # Frames tiled in full before the first layout is planned
+    SLICING_REPLAN_FRAMES: int = 300 # Frames between tile-layout recomputations
+    DETECTION_RESOLUTION: int = 1280 # v5.1: Long side (px) for vehicle detection/tracking; crops stay full-res. 0 = native
     ENABLE_SUPER_RES: bool = True
     SUPER_RES_MODEL: str = "RealESRGAN_x4plus"
     ENABLE_VEHICLE_MATCHING: bool = True # Semantic Validator
     STABILIZE_VIDEO: bool = True # Video Conditioner
+
+    # v5.1 Streaming Ingest
+    INGEST_MODE: str = "STREAM" # STREAM (FFmpeg rawvideo pipe), FILE (re-encode to storage/conditioned), OFF
+    STREAM_BUFFER_FRAMES: int = 4 # Preallocated frame buffers in the FFmpeg pipe ring
+    ENABLE_CONDITIONING_CACHE: bool = True # Content-addressed reuse of conditioned footage
+    CONDITIONING_CACHE_MAX_GB: float = 20.0 # Disk budget for storage/conditioned (LRU eviction)
+
+    # v5.1 Live Stream Mode (RTSP/HTTP cameras)
+    STREAM_SAMPLE_FPS: float = 5.0 # Max analysed frames per second; newer frames replace unanalysed ones
+    STREAM_READ_TIMEOUT_SEC: float = 10.0 # No frame for this long counts as a disconnect
+    STREAM_MAX_RECONNECTS: int = 10 # Consecutive failed reconnects before the stream is marked FAILED
+    STREAM_TRACK_RETIRE_SEC: float = 10.0 # Exited tracks are dropped from memory after this
+    STREAM_BATCH_MAX_WAIT_SEC: float = 10.0 # Flush a partial collage batch once its oldest track waited this long
+    STREAM_ANALYTICS_WINDOW_SEC: int = 600 # Rolling per-frame vehicle series kept in live analytics
+    STREAM_ANALYTICS_INTERVAL_SEC: float = 30.0 # How often live analytics are written to the Video row
     
     class Config:
         env_file = ".env"
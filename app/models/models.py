@@ -47,6 +47,10 @@ class Video(Base):
     
     is_chunk = Column(Boolean, default=False)
     parent_video_id = Column(Integer, ForeignKey("videos.id"), nullable=True)
+    chunk_offset_sec = Column(Float, nullable=True) # v5.1: Chunk start within the parent video
+    range_start_frame = Column(Integer, nullable=True) # v5.1 Virtual chunk: [start, end) source frames of filepath
+    range_end_frame = Column(Integer, nullable=True)
+    camera_id = Column(String, nullable=True, index=True) # v5.1: Selects the per-camera ROI polygons
     analytics_data = Column(String, nullable=True) # JSON blob for charts & unique counts
     
     owner = relationship("User", back_populates="videos")
@@ -94,6 +94,11 @@ class VideoBase(BaseModel):
 class VideoCreate(VideoBase):
     filepath: str
 
+class LiveStreamCreate(BaseModel):
+    url: str # rtsp://, http(s)://, udp:// or srt:// camera stream
+    name: Optional[str] = None
+    camera_id: Optional[str] = None # Selects the camera's ROI polygons
+
 class Video(VideoBase):
     id: int
     filepath: str
@@ -101,6 +106,7 @@ class Video(VideoBase):
     status: VideoStatus
     created_at: datetime
     analytics_data: Optional[str] = None # JSON blob for charts & unique counts
+    camera_id: Optional[str] = None
 
     class Config:
         from_attributes = True
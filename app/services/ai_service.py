@@ -12,13 +12,11 @@ import torch
 import re
 from ultralytics import YOLO
 from app.core.config import settings
+from app.services.model_service import load_detector, SharedModel
+from app.services.detection_service import DetectionSession, Detections
+from app.services.ocr_service import pad_batch, PlateOCRCache
+from app.services.plate_grammar_service import plate_grammar
 import logging
-try:
-    from sahi import AutoDetectionModel
-    from sahi.predict import get_sliced_prediction
-    SAHI_AVAILABLE = True
-except ImportError:
-    SAHI_AVAILABLE = False
 
 import google.generativeai as genai
 from abc import ABC, abstractmethod
@@ -240,13 +238,15 @@ class AIService:
 
     def initialize(self):
         try:
+            # v5.1 Model Agent: INFERENCE_BACKEND picks PyTorch or a cached ONNX Runtime export
+            # v5.1: SharedModel serializes forward passes so concurrent DetectionSessions can share weights
             if os.path.exists(settings.YOLO_MODEL_PATH):
-                self.vehicle_model = YOLO(settings.YOLO_MODEL_PATH)
+                self.vehicle_model = SharedModel(load_detector(settings.YOLO_MODEL_PATH))
             else:
-                self.vehicle_model = YOLO("yolov8n.pt")
+                self.vehicle_model = SharedModel(YOLO("yolov8n.pt"))
             
             if os.path.exists(settings.PLATE_MODEL_PATH):
-                self.plate_model = YOLO(settings.PLATE_MODEL_PATH)
+                self.plate_model = SharedModel(load_detector(settings.PLATE_MODEL_PATH))
             else:
                 self.plate_model = None
             
@@ -264,116 +264,25 @@ class AIService:
             
             # v2.3 Agentic instances
             self.search_agent = SearchAgent(self.rechecker.providers[0].model if self.rechecker.providers else None)
+            # Global defaults (agent settings API); each DetectionSession starts from these
             self.current_threshold = settings.DETECTION_THRESHOLD
             self.sensitivity = settings.AGENTS_SENSITIVITY
-            
-            # v2.3.5: ROI Mask
-            self.roi_mask = None
-            self._load_roi_mask()
+
+            self.slicing_planners = {} # (camera, roi, h, w) -> SlicingPlanner, shared by the sessions of a camera
+            self.session = self.new_session(name="default")
         except Exception as e:
             logger.error(f"Error initializing AI models: {e}")
 
-    def _load_roi_mask(self):
-        if os.path.exists(settings.ROI_MASK_PATH):
-            mask = cv2.imread(settings.ROI_MASK_PATH, cv2.IMREAD_GRAYSCALE)
-            if mask is not None:
-                self.roi_mask = mask
-                logger.info(f"[ROI AGENT] Mask loaded from {settings.ROI_MASK_PATH}")
-            else:
-                logger.warning(f"[ROI AGENT] Failed to decode mask at {settings.ROI_MASK_PATH}")
-        else:
-            logger.info("[ROI AGENT] No ROI mask found. Full-frame detection active.")
+    def new_session(self, camera_id: str = None, name: str = None) -> DetectionSession:
+        """v5.1: Isolated tracker/threshold/ROI state for one video, chunk or stream."""
+        return DetectionSession(self.vehicle_model, camera_id, self.current_threshold, self.sensitivity,
+                                planners=self.slicing_planners, name=name)
 
     def detect_vehicles(self, frame):
-        # v4.0: Slicing Agent (SAHI) Integration
-        if SAHI_AVAILABLE:
-            try:
-                # Wrap existing model for SAHI
-                if not hasattr(self, 'sahi_model'):
-                    self.sahi_model = AutoDetectionModel.from_model_type(
-                        model_type='yolov8',
-                        model_path=settings.YOLO_MODEL_PATH,
-                        confidence_threshold=self.current_threshold,
-                        device="cuda:0" if torch.cuda.is_available() else "cpu"
-                    )
-                
-                # Perform Sliced Prediction
-                sahi_result = get_sliced_prediction(
-                    frame,
-                    self.sahi_model,
-                    slice_height=settings.SLICE_HEIGHT,
-                    slice_width=settings.SLICE_WIDTH,
-                    overlap_height_ratio=settings.OVERLAP_RATIO,
-                    overlap_width_ratio=settings.OVERLAP_RATIO
-                )
-                
-                # Convert SAHI results to ultralytics-compatible boxes list
-                # This is a simplified fallback; in production we map carefully
-                boxes = []
-                for pred in sahi_result.object_prediction_list:
-                    # Filter for vehicles (classes mapping might vary, usually 2,3,5,7)
-                    if pred.category.id in [2, 3, 5, 7]:
-                        # Mock an ultralytics box for downstream compatibility
-                        class DummyBox:
-                            def __init__(self, p):
-                                self.xyxy = [torch.tensor([p.bbox.minx, p.bbox.miny, p.bbox.maxx, p.bbox.maxy])]
-                                self.id = [torch.tensor([-1])] # Track ID logic needs sync
-                                self.cls = [torch.tensor([p.category.id])]
-                                self.conf = [torch.tensor([p.score.value])]
-                        boxes.append(DummyBox(pred))
-                
-                # v4.0 Note: Tracking logic (ByteTrack) needs frame-level consistency
-                # For now, we return these for forensic snapshots. 
-                # REAL TRACKING still uses standard YOLO track in main loop for speed.
-                if len(boxes) > 0: return boxes
-            except Exception as e:
-                logger.error(f"[SAHI AGENT] Slicing error: {e}")
-
-        # Fallback: Standard YOLOv8 Tracking
-        # v2.3: Lowered threshold for high sensitivity
-        results = self.vehicle_model.track(frame, classes=[2, 3, 5, 7], persist=True, verbose=False, 
-                                          tracker="bytetrack.yaml", conf=self.current_threshold)
-        boxes = results[0].boxes
-        
-        # v2.3.5: Apply ROI Filter
-        if self.roi_mask is not None:
-            filtered_boxes = []
-            h, w = frame.shape[:2]
-            # Resize mask if frame size changed (e.g. multi-cam or dynamic res)
-            if self.roi_mask.shape[:2] != (h, w):
-                self.roi_mask = cv2.resize(self.roi_mask, (w, h))
-
-            for box in boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                
-                # Check if center of box is in white region of mask
-                if 0 <= cx < w and 0 <= cy < h:
-                    if self.roi_mask[cy, cx] > 0:
-                        filtered_boxes.append(box)
-            
-            return filtered_boxes
-            
-        return boxes
-
-    def monitor_agent_tune(self, track_density: float):
-        """
-        Monitor Agent: Auto-tunes detection threshold based on activity.
-        If density (tracks per frame) is very low, we lower the threshold to find more.
-        """
-        if self.sensitivity == "HIGH":
-            target = 0.15
-        elif self.sensitivity == "BALANCED":
-            target = 0.25
-        else:
-            target = 0.45
+        return self.session.detect_vehicles(frame)
 
-        if track_density < 0.05: # Very few detections
-            self.current_threshold = max(0.1, self.current_threshold - 0.05)
-        elif track_density > 0.5: # Way too many, might be noise
-            self.current_threshold = min(0.6, self.current_threshold + 0.05)
-        
-        logger.info(f"[MONITOR AGENT] Tune: New Threshold = {self.current_threshold}")
+    def detect_vehicles_batch(self, frames):
+        return self.session.detect_vehicles_batch(frames)
 
     # --- v3.0 Agentic Integrity Additions ---
 
@@ -415,9 +324,9 @@ class AIService:
         if not cloud_text: return local_text, "LOCAL"
         if local_text == cloud_text: return local_text, "CONSENSUS"
         
-        # Pattern validation (Indian Format Priority)
-        local_valid = self._is_valid_indian_format(local_text)
-        cloud_valid = self._is_valid_indian_format(cloud_text)
+        # Pattern validation (v5.1: plate grammar of PLATE_REGIONS)
+        local_valid = plate_grammar.is_valid(local_text)
+        cloud_valid = plate_grammar.is_valid(cloud_text)
         
         if local_valid and not cloud_valid:
             return local_text, "LOCAL (Pattern Match)"
@@ -455,52 +364,114 @@ class AIService:
         # For this v4.0 alpha, we return True but log the check
         return True
 
-    def detect_plates(self, vehicle_crop):
-        if self.plate_model is None: return []
-        results = self.plate_model(vehicle_crop, verbose=False)
-        return results[0].boxes
+    def detect_plates(self, vehicle_crop) -> Detections:
+        return self.detect_plates_batch([vehicle_crop])[0]
+
+    def detect_plates_batch(self, vehicle_crops) -> list:
+        """
+        v5.1: Plates for all vehicle crops of a frame in one plate-model forward pass
+        (ultralytics letterboxes the differently sized crops to a common input size and
+        maps boxes back per crop). Returns one Detections per crop, in crop pixels.
+        """
+        if self.plate_model is None or not vehicle_crops:
+            return [Detections.empty() for _ in vehicle_crops]
+        plates = []
+        for start in range(0, len(vehicle_crops), settings.PLATE_BATCH_MAX):
+            results = self.plate_model(vehicle_crops[start:start + settings.PLATE_BATCH_MAX], verbose=False)
+            plates.extend(Detections.from_boxes(r.boxes) for r in results)
+        return plates
 
     def estimate_blur(self, image):
         if image is None or image.size == 0: return 0.0
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
         return cv2.Laplacian(gray, cv2.CV_64F).var()
 
-    def recognize_plate(self, plate_crop, video_id: int = -1, allow_gemini: bool = True) -> tuple[str, float, str, str]:
-        from app.models.models import RecheckStatus
-        if plate_crop is None or plate_crop.size == 0:
-            return None, 0.0, None, RecheckStatus.SKIPPED.value
-            
-        plate_crop = self.preprocess_for_night_mode(plate_crop)
-        h, w = plate_crop.shape[:2]
-        if h < 40:
-            plate_crop = cv2.resize(plate_crop, (w * 2, h * 2), interpolation=cv2.INTER_CUBIC)
-            
-        best_text, max_conf = "", 0.0
-        
+    @property
+    def ocr_batch_size(self) -> int:
+        """Plate crops per OCR engine call: OCR_BATCH_SIZE, else what the engine handles well."""
+        if settings.OCR_BATCH_SIZE > 0: return settings.OCR_BATCH_SIZE
+        if self.use_paddle: return 6 # PaddleOCR's rec_batch_num
+        return 16 if torch.cuda.is_available() else 8
+
+    def _ocr_engine_batch(self, crops) -> list:
+        """
+        v5.1: Raw (text, prob) candidates per crop. EasyOCR gets the whole batch in one
+        readtext_batched call (crops padded to a common size, recognizer batch = batch);
+        PaddleOCR's ocr() detects text lines per image and batches their recognition.
+        """
         if self.use_paddle:
-            try:
-                res = self.reader.ocr(plate_crop, cls=True)
-                if res and res[0]:
-                    for line in res[0]:
-                        text, prob = line[1]
-                        clean = "".join([c for c in text if c.isalnum()]).upper()
-                        if self._is_valid_plate(clean) and prob > max_conf:
-                            max_conf, best_text = prob, clean
-            except: pass
-        else:
-            try:
-                res = self.reader.readtext(plate_crop)
-                if res:
-                    for (bbox, text, prob) in res:
-                        clean = "".join([c for c in text if c.isalnum()]).upper()
-                        if self._is_valid_plate(clean) and prob > max_conf:
-                            max_conf, best_text = prob, clean
-            except: pass
+            reads = []
+            for crop in crops:
+                try:
+                    res = self.reader.ocr(crop, cls=True)
+                    reads.append([tuple(line[1]) for line in res[0]] if res and res[0] else [])
+                except: reads.append([])
+            return reads
+        try:
+            res = self.reader.readtext_batched(pad_batch(crops), batch_size=len(crops))
+            return [[(text, prob) for (bbox, text, prob) in r] for r in res]
+        except Exception as e:
+            logger.warning(f"[OCR AGENT] Batched recognition failed ({e}), reading crops one by one")
+        reads = []
+        for crop in crops:
+            try: reads.append([(text, prob) for (bbox, text, prob) in self.reader.readtext(crop)])
+            except: reads.append([])
+        return reads
+
+    def recognize_plates_batch(self, plate_crops, video_id: int = -1, allow_gemini: bool = True,
+                               cache: PlateOCRCache = None, scopes: list = None) -> list:
+        """
+        recognize_plate for many crops with batched OCR engine calls; one result tuple per crop.
+        v5.1: with a PlateOCRCache, near-duplicate crops of the same scope (track, `scopes[i]`)
+        reuse the earlier engine read instead of going through OCR again.
+        """
+        from app.models.models import RecheckStatus
+        results = [(None, 0.0, None, RecheckStatus.SKIPPED.value)] * len(plate_crops)
+        idx, crops = [], []
+        for i, plate_crop in enumerate(plate_crops):
+            if plate_crop is None or plate_crop.size == 0: continue
+            plate_crop = self.preprocess_for_night_mode(plate_crop)
+            h, w = plate_crop.shape[:2]
+            if h < 40:
+                plate_crop = cv2.resize(plate_crop, (w * 2, h * 2), interpolation=cv2.INTER_CUBIC)
+            idx.append(i)
+            crops.append(plate_crop)
+
+        reads = [None] * len(crops)
+        keys = [cache.key(scopes[i] if scopes else None, crop) for i, crop in zip(idx, crops)] if cache is not None else []
+        for j, key in enumerate(keys):
+            reads[j] = cache.get(key)
+        todo = [j for j, read in enumerate(reads) if read is None]
+        batch = max(1, self.ocr_batch_size)
+        for start in range(0, len(todo), batch):
+            chunk = todo[start:start + batch]
+            for j, read in zip(chunk, self._ocr_engine_batch([crops[j] for j in chunk])):
+                reads[j] = read
+                if cache is not None: cache.put(keys[j], read)
+
+        for i, plate_crop, read in zip(idx, crops, reads):
+            cands = []
+            for text, prob in read:
+                clean = "".join([c for c in text if c.isalnum()]).upper()
+                if self._is_valid_plate(clean): cands.append((clean, prob))
+            if not cands: continue
+            # v5.1 Grammar Agent: a well-formed candidate beats a more confident malformed one;
+            # a malformed best read takes its correction if exactly one needs the fewest swaps
+            (best_text, max_conf), well_formed = max(zip(cands, plate_grammar.validate([c for c, _ in cands])),
+                                                     key=lambda cand: (cand[1], cand[0][1]))
+            if not well_formed and settings.PLATE_MAX_CORRECTIONS > 0:
+                fixes = plate_grammar.correct(best_text, settings.PLATE_MAX_CORRECTIONS)
+                if len(fixes) == 1: best_text = fixes[0][0]
+            results[i] = self._validate_plate(best_text, max_conf, plate_crop, video_id, allow_gemini)
+        return results
 
-        if not best_text: return None, 0.0, None, RecheckStatus.SKIPPED.value
-        
+    def recognize_plate(self, plate_crop, video_id: int = -1, allow_gemini: bool = True) -> tuple[str, float, str, str]:
+        return self.recognize_plates_batch([plate_crop], video_id, allow_gemini)[0]
+
+    def _validate_plate(self, best_text, max_conf, plate_crop, video_id, allow_gemini) -> tuple[str, float, str, str]:
+        from app.models.models import RecheckStatus
         # Validation
-        is_valid_format = self._is_valid_indian_format(best_text)
+        is_valid_format = plate_grammar.is_valid(best_text)
         blur_score = self.estimate_blur(plate_crop)
         should_recheck = max_conf < settings.RECHECK_CONFIDENCE_THRESHOLD or not is_valid_format
         if blur_score < 30: should_recheck = False
@@ -511,22 +482,13 @@ class AIService:
             ai_text, ai_conf, v_info = self.rechecker.recheck(plate_crop, video_id)
             if ai_text:
                 recheck_status = RecheckStatus.SUCCESS.value
-                if ai_conf > max_conf or (not is_valid_format and self._is_valid_indian_format(ai_text)):
+                if ai_conf > max_conf or (not is_valid_format and plate_grammar.is_valid(ai_text)):
                     return ai_text, ai_conf, v_info, recheck_status
             else:
                 recheck_status = RecheckStatus.FAILED.value
         
         return best_text, max_conf, None, recheck_status
 
-    def _is_valid_indian_format(self, text):
-        if not text or len(text) < 4: return False
-        state_codes = ['AN','AP','AR','AS','BR','CH','CT','DN','DD','DL','GA','GJ','HR','HP','JK','JH','KA','KL','LD','MP','MH','MN','ML','MZ','NL','OD','OR','PY','PB','RJ','SK','TN','TG','TS','TR','UP','UK','UA','WB']
-        if text[:2].upper() not in state_codes:
-            if re.match(r"^[0-9]{2}BH", text):
-                 return re.match(r"^[0-9]{2}BH[0-9]{4}[A-Z]{1,2}$", text) is not None
-            return False
-        return re.match(r"^[A-Z]{2}[0-9]{1,2}[A-Z]{1,3}[0-9]{1,4}$", text) or re.match(r"^[A-Z]{2}[0-9]{1,2}[0-9]{4}$", text)
-
     def _is_valid_plate(self, text):
         negative_list = ["VEHICLE", "PLATE", "STOP", "CAR", "CNG", "INDIA", "ROAD", "DRIVE", "SLOW", "KEEP", "DISTANCE"]
         if any(word in text for word in negative_list): return False
@@ -0,0 +1,67 @@
+import bisect
+import subprocess
+
+CHUNK_TRACK_ID_STRIDE = 1_000_000 # v5.1: Chunk i's track ids become i * stride + local id after merge
+
+def probe_keyframes(filepath: str):
+    """
+    Returns (keyframe_times_sec, duration_sec) of the first video stream.
+    Packets are stream-copied into FFmpeg's framecrc muxer, so nothing is decoded;
+    keyframes are the packets without a non-key flags column.
+    """
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error', '-i', filepath,
+           '-map', '0:v:0', '-c', 'copy', '-f', 'framecrc', '-']
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Keyframe probe failed: {result.stderr.strip()[:200]}")
+
+    time_base = 1.0
+    keyframes, duration = [], 0.0
+    for line in result.stdout.splitlines():
+        if line.startswith('#tb 0:'):
+            num, den = line.split(':', 1)[1].strip().split('/')
+            time_base = float(num) / float(den)
+            continue
+        if not line or line.startswith('#'): continue
+        fields = [f.strip() for f in line.split(',')]
+        pts, pkt_duration = int(fields[2]), int(fields[3])
+        duration = max(duration, (pts + pkt_duration) * time_base)
+        flags = next((f for f in fields[6:] if f.startswith('F=')), None)
+        if flags is None or int(flags[2:], 16) & 0x1:
+            keyframes.append(pts * time_base)
+    return sorted(keyframes), duration
+
+def plan_frame_ranges(frame_count: int, fps: float, target_sec: float, overlap_sec: float = 0.0):
+    """
+    v5.1 Virtual chunks: [(start_frame, end_frame), ...] over the original file.
+    Each range runs overlap_sec past the next start; no file is touched, since the
+    chunk worker seeks to start_frame itself.
+    """
+    fps = fps if fps and fps > 0 else 30.0
+    step = max(1, int(round(target_sec * fps)))
+    overlap = int(round(overlap_sec * fps))
+    starts = list(range(0, max(1, frame_count), step))
+    # A tail shorter than the overlap is already covered by the previous range
+    if len(starts) > 1 and frame_count - starts[-1] <= overlap:
+        starts.pop()
+    return [(start, frame_count if i + 1 == len(starts) else min(frame_count, starts[i + 1] + overlap))
+            for i, start in enumerate(starts)]
+
+def plan_chunk_cuts(keyframes, duration: float, target_sec: float, overlap_sec: float = 0.0):
+    """
+    Chunk start times for stream-copy splitting. Each cut is the last keyframe at or
+    before the next target_sec boundary (stream copy can only start on a keyframe);
+    if the GOP is longer than a chunk, the first keyframe after the boundary is used.
+    No cut is placed within overlap_sec of the end (the previous chunk covers it).
+    """
+    cuts = [0.0]
+    while cuts[-1] + target_sec < duration:
+        nominal = cuts[-1] + target_sec
+        pos = bisect.bisect_right(keyframes, nominal) - 1
+        cut = keyframes[pos] if pos >= 0 else None
+        if cut is None or cut <= cuts[-1] + overlap_sec:
+            pos = bisect.bisect_right(keyframes, nominal)
+            cut = keyframes[pos] if pos < len(keyframes) else None
+        if cut is None or cut >= duration - overlap_sec: break
+        cuts.append(cut)
+    return cuts
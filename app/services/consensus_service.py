@@ -0,0 +1,124 @@
+import math
+import itertools
+from collections import defaultdict
+from app.services.plate_grammar_service import CONFUSION_GROUPS
+
+# A vote for a confusable character supports its whole group
+_GROUP = {c: g for g in CONFUSION_GROUPS for c in g}
+MAX_FORMAT_CANDIDATES = 1024 # Plates tried against the format: product of the per-position options (up to 3 each)
+
+def _group(c: str) -> str:
+    return _GROUP.get(c, c)
+
+def _sub_cost(a: str, b: str) -> float:
+    if a == b: return 0.0
+    return 0.5 if _group(a) == _group(b) else 1.0
+
+def align(text: str, anchor: str) -> list:
+    """Edit-distance alignment of `text` onto `anchor`: per anchor position the aligned character or None (gap)."""
+    n, m = len(text), len(anchor)
+    cost = [[0.0] * (m + 1) for _ in range(n + 1)]
+    for i in range(1, n + 1): cost[i][0] = float(i)
+    for j in range(1, m + 1): cost[0][j] = float(j)
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            cost[i][j] = min(cost[i - 1][j - 1] + _sub_cost(text[i - 1], anchor[j - 1]),
+                             cost[i - 1][j] + 1.0, cost[i][j - 1] + 1.0)
+    aligned = [None] * m
+    i, j = n, m
+    while i > 0 and j > 0:
+        if cost[i][j] == cost[i - 1][j - 1] + _sub_cost(text[i - 1], anchor[j - 1]):
+            aligned[j - 1] = text[i - 1]
+            i, j = i - 1, j - 1
+        elif cost[i][j] == cost[i - 1][j] + 1.0:
+            i -= 1
+        else:
+            j -= 1
+    return aligned
+
+class PlateConsensus:
+    """
+    v5.1 Consensus Agent: temporal fusion of one track's local OCR reads. Reads are aligned
+    onto the read with the best aligned support (each of its positions scores the read weight
+    covering it minus the weight missing it, so a truncated read loses to the full plate and
+    a spurious extra character costs more than it adds) and vote per character position,
+    weighted by confidence; votes for confusable characters (0/O, 8/B, 1/I, ...) pool, and
+    the member of the group is picked so the whole plate fits `validator` (e.g. the Indian
+    format). A position's confidence is its vote share (among reads not missing it) times
+    the noisy-OR of its supporters; the plate's is its weakest position. An identical
+    (text, conf) pair is the same engine read (OCR cache) and is counted once.
+    """
+
+    def __init__(self, validator=None, min_reads: int = 2, min_conf: float = 0.85):
+        self.validator = validator
+        self.min_reads = min_reads
+        self.min_conf = min_conf
+        self.reads = [] # (text, conf)
+
+    def add(self, text: str, conf: float):
+        if text and (text, conf) not in self.reads:
+            self.reads.append((text, conf))
+
+    def fuse(self) -> tuple:
+        """(text, conf, confident). `confident`: enough reads, conf >= min_conf and a valid format."""
+        if not self.reads:
+            return None, 0.0, False
+        anchor, aligned = self._anchor()
+        votes = [defaultdict(list) for _ in range(len(anchor))] # position -> char -> supporting confidences
+        for (text, conf), chars in zip(self.reads, aligned):
+            for pos, c in enumerate(chars):
+                if c is not None:
+                    votes[pos][c].append(conf)
+
+        choices, position_conf = [], []
+        for pos_votes in votes:
+            groups = defaultdict(list)
+            for c, confs in pos_votes.items():
+                groups[_group(c)].extend(confs)
+            winner = max(groups, key=lambda g: (sum(groups[g]), g))
+            support = groups[winner]
+            miss = 1.0
+            for conf in support:
+                miss *= 1.0 - min(conf, 0.99)
+            voted = sum(sum(confs) for confs in groups.values())
+            position_conf.append(sum(support) / voted * (1.0 - miss))
+            members = sorted((c for c in pos_votes if _group(c) == winner), key=lambda c: -sum(pos_votes[c]))
+            # Unvoted members of the group are still candidates: a plate read as all-"O" may need a "0"
+            letter = next((c for c in members + list(winner) if c.isalpha()), None)
+            digit = next((c for c in members + list(winner) if c.isdigit()), None)
+            choices.append([c for c in dict.fromkeys([members[0], letter, digit]) if c is not None])
+
+        text = "".join(options[0] for options in choices)
+        valid = True
+        if self.validator is not None:
+            valid = bool(self.validator(text))
+            ambiguous = [i for i, options in enumerate(choices) if len(options) > 1]
+            candidates = math.prod(len(choices[i]) for i in ambiguous)
+            if not valid and candidates <= MAX_FORMAT_CANDIDATES:
+                for combo in itertools.product(*(choices[i] for i in ambiguous)):
+                    chars = [options[0] for options in choices]
+                    for i, c in zip(ambiguous, combo):
+                        chars[i] = c
+                    if self.validator("".join(chars)):
+                        text, valid = "".join(chars), True
+                        break
+        conf = min(position_conf)
+        confident = valid and len(self.reads) >= self.min_reads and conf >= self.min_conf
+        return text, conf, confident
+
+    def _anchor(self) -> tuple:
+        """(anchor text, every read aligned onto it): the distinct read with the best aligned support."""
+        total = sum(conf for _, conf in self.reads)
+        best = None
+        for anchor in dict.fromkeys(text for text, _ in self.reads):
+            aligned = [list(anchor) if text == anchor else align(text, anchor) for text, _ in self.reads]
+            covered = [0.0] * len(anchor)
+            for (_, conf), chars in zip(self.reads, aligned):
+                for pos, c in enumerate(chars):
+                    if c is not None:
+                        covered[pos] += conf
+            score = sum(2.0 * w - total for w in covered)
+            key = (score, max(conf for text, conf in self.reads if text == anchor))
+            if best is None or key > best[0]:
+                best = (key, anchor, aligned)
+        return best[1], best[2]
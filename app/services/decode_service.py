@@ -0,0 +1,302 @@
+import time
+import queue
+import threading
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def sampling_step(fps: float, frame_skip: int, sample_fps: float = 0.0) -> int:
+    """
+    Number of source frames between two analysed frames.
+    Time-based sampling (sample_fps > 0) wins over FRAME_SKIP_AI.
+    """
+    if sample_fps and sample_fps > 0:
+        return max(1, int((fps or 30.0) // sample_fps))
+    return max(1, int(frame_skip))
+
+class SampledFrameReader:
+    """
+    v5.1 Decode Agent: walks a capture and only fully decodes analysed frames.
+
+    Skipped frames are advanced with grab() (no retrieve / BGR conversion), unless
+    keep_all_frames is set because the output video needs every frame.
+    Two sampling modes:
+      - FRAME: every `frame_skip`-th frame (FRAME_SKIP_AI semantics)
+      - TIME:  `sample_fps` frames per second of source, whatever the source fps
+    When the capture already drops frames upstream (FFmpegFrameStream with
+    frame_step > 1), indices and timestamps still refer to source frames.
+    max_frames > 0 ends the read after that many source frames (virtual chunk range).
+    """
+
+    def __init__(self, cap, fps: float, frame_skip: int = 1, sample_fps: float = 0.0,
+                 keep_all_frames: bool = False, max_frames: int = 0):
+        self.cap = cap
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.frame_skip = max(1, int(frame_skip))
+        self.sample_fps = sample_fps or 0.0
+        self.keep_all_frames = keep_all_frames
+        self.max_frames = max(0, int(max_frames))
+        self.frame_step = max(1, int(getattr(cap, 'frame_step', 1)))
+        self.stride_scale = 1 # Runtime multiplier (e.g. Motion Gate idle stride)
+
+        self.frame_idx = 0 # Next source frame index
+        self._next_sample_idx = 0
+        self._next_sample_ts = 0.0
+
+        # Telemetry
+        self.decoded_frames = 0
+        self.grabbed_frames = 0
+        self.sampled_frames = 0
+
+    def _is_sample(self, idx: int, ts: float) -> bool:
+        if self.sample_fps > 0:
+            if ts + 1e-6 < self._next_sample_ts:
+                return False
+            period = self.stride_scale / self.sample_fps
+            while self._next_sample_ts <= ts + 1e-6:
+                self._next_sample_ts += period
+            return True
+        if idx < self._next_sample_idx:
+            return False
+        self._next_sample_idx = idx + self.frame_skip * self.stride_scale
+        return True
+
+    def read(self, image=None):
+        """
+        Advances one (upstream) frame.
+        Returns (ok, frame_idx, timestamp, frame, sampled); frame is None for grabbed-only frames.
+        """
+        idx = self.frame_idx
+        ts = idx / self.fps
+        if self.max_frames and idx >= self.max_frames:
+            return False, idx, ts, None, False
+        sampled = self._is_sample(idx, ts)
+
+        if sampled or self.keep_all_frames:
+            ok, frame = self.cap.read(image) if image is not None else self.cap.read()
+            if ok: self.decoded_frames += 1
+        else:
+            ok, frame = self.cap.grab(), None
+            if ok: self.grabbed_frames += 1
+
+        if not ok:
+            return False, idx, ts, None, False
+
+        self.frame_idx += self.frame_step
+        if sampled: self.sampled_frames += 1
+        return True, idx, ts, frame, sampled
+
+    def __iter__(self):
+        while True:
+            ok, idx, ts, frame, sampled = self.read()
+            if not ok: break
+            yield idx, ts, frame, sampled
+
+    def stats(self) -> dict:
+        return {
+            "mode": "TIME" if self.sample_fps > 0 else "FRAME",
+            "frame_skip": self.frame_skip,
+            "sample_fps": self.sample_fps,
+            "upstream_frame_step": self.frame_step,
+            "decoded_frames": self.decoded_frames,
+            "grabbed_frames": self.grabbed_frames,
+            "analysed_frames": self.sampled_frames,
+        }
+
+class PrefetchFrameReader:
+    """
+    v5.1 Prefetch Agent: runs a SampledFrameReader on a producer thread so decoding
+    overlaps with detection. Frames are decoded into a fixed ring of preallocated
+    buffers; a yielded frame stays valid until the consumer asks for the next one,
+    so steady state allocates nothing per frame.
+
+    Stall telemetry tells which side is the bottleneck:
+      - consumer_stall: detection loop waited on decode  -> DECODE bound
+      - producer_stall: decoder waited for a free buffer -> INFERENCE bound
+    """
+
+    _END = object()
+
+    def __init__(self, reader: SampledFrameReader, depth: int = 8, frame_shape=None):
+        self.reader = reader
+        self.depth = max(2, int(depth))
+        if frame_shape is None:
+            w = int(reader.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            h = int(reader.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            frame_shape = (h, w, 3)
+        self._buffers = [np.empty(frame_shape, dtype=np.uint8) for _ in range(self.depth)]
+        self._free = queue.Queue()
+        for slot in range(self.depth):
+            self._free.put(slot)
+        self._ready = queue.Queue()
+        self._stop = threading.Event()
+        self._error = None
+
+        # Telemetry
+        self.producer_stall = 0.0
+        self.consumer_stall = 0.0
+        self.depth_total = 0
+        self.depth_max = 0
+        self.frames = 0
+        self.reallocations = 0 # Decoder returned its own array (shape mismatch)
+
+        self._thread = threading.Thread(target=self._run, name="decode-prefetch", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                slot = self._free.get()
+                self.producer_stall += time.perf_counter() - t0
+                if slot is None: break
+
+                buf = self._buffers[slot]
+                # Grab-only frames carry nothing for the consumer: keep the slot
+                while True:
+                    ok, idx, ts, frame, sampled = self.reader.read(buf)
+                    if not ok or frame is not None: break
+                if not ok: break
+
+                if frame is not buf: self.reallocations += 1
+                self._ready.put((slot, idx, ts, frame, sampled))
+        except Exception as e:
+            logger.error(f"[PREFETCH AGENT] Decoder thread failed: {e}")
+            self._error = e
+        finally:
+            self._ready.put(self._END)
+
+    def __iter__(self):
+        prev_slot = None
+        while True:
+            # Hand the previous buffer back before blocking on the next frame
+            if prev_slot is not None:
+                self._free.put(prev_slot)
+                prev_slot = None
+
+            depth = self._ready.qsize()
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+
+            t0 = time.perf_counter()
+            item = self._ready.get()
+            self.consumer_stall += time.perf_counter() - t0
+            if item is self._END:
+                if self._error: raise self._error
+                break
+
+            prev_slot, idx, ts, frame, sampled = item
+            self.frames += 1
+            yield idx, ts, frame, sampled
+
+    @property
+    def frame_idx(self) -> int:
+        return self.reader.frame_idx
+
+    def close(self):
+        """Stops the producer; must run before the capture is released."""
+        self._stop.set()
+        self._free.put(None)
+        self._thread.join(timeout=10)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "frames": self.frames,
+            "avg_queue_depth": self.depth_total / self.frames if self.frames else 0.0,
+            "max_queue_depth": self.depth_max,
+            "producer_stall_sec": round(self.producer_stall, 3),
+            "consumer_stall_sec": round(self.consumer_stall, 3),
+            "bottleneck": "DECODE" if self.consumer_stall > self.producer_stall else "INFERENCE",
+            "reallocations": self.reallocations,
+        }
+
+def open_live_capture(url: str, timeout_sec: float = 10.0):
+    """Opens a live stream (RTSP/HTTP/UDP/SRT) with open/read timeouts so a dead camera doesn't block forever."""
+    timeout_ms = int(timeout_sec * 1000)
+    try:
+        return cv2.VideoCapture(url, cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms,
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms,
+        ])
+    except (AttributeError, TypeError, cv2.error):
+        # Older OpenCV builds without capture params
+        return cv2.VideoCapture(url)
+
+class LatestFrameReader:
+    """
+    v5.1 Live Agent reader: drains a live capture on its own thread and hands the
+    consumer only the newest frame. If analysis is slower than the camera, stale
+    frames are dropped instead of queueing, so latency and memory stay bounded
+    (three rotating buffers: one being decoded, one latest, one held by the consumer).
+    """
+
+    def __init__(self, cap):
+        self.cap = cap
+        self._buffers = [None, None, None]
+        self._cond = threading.Condition()
+        self._latest = None # Slot of the newest unconsumed frame
+        self._latest_idx = -1
+        self._held = None # Slot currently owned by the consumer
+        self._ended = False
+        self._stop = threading.Event()
+
+        # Telemetry
+        self.frame_idx = 0 # Frames decoded from the stream
+        self.delivered_frames = 0
+        self.dropped_frames = 0
+
+        self._thread = threading.Thread(target=self._run, name="live-reader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                with self._cond:
+                    slot = next(s for s in range(3) if s != self._latest and s != self._held)
+                buf = self._buffers[slot]
+                ok, frame = self.cap.read(buf) if buf is not None else self.cap.read()
+                if not ok: break
+                self._buffers[slot] = frame
+                with self._cond:
+                    if self._latest is not None: self.dropped_frames += 1
+                    self._latest, self._latest_idx = slot, self.frame_idx
+                    self.frame_idx += 1
+                    self._cond.notify()
+        except Exception as e:
+            logger.error(f"[LIVE AGENT] Stream reader failed: {e}")
+        finally:
+            with self._cond:
+                self._ended = True
+                self._cond.notify()
+
+    def read(self, timeout: float = None):
+        """
+        Returns (ok, frame_idx, frame) for the newest frame; blocks until one arrives.
+        The previous frame's buffer is recycled, so it must not be used after this call.
+        ok is False when the stream ended or nothing arrived within timeout.
+        """
+        with self._cond:
+            self._held = None
+            if self._latest is None and not self._ended:
+                self._cond.wait_for(lambda: self._latest is not None or self._ended, timeout)
+            if self._latest is None:
+                return False, self.frame_idx, None
+            slot, idx = self._latest, self._latest_idx
+            self._latest, self._held = None, slot
+        self.delivered_frames += 1
+        return True, idx, self._buffers[slot]
+
+    def close(self):
+        """Stops the reader thread; must run before the capture is released."""
+        self._stop.set()
+        self._thread.join(timeout=10)
+
+    def stats(self) -> dict:
+        return {
+            "decoded_frames": self.frame_idx,
+            "analysed_frames": self.delivered_frames,
+            "dropped_frames": self.dropped_frames,
+        }
@@ -0,0 +1,240 @@
+import logging
+import cv2
+import numpy as np
+from app.core.config import settings
+from app.services.roi_service import roi_manager
+from app.services.slicing_service import SliceEngine
+
+logger = logging.getLogger(__name__)
+
+class Detections:
+    """
+    v5.1 One frame's detections as contiguous arrays: xyxy (N, 4) float32 in frame
+    pixels, ids (N,) int64 (-1 = untracked), classes (N,) int64, confs (N,) float32.
+    Built once per frame from the tracker/YOLO output, so the per-frame loop, the
+    ROI filter and plate association never index tensors box by box.
+    """
+    __slots__ = ("xyxy", "ids", "classes", "confs")
+
+    def __init__(self, xyxy, ids, classes, confs):
+        self.xyxy = xyxy
+        self.ids = ids
+        self.classes = classes
+        self.confs = confs
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.int64),
+                   np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+
+    @classmethod
+    def from_array(cls, data, scale: float = 1.0, offset=(0, 0)):
+        """
+        data: (N, 6) [x1, y1, x2, y2, conf, cls] or tracked (N, 7) [x1, y1, x2, y2, id, conf, cls],
+        in detection pixels; `scale`/`offset` map them back to the full-resolution frame.
+        """
+        data = np.asarray(data, dtype=np.float32)
+        if data.size == 0:
+            return cls.empty()
+        xyxy = data[:, :4] / scale if scale != 1.0 else data[:, :4].copy()
+        if offset != (0, 0):
+            xyxy += np.array([offset[0], offset[1], offset[0], offset[1]], dtype=np.float32)
+        tracked = data.shape[1] == 7
+        ids = data[:, 4].astype(np.int64) if tracked else np.full(len(data), -1, dtype=np.int64)
+        return cls(xyxy, ids, data[:, -1].astype(np.int64), data[:, -2].copy())
+
+    @staticmethod
+    def to_frame_pixels(data, scale: float = 1.0, offset=(0, 0)) -> np.ndarray:
+        """Copy of (N, 6) [x1, y1, x2, y2, conf, cls] detection-pixel boxes in full-resolution frame pixels."""
+        data = np.array(data, dtype=np.float32).reshape(-1, 6)
+        if scale != 1.0:
+            data[:, :4] /= scale
+        if offset != (0, 0):
+            data[:, :4] += np.array([offset[0], offset[1], offset[0], offset[1]], dtype=np.float32)
+        return data
+
+    @classmethod
+    def from_boxes(cls, boxes, scale: float = 1.0, offset=(0, 0)):
+        """Converts ultralytics Boxes (tracked or not) in one go."""
+        if boxes is None or len(boxes) == 0:
+            return cls.empty()
+        return cls.from_array(boxes.cpu().numpy().data, scale, offset)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, idx):
+        return Detections(self.xyxy[idx], self.ids[idx], self.classes[idx], self.confs[idx])
+
+    def int_boxes(self) -> np.ndarray:
+        """(N, 4) int32 pixel boxes (truncated, like int() on each coordinate)."""
+        return self.xyxy.astype(np.int32)
+
+class BatchLatencyStats:
+    """Per-call latency grouped by how many items (e.g. vehicle crops) the call carried."""
+    BUCKETS = ((1, 1), (2, 4), (5, 9), (10, 19), (20, None))
+
+    def __init__(self):
+        self._samples = {} # bucket label -> [count, items, seconds]
+
+    @classmethod
+    def bucket(cls, n: int) -> str:
+        for lo, hi in cls.BUCKETS:
+            if n >= lo and (hi is None or n <= hi):
+                return str(lo) if lo == hi else (f"{lo}+" if hi is None else f"{lo}-{hi}")
+        return "0"
+
+    def record(self, items: int, seconds: float):
+        if items <= 0: return
+        entry = self._samples.setdefault(self.bucket(items), [0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += items
+        entry[2] += seconds
+
+    def stats(self) -> dict:
+        return {
+            label: {
+                "calls": calls,
+                "avg_items": round(items / calls, 1),
+                "avg_ms": round(sec / calls * 1000, 2),
+                "ms_per_item": round(sec / items * 1000, 2),
+            }
+            for label, (calls, items, sec) in self._samples.items()
+        }
+
+class DetectionSession:
+    """
+    v5.1 Detection Session: everything one video (or chunk, or live stream) mutates
+    while it is analysed: ByteTrack state, the Monitor Agent's threshold, the
+    camera's ROI, slicing telemetry and resize buffers. The YOLO weights are not
+    here: sessions share the process-wide SharedModel, so several videos can run
+    concurrently in one worker without reloading models or mixing track IDs.
+    """
+
+    def __init__(self, model, camera_id: str = None, threshold: float = None, sensitivity: str = None,
+                 planners: dict = None, tracker=None, name: str = None):
+        self.model = model
+        self.name = name or f"camera {camera_id or 'default'}"
+        self.current_threshold = settings.DETECTION_THRESHOLD if threshold is None else threshold
+        self.sensitivity = sensitivity or settings.AGENTS_SENSITIVITY
+
+        # v5.1 ByteTrack Agent: driven explicitly so detection can be micro-batched
+        if tracker is None:
+            from app.services.tracking_service import VehicleTracker
+            tracker = VehicleTracker()
+        self.tracker = tracker
+
+        # v2.3.5: ROI Mask, v5.1: per camera (polygons or mask), cached per resolution
+        self.roi = roi_manager.region_for(camera_id)
+
+        # v5.1: Sliced inference; the planner tiles only the far-field band inside the ROI.
+        # Tile layouts are per camera, so they live in the shared `planners` dict under its id
+        # (the session's own name when there is no camera: unrelated videos never share a band).
+        self.slicer = SliceEngine(
+            model, settings.SLICE_WIDTH, settings.SLICE_HEIGHT, settings.OVERLAP_RATIO,
+            plan=settings.ENABLE_ADAPTIVE_SLICING, roi=self.roi, planners=planners,
+            scope=camera_id or self.name,
+            planner_args={
+                "small_px": settings.SLICING_SMALL_OBJECT_PX,
+                "warmup_frames": settings.SLICING_WARMUP_FRAMES,
+                "replan_frames": settings.SLICING_REPLAN_FRAMES,
+            })
+        self._det_buffers = []
+
+        # Runtime knobs (v5.1 Governor Agent may lower them for this video only)
+        self.detection_resolution = settings.DETECTION_RESOLUTION
+        self.slicing = settings.ENABLE_SLICING
+
+    def _detection_frame(self, frame, slot: int = 0):
+        """
+        v5.1 Multi-Resolution: Returns (detection_frame, scale). Vehicles are detected
+        and tracked on a copy downscaled to DETECTION_RESOLUTION (long side), while
+        crops are still cut from the full-resolution frame.
+        `slot` selects the reusable buffer (one per frame of a micro-batch).
+        """
+        target = self.detection_resolution
+        h, w = frame.shape[:2]
+        if target <= 0 or max(h, w) <= target:
+            return frame, 1.0
+        scale = target / max(h, w)
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        # Reuse one buffer per batch slot and detection size instead of allocating every frame
+        buffers = self._det_buffers
+        while len(buffers) <= slot:
+            buffers.append(None)
+        buf = buffers[slot]
+        if buf is None or buf.shape[:2] != (size[1], size[0]):
+            buf = buffers[slot] = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        cv2.resize(frame, size, dst=buf, interpolation=cv2.INTER_AREA)
+        return buf, scale
+
+    def detect_vehicles(self, frame):
+        return self.detect_vehicles_batch([frame])[0]
+
+    def detect_vehicles_batch(self, frames):
+        """
+        v5.1 Micro-batching: one forward pass for several sampled frames (in frame order),
+        then ByteTrack updated frame by frame, so track IDs match the one-frame path.
+        Returns one Detections per frame, in full-resolution pixels.
+        """
+        # v4.0: Slicing Agent, v5.1: native sliced inference feeding the tracker
+        if self.slicing:
+            return self._slice_batch(frames)
+        return self._track_batch(frames)
+
+    def _slice_batch(self, frames):
+        # Tiles come from the full-resolution frame: slicing exists for the small, distant vehicles
+        merged = self.slicer.predict_batch(frames, self.current_threshold)
+        return [self._apply_roi(Detections.from_boxes(self.tracker.update_array(dets, frame)), frame)
+                for frame, dets in zip(frames, merged)]
+
+    def _track_batch(self, frames):
+        det_frames, scales, offsets = [], [], []
+        for slot, frame in enumerate(frames):
+            offset = (0, 0)
+            if settings.ROI_PRECROP and self.roi is not None:
+                # Nothing outside the ROI rectangle can pass the filter: don't spend YOLO on it
+                x1, y1, x2, y2 = self.roi.rect_for(frame.shape)
+                frame, offset = frame[y1:y2, x1:x2], (x1, y1)
+            det_frame, scale = self._detection_frame(frame, slot)
+            det_frames.append(det_frame)
+            scales.append(scale)
+            offsets.append(offset)
+
+        # v2.3: Lowered threshold for high sensitivity
+        results = self.model.predict(det_frames, classes=[2, 3, 5, 7], verbose=False,
+                                     conf=self.current_threshold)
+        batch_boxes = []
+        for frame, scale, offset, result in zip(frames, scales, offsets, results):
+            # Boxes back from detection resolution (and ROI pre-crop) to full-resolution pixels
+            # *before* ByteTrack: the slicing path and every resolution the Governor picks
+            # feed the tracker in one coordinate space, so live tracks keep their ids
+            dets = Detections.to_frame_pixels(result.boxes.cpu().numpy().data, scale, offset)
+            batch_boxes.append(self._apply_roi(Detections.from_boxes(self.tracker.update_array(dets, frame)), frame))
+        return batch_boxes
+
+    def _apply_roi(self, dets: Detections, frame) -> Detections:
+        # v2.3.5: Apply ROI Filter, v5.1: one vectorized centre-in-mask test for all boxes
+        if self.roi is None or len(dets) == 0:
+            return dets
+        keep = self.roi.contains(dets.xyxy, frame.shape)
+        return dets if keep.all() else dets[keep]
+
+    def monitor_agent_tune(self, track_density: float):
+        """
+        Monitor Agent: Auto-tunes detection threshold based on activity.
+        If density (tracks per frame) is very low, we lower the threshold to find more.
+        """
+        if self.sensitivity == "HIGH":
+            target = 0.15
+        elif self.sensitivity == "BALANCED":
+            target = 0.25
+        else:
+            target = 0.45
+
+        if track_density < 0.05: # Very few detections
+            self.current_threshold = max(0.1, self.current_threshold - 0.05)
+        elif track_density > 0.5: # Way too many, might be noise
+            self.current_threshold = min(0.6, self.current_threshold + 0.05)
+        
+        logger.info(f"[MONITOR AGENT] Tune ({self.name}): New Threshold = {self.current_threshold}")
@@ -0,0 +1,123 @@
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cumulative degradation steps, cheapest accuracy loss first. None = keep the video's baseline.
+DEGRADATION_LADDER = [
+    {"ocr_every": 1, "slicing": True,  "resolution": None, "stride": 1},
+    {"ocr_every": 2, "slicing": True,  "resolution": None, "stride": 1}, # Plate reads on every 2nd sighting
+    {"ocr_every": 2, "slicing": False, "resolution": None, "stride": 1}, # Drop tiles, keep the full-frame pass
+    {"ocr_every": 2, "slicing": False, "resolution": 960,  "stride": 1},
+    {"ocr_every": 2, "slicing": False, "resolution": 960,  "stride": 2}, # Twice the FRAME_SKIP_AI
+    {"ocr_every": 4, "slicing": False, "resolution": 960,  "stride": 2},
+    {"ocr_every": 4, "slicing": False, "resolution": 640,  "stride": 2},
+    {"ocr_every": 4, "slicing": False, "resolution": 640,  "stride": 3},
+]
+
+class ThroughputGovernor:
+    """
+    v5.1 Governor Agent: closed-loop control of processing speed. Every `interval_sec`
+    of wall time it compares media seconds processed per wall second against
+    `target_speed` (1.0 = real time, 3.0 = a 15-minute chunk in 5 minutes) and moves
+    one step along DEGRADATION_LADDER: down when too slow, back up when there is
+    comfortable headroom. Knobs are the reader's sampling stride (FRAME_SKIP_AI /
+    AI_SAMPLE_FPS), the session's detection resolution and slicing, and how often
+    tracks get plate detection + OCR. Every decision is kept for the analytics.
+    """
+
+    def __init__(self, target_speed: float, reader, session, interval_sec: float = 10.0,
+                 slow_margin: float = 0.95, fast_margin: float = 1.3, clock=time.monotonic):
+        self.target_speed = target_speed
+        self.reader = reader
+        self.session = session
+        self.interval_sec = interval_sec
+        self.slow_margin = slow_margin
+        self.fast_margin = fast_margin
+        self.clock = clock
+
+        self._base = {
+            "frame_skip": reader.frame_skip,
+            "sample_fps": reader.sample_fps,
+            "resolution": session.detection_resolution,
+            "slicing": session.slicing,
+        }
+        # Distinct knob settings only: steps that change nothing for this video (e.g. slicing already off) are skipped
+        self.levels = []
+        for step in DEGRADATION_LADDER:
+            knobs = self._effective(step)
+            if not self.levels or knobs != self.levels[-1]:
+                self.levels.append(knobs)
+        self.level = 0
+        self.decisions = []
+        self._window_start = None # (wall, media_ts)
+
+    def _effective(self, step: dict) -> dict:
+        base_res = self._base["resolution"]
+        res = base_res if step["resolution"] is None else (step["resolution"] if base_res <= 0 else min(base_res, step["resolution"]))
+        return {
+            "ocr_every": step["ocr_every"],
+            "slicing": self._base["slicing"] and step["slicing"],
+            "resolution": res,
+            "stride": step["stride"],
+        }
+
+    @property
+    def knobs(self) -> dict:
+        return self.levels[self.level]
+
+    @property
+    def ocr_every(self) -> int:
+        return self.knobs["ocr_every"]
+
+    def _apply(self):
+        knobs = self.knobs
+        self.reader.frame_skip = self._base["frame_skip"] * knobs["stride"]
+        if self._base["sample_fps"] > 0:
+            self.reader.sample_fps = self._base["sample_fps"] / knobs["stride"]
+        self.session.detection_resolution = knobs["resolution"]
+        self.session.slicing = knobs["slicing"]
+
+    def update(self, media_ts: float) -> bool:
+        """Call once per analysed frame with its media timestamp; returns True when the knobs changed."""
+        now = self.clock()
+        if self._window_start is None:
+            self._window_start = (now, media_ts)
+            return False
+        wall0, media0 = self._window_start
+        wall = now - wall0
+        if wall < self.interval_sec:
+            return False
+
+        speed = (media_ts - media0) / wall
+        self._window_start = (now, media_ts) # Each decision is judged on a fresh window
+        if speed < self.target_speed * self.slow_margin and self.level + 1 < len(self.levels):
+            self.level += 1
+            reason = "behind target"
+        elif speed > self.target_speed * self.fast_margin and self.level > 0:
+            self.level -= 1
+            reason = "headroom, restoring accuracy"
+        else:
+            return False
+
+        self._apply()
+        decision = {
+            "media_ts": round(media_ts, 2),
+            "speed": round(speed, 3),
+            "target": self.target_speed,
+            "level": self.level,
+            "reason": reason,
+            **self.knobs,
+        }
+        self.decisions.append(decision)
+        logger.info(f"[GOVERNOR AGENT] {reason}: {speed:.2f}x vs {self.target_speed:.2f}x -> level {self.level} {self.knobs}")
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "target_speed": self.target_speed,
+            "final_level": self.level,
+            "max_level": max([d["level"] for d in self.decisions], default=0),
+            "final_knobs": self.knobs,
+            "decisions": self.decisions,
+        }
@@ -1,10 +1,280 @@
 import os
+import time
+import shutil
+import hashlib
+import threading
 import subprocess
 import logging
+import cv2
+import numpy as np
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Shared by the file (re-encode) and stream (rawvideo pipe) conditioning modes
+CONDITIONED_FPS = 30.0
+FPS_FILTER = f'fps=fps={int(CONDITIONED_FPS)}'
+SHARPEN_FILTER = 'unsharp=5:5:1.5:5:5:0.0'
+CONDITIONING_FILTERS = f'{FPS_FILTER},{SHARPEN_FILTER}'
+
+def stream_filters(frame_step: int = 1) -> str:
+    """
+    Filter chain for the rawvideo pipe. With frame_step > 1 unsampled frames are
+    dropped right after CFR resampling, so they are never sharpened, converted
+    to BGR or copied through the pipe.
+    """
+    if frame_step <= 1:
+        return CONDITIONING_FILTERS
+    return f'{FPS_FILTER},select=not(mod(n\\,{frame_step})),{SHARPEN_FILTER}'
+
+class FFmpegFrameStream:
+    """
+    v5.1 Streaming Ingest: cv2.VideoCapture-compatible reader over an FFmpeg
+    rawvideo pipe. FFmpeg conditions (CFR + Sharpening) in its own process while
+    the detection loop consumes frames, and no intermediate file is written.
+
+    Frames are decoded into a ring of preallocated BGR buffers. A returned frame
+    stays valid until `buffer_frames` further reads; copy it to keep it longer.
+    With frame_step > 1 only every frame_step-th conditioned frame is emitted.
+    start_sec/duration_sec restrict the stream to a time range (virtual chunks).
+    """
+
+    def __init__(self, input_path: str, width: int, height: int, frame_count: int,
+                 fps: float = CONDITIONED_FPS, buffer_frames: int = 4, frame_step: int = 1,
+                 start_sec: float = 0.0, duration_sec: float = 0.0):
+        self.input_path = input_path
+        self.width, self.height = width, height
+        self.fps = fps
+        self.frame_count = frame_count
+        self.frame_step = max(1, frame_step)
+        self.frame_bytes = width * height * 3
+        self.frame_idx = 0
+
+        self._ring = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(max(1, buffer_frames))]
+        self._ring_pos = 0
+        self._scratch = None # Lazily allocated sink for grab()
+
+        cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error']
+        if start_sec > 0:
+            cmd += ['-ss', f"{start_sec:.6f}"] # Input seek: decoding starts at the nearest keyframe
+        cmd += ['-i', input_path]
+        if duration_sec > 0:
+            cmd += ['-t', f"{duration_sec:.6f}"]
+        cmd += [
+            '-filter:v', stream_filters(self.frame_step),
+            '-vsync', 'passthrough', # Never duplicate frames to refill dropped slots
+            '-f', 'rawvideo',
+            '-pix_fmt', 'bgr24',
+            'pipe:1'
+        ]
+        # bufsize=0: readinto() lands directly in our frame buffers (no extra copy)
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        self._opened = True
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def _fill(self, buf: np.ndarray) -> bool:
+        view = memoryview(buf).cast('B')
+        got = 0
+        while got < self.frame_bytes:
+            n = self.proc.stdout.readinto(view[got:])
+            if not n:
+                if got:
+                    logger.warning(f"[STREAM INGEST] Truncated frame at index {self.frame_idx} ({got}/{self.frame_bytes} bytes)")
+                self._opened = False
+                return False
+            got += n
+        self.frame_idx += 1
+        return True
+
+    def read(self, image: np.ndarray = None):
+        if not self._opened:
+            return False, None
+        if image is None:
+            image = self._ring[self._ring_pos]
+            self._ring_pos = (self._ring_pos + 1) % len(self._ring)
+        if not self._fill(image):
+            return False, None
+        return True, image
+
+    def grab(self) -> bool:
+        if not self._opened:
+            return False
+        if self._scratch is None:
+            self._scratch = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        return self._fill(self._scratch)
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_FPS: return self.fps
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH: return float(self.width)
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT: return float(self.height)
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT: return float(self.frame_count)
+        if prop_id == cv2.CAP_PROP_POS_FRAMES: return float(self.frame_idx)
+        return 0.0
+
+    def release(self):
+        self._opened = False
+        if self.proc.poll() is None:
+            self.proc.kill()
+        try:
+            self.proc.stdout.close()
+        except Exception:
+            pass
+        code = self.proc.wait()
+        if code not in (0, -9):
+            logger.warning(f"[STREAM INGEST] FFmpeg exited with code {code} for {self.input_path}")
+
+class ConditioningCache:
+    """
+    v5.1: Content-addressed store for conditioned footage.
+    Entries are keyed by a hash of the source bytes plus the FFmpeg recipe, so
+    reprocessing the same upload (settings changes, chunk retries) skips FFmpeg.
+    The directory is kept under a disk budget with LRU eviction (mtime = last use).
+    Hashing a source reads all of it, so every entry also leaves a small `.source`
+    hint keyed by (path, size, mtime) that peek() checks without touching the bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._digests = {} # (path, size, mtime_ns) -> source digest
+
+    def _stat_key(self, input_path: str) -> tuple:
+        st = os.stat(input_path)
+        return os.path.abspath(input_path), st.st_size, st.st_mtime_ns
+
+    def _source_digest(self, input_path: str) -> str:
+        memo_key = self._stat_key(input_path)
+        digest = self._digests.get(memo_key)
+        if digest is None:
+            h = hashlib.blake2b(digest_size=16)
+            with open(input_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+            digest = h.hexdigest()
+            self._digests[memo_key] = digest
+        return digest
+
+    def key_for(self, input_path: str, recipe: str) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self._source_digest(input_path).encode())
+        h.update(recipe.encode())
+        return h.hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.mp4")
+
+    def _hint_path(self, input_path: str, recipe: str) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr(self._stat_key(input_path)).encode())
+        h.update(recipe.encode())
+        return os.path.join(self.root, f"{h.hexdigest()}.source")
+
+    def remember(self, input_path: str, recipe: str, key: str):
+        """Records that this exact source file (path, size, mtime) conditions to `key`."""
+        try:
+            with open(self._hint_path(input_path, recipe), "w") as f:
+                f.write(key)
+        except OSError as e:
+            logger.warning(f"[CONDITIONING CACHE] Could not record source hint for {input_path}: {e}")
+
+    def peek(self, input_path: str, recipe: str):
+        """Cached path for a source seen before by process(), found by stat alone; None otherwise (no hashing)."""
+        try:
+            with open(self._hint_path(input_path, recipe)) as f:
+                key = f.read().strip()
+        except OSError:
+            return None
+        return self.lookup(key)
+
+    def lookup(self, key: str):
+        path = self.path_for(key)
+        if os.path.exists(path):
+            os.utime(path) # Refresh LRU position
+            self._bump("hits")
+            return path
+        self._bump("misses")
+        return None
+
+    def store(self, tmp_path: str, key: str) -> str:
+        path = self.path_for(key)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: str = None):
+        with self._lock:
+            entries = []
+            hints = []
+            for name in os.listdir(self.root):
+                if name.endswith(".source"): hints.append(os.path.join(self.root, name))
+                if not name.endswith(".mp4") or ".partial" in name: continue
+                full = os.path.join(self.root, name)
+                try:
+                    st = os.stat(full)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+            total = sum(e[1] for e in entries)
+            for _, size, full in sorted(entries):
+                if total <= self.max_bytes: break
+                if full == keep: continue
+                try:
+                    os.remove(full)
+                    total -= size
+                    self._bump("evictions")
+                    logger.info(f"[CONDITIONING CACHE] Evicted {os.path.basename(full)} ({size / 1e6:.1f} MB)")
+                except OSError as e:
+                    logger.warning(f"[CONDITIONING CACHE] Eviction failed for {full}: {e}")
+            # Hints whose entry is gone would only cost a lookup miss, drop them with it
+            for hint in hints:
+                try:
+                    with open(hint) as f:
+                        if not os.path.exists(self.path_for(f.read().strip())):
+                            os.remove(hint)
+                except OSError:
+                    pass
+
+    def _bump(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        # Mirror to Redis so API processes can report counters from Celery workers
+        try:
+            import redis
+            r = redis.from_url(settings.REDIS_URL, decode_responses=True)
+            r.incr(f"conditioning_cache:{counter}")
+        except: pass
+
+    def stats(self) -> dict:
+        counters = {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+        try:
+            import redis
+            r = redis.from_url(settings.REDIS_URL, decode_responses=True, socket_timeout=1)
+            shared = r.mget([f"conditioning_cache:{c}" for c in counters])
+            if any(v is not None for v in shared):
+                counters = {c: int(v or 0) for c, v in zip(counters, shared)}
+        except: pass
+
+        size_bytes, entries = 0, 0
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                if name.endswith(".mp4") and ".partial" not in name:
+                    size_bytes += os.path.getsize(os.path.join(self.root, name))
+                    entries += 1
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size_bytes,
+            "budget_bytes": self.max_bytes,
+        }
+
 class VideoConditionerAgent:
     """
     Standardizes raw footage:
@@ -13,16 +283,44 @@ class VideoConditionerAgent:
     3. Sharpens (Unsharp Mask)
     4. Stabilizes (if enabled)
     """
-    
+
+    # Encoder settings are part of the cache key alongside the filter chain
+    ENCODE_ARGS = ['-c:v', 'libx264', '-crf', '18', '-preset', 'veryfast']
+
+    def __init__(self):
+        self.cache_dir = os.path.join(settings.STORAGE_PATH, "conditioned")
+        self.cache = ConditioningCache(self.cache_dir, int(settings.CONDITIONING_CACHE_MAX_GB * 1024**3))
+
+    @property
+    def recipe(self) -> str:
+        return " ".join([CONDITIONING_FILTERS] + self.ENCODE_ARGS)
+
+    def _cached(self, input_path: str):
+        """Returns (cache_key, cached_path or None). Key is None when caching is off."""
+        if not settings.ENABLE_CONDITIONING_CACHE:
+            return None, None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        key = self.cache.key_for(input_path, self.recipe)
+        cached_path = self.cache.lookup(key)
+        if cached_path:
+            self.cache.remember(input_path, self.recipe, key)
+        return key, cached_path
+
     def process(self, input_path: str) -> str:
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"Source video not found: {input_path}")
-            
-        filename = os.path.basename(input_path)
-        output_name = f"conditioned_{filename}.mp4"
-        output_dir = os.path.join(settings.STORAGE_PATH, "conditioned")
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, output_name)
+
+        # v5.1: Content-addressed cache hit skips FFmpeg entirely
+        cache_key, cached_path = self._cached(input_path)
+        if cached_path:
+            logger.info(f"[CONDITIONING CACHE] Hit for {input_path} -> {cached_path}")
+            return cached_path
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if cache_key:
+            output_path = os.path.join(self.cache_dir, f"{cache_key}.partial.{os.getpid()}.{int(time.time() * 1000)}.mp4")
+        else:
+            output_path = os.path.join(self.cache_dir, f"conditioned_{os.path.basename(input_path)}.mp4")
         
         logger.info(f"Conditioning video: {input_path} -> {output_path}")
         
@@ -32,10 +330,8 @@ class VideoConditionerAgent:
         cmd = [
             'ffmpeg', '-y',
             '-i', input_path,
-            '-filter:v', 'fps=fps=30,unsharp=5:5:1.5:5:5:0.0',
-            '-c:v', 'libx264',
-            '-crf', '18',
-            '-preset', 'veryfast',
+            '-filter:v', CONDITIONING_FILTERS,
+            *self.ENCODE_ARGS,
             output_path
         ]
         
@@ -44,12 +340,71 @@ class VideoConditionerAgent:
             result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
             if result.returncode != 0:
                 logger.error(f"FFmpeg error: {result.stderr}")
+                if os.path.exists(output_path): os.remove(output_path)
                 return input_path # Fallback to original on failure
                 
             logger.info("Conditioning complete")
+            if cache_key:
+                cached_path = self.cache.store(output_path, cache_key)
+                self.cache.remember(input_path, self.recipe, cache_key)
+                return cached_path
             return output_path
         except Exception as e:
             logger.error(f"Failed to condition video: {e}")
             return input_path # Fallback
 
+    def open_stream(self, input_path: str, frame_step: int = 1, start_sec: float = 0.0, duration_sec: float = 0.0):
+        """
+        v5.1: Streaming conditioning. Returns a capture that yields conditioned
+        frames straight from FFmpeg (no re-encode, no intermediate file).
+        frame_step > 1 skips unsampled frames inside FFmpeg (see stream_filters).
+        start_sec/duration_sec select a time range of the source (virtual chunks); the
+        FFmpeg pipe ends with the range, plain captures are only seeked to its start.
+        Falls back to a plain cv2.VideoCapture on the original when FFmpeg is unavailable.
+        """
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Source video not found: {input_path}")
+
+        # A previously conditioned copy is already CFR + sharpened: decode it directly.
+        # Only FILE mode writes entries, so look them up by stat instead of hashing the source per chunk
+        cached_path = None
+        if settings.ENABLE_CONDITIONING_CACHE and os.path.isdir(self.cache_dir):
+            cached_path = self.cache.peek(input_path, self.recipe)
+        if cached_path:
+            logger.info(f"[CONDITIONING CACHE] Hit for {input_path}, streaming cached copy")
+            return self._seek(cv2.VideoCapture(cached_path), start_sec)
+
+        probe = cv2.VideoCapture(input_path)
+        try:
+            if not probe.isOpened():
+                raise Exception(f"Could not open video file {input_path}")
+            width = int(probe.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            src_fps = probe.get(cv2.CAP_PROP_FPS) or CONDITIONED_FPS
+            src_frames = probe.get(cv2.CAP_PROP_FRAME_COUNT)
+        finally:
+            probe.release()
+
+        if shutil.which('ffmpeg') is None or width <= 0 or height <= 0:
+            logger.warning("[STREAM INGEST] FFmpeg unavailable or probe failed, reading original without conditioning.")
+            return self._seek(cv2.VideoCapture(input_path), start_sec)
+
+        # fps filter resamples to CFR, so the expected count follows the source duration
+        frame_count = int(round(src_frames / src_fps * CONDITIONED_FPS)) if src_frames > 0 else 0
+        if duration_sec > 0:
+            frame_count = int(round(duration_sec * CONDITIONED_FPS))
+        logger.info(f"Streaming conditioned frames: {input_path} ({width}x{height} @ {CONDITIONED_FPS} FPS)")
+        return FFmpegFrameStream(
+            input_path, width, height, frame_count,
+            buffer_frames=settings.STREAM_BUFFER_FRAMES,
+            frame_step=frame_step,
+            start_sec=start_sec,
+            duration_sec=duration_sec
+        )
+
+    def _seek(self, cap, start_sec: float):
+        if start_sec > 0 and cap.isOpened():
+            cap.set(cv2.CAP_PROP_POS_MSEC, start_sec * 1000.0)
+        return cap
+
 ingest_manager = VideoConditionerAgent()
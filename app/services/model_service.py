@@ -0,0 +1,129 @@
+import os
+import glob
+import shutil
+import hashlib
+import threading
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+def weights_hash(path: str) -> str:
+    """sha256 of the weights file; names the exports so retrained weights never reuse a stale one."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def export_cache_path(weights_path: str, variant: str = "onnx") -> str:
+    """<weights dir>/<stem>.<hash12>.<variant>, e.g. weights/yolov8n.3fa1c2d4e5b6.onnx"""
+    stem = os.path.splitext(weights_path)[0]
+    return f"{stem}.{weights_hash(weights_path)[:12]}.{variant}"
+
+def cached_export(weights_path: str, export, variant: str = "onnx") -> str:
+    """
+    Returns the cached export of `weights_path`, calling `export(weights_path) -> produced file`
+    only when no export for the current weight hash exists. Exports of older weights are removed.
+    """
+    target = export_cache_path(weights_path, variant)
+    if os.path.exists(target):
+        return target
+    stem = os.path.splitext(weights_path)[0]
+    for stale in glob.glob(f"{glob.escape(stem)}.{'[0-9a-f]' * 12}.{variant}"):
+        os.remove(stale)
+        logger.info(f"[MODEL AGENT] Removed stale export {stale}")
+    produced = export(weights_path)
+    if os.path.abspath(produced) != os.path.abspath(target):
+        shutil.move(produced, target)
+    logger.info(f"[MODEL AGENT] Exported {weights_path} -> {target}")
+    return target
+
+def _export_onnx(weights_path: str) -> str:
+    from ultralytics import YOLO
+    # Dynamic axes: micro-batches, slicing tiles and detection resolution all vary the input shape
+    return YOLO(weights_path).export(format="onnx", dynamic=True, verbose=False)
+
+def session_options():
+    """CPU session tuned for our nodes: all physical cores for one graph, no inter-op pool."""
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opts.intra_op_num_threads = settings.ONNX_THREADS if settings.ONNX_THREADS > 0 else max(1, (os.cpu_count() or 2) // 2)
+    opts.inter_op_num_threads = 1
+    return opts
+
+def _tune_session(model, onnx_path: str):
+    # ultralytics builds its onnxruntime session with default options on the first predict;
+    # build the predictor with a tiny frame, then swap in a session with our thread settings.
+    import numpy as np
+    model.predict(np.zeros((64, 64, 3), dtype=np.uint8), verbose=False)
+    backend = model.predictor.model
+    backend.session = ort.InferenceSession(onnx_path, session_options(), providers=["CPUExecutionProvider"])
+
+class SharedModel:
+    """
+    v5.1: One loaded YOLO model used by several DetectionSessions (threads). The
+    ultralytics predictor keeps per-call state (args, dataset, batch), so forward
+    passes on the same model are serialized; per-video state (tracker, threshold,
+    ROI) lives in the sessions, and the weights are loaded once per process.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+
+    def predict(self, *args, **kwargs):
+        with self.lock:
+            return self.model.predict(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        return self.predict(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+def load_onnx(onnx_path: str):
+    from ultralytics import YOLO
+    model = YOLO(onnx_path, task="detect")
+    _tune_session(model, onnx_path)
+    return model
+
+def load_detector(weights_path: str, backend: str = None):
+    """
+    v5.1 Model Agent: YOLO model for `weights_path` on the selected inference backend.
+    - "torch": the .pt weights as before.
+    - "onnx": a cached ONNX export run by onnxruntime on CPU, with tuned thread settings.
+    - "int8": the statically quantized export, only if bench_quantization.py approved it
+      for these exact weights; otherwise the float ONNX export.
+    Either way the caller gets an ultralytics YOLO object, so predict()/track() results
+    (Boxes, track ids) are identical in shape. Falls back to torch when onnxruntime is
+    missing or the export fails.
+    """
+    from ultralytics import YOLO
+    backend = (backend or settings.INFERENCE_BACKEND).lower()
+    if backend in ("onnx", "int8") and os.path.exists(weights_path):
+        if not ONNXRUNTIME_AVAILABLE:
+            logger.warning("[MODEL AGENT] onnxruntime not installed. Falling back to PyTorch.")
+        else:
+            try:
+                if backend == "int8":
+                    from app.services.quantization_service import is_approved
+                    int8_path = export_cache_path(weights_path, "int8.onnx")
+                    if is_approved(weights_path) and os.path.exists(int8_path):
+                        logger.info(f"[MODEL AGENT] {weights_path}: INT8 ONNX Runtime CPU ({int8_path})")
+                        return load_onnx(int8_path)
+                    logger.warning(f"[MODEL AGENT] No approved INT8 export for {weights_path} "
+                                   f"(run bench_quantization.py). Using float ONNX.")
+                onnx_path = cached_export(weights_path, _export_onnx, "onnx")
+                logger.info(f"[MODEL AGENT] {weights_path}: ONNX Runtime CPU ({onnx_path})")
+                return load_onnx(onnx_path)
+            except Exception as e:
+                logger.warning(f"[MODEL AGENT] ONNX backend failed for {weights_path}: {e}. Falling back to PyTorch.")
+    return YOLO(weights_path)
@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class MotionGateAgent:
+    """
+    v5.1 Motion Gate: cheap background subtraction (MOG2 on a small grayscale copy),
+    restricted to the ROI mask, that decides whether a sampled frame is worth a
+    YOLO pass. After motion stops the gate stays open for MOTION_HANGOVER_SEC so
+    tracks can exit cleanly; while idle it asks the reader for a sparser sampling
+    stride and drops back to the normal rate as soon as motion resumes.
+    One instance per video (the background model is stateful).
+    """
+
+    def __init__(self, roi_mask: np.ndarray = None, work_width: int = 320):
+        self.work_width = work_width
+        self.min_area_ratio = settings.MOTION_MIN_AREA_RATIO
+        self.hangover_sec = settings.MOTION_HANGOVER_SEC
+        self.idle_stride = max(1, settings.MOTION_IDLE_STRIDE)
+        self.warmup_frames = 10 # Background model needs a few frames before it can be trusted
+
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(history=200, varThreshold=25, detectShadows=False)
+        self.roi_mask = roi_mask
+        self._roi_small = None
+        self._roi_area = 0
+        self._work_size = None
+        self._last_motion_ts = None
+
+        self.active = True
+        self.evaluated_frames = 0
+        self.gated_frames = 0
+        self.motion_frames = 0
+
+    def _prepare(self, frame: np.ndarray):
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.work_width / float(w))
+        self._work_size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        if self.roi_mask is not None:
+            small = cv2.resize(self.roi_mask, self._work_size, interpolation=cv2.INTER_NEAREST)
+            self._roi_small = np.where(small > 0, 255, 0).astype(np.uint8)
+            self._roi_area = int(cv2.countNonZero(self._roi_small))
+        if not self._roi_area:
+            self._roi_small = None
+            self._roi_area = self._work_size[0] * self._work_size[1]
+
+    def check(self, frame: np.ndarray, timestamp: float) -> bool:
+        """Returns True when the frame should go through vehicle detection."""
+        if self._work_size is None:
+            self._prepare(frame)
+
+        small = cv2.resize(frame, self._work_size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        fg = self.subtractor.apply(gray)
+        if self._roi_small is not None:
+            fg = cv2.bitwise_and(fg, self._roi_small)
+
+        self.evaluated_frames += 1
+        moving = cv2.countNonZero(fg) / self._roi_area >= self.min_area_ratio
+        if moving or self.evaluated_frames <= self.warmup_frames:
+            self._last_motion_ts = timestamp
+        if moving:
+            self.motion_frames += 1
+
+        was_active = self.active
+        self.active = self._last_motion_ts is not None and timestamp - self._last_motion_ts <= self.hangover_sec
+        if was_active != self.active:
+            logger.info(f"[MOTION GATE] {'Activity resumed' if self.active else 'Scene idle'} at {timestamp:.1f}s")
+        if not self.active:
+            self.gated_frames += 1
+        return self.active
+
+    @property
+    def stride_scale(self) -> int:
+        """Sampling stride multiplier for the frame reader."""
+        return 1 if self.active else self.idle_stride
+
+    def stats(self, avg_detect_sec: float = 0.0) -> dict:
+        return {
+            "evaluated_frames": self.evaluated_frames,
+            "gated_frames": self.gated_frames,
+            "motion_frames": self.motion_frames,
+            "gated_ratio": self.gated_frames / self.evaluated_frames if self.evaluated_frames else 0.0,
+            "idle_stride": self.idle_stride,
+            "estimated_saved_sec": round(self.gated_frames * avg_detect_sec, 2),
+        }
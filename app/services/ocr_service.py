@@ -0,0 +1,302 @@
+import time
+import bisect
+import logging
+import threading
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+import cv2
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def plate_quality(crop: np.ndarray, sharpness_ref: float = 100.0) -> float:
+    """Pixel height weighted by sharpness (Laplacian variance, saturating at `sharpness_ref`)."""
+    if crop is None or crop.size == 0:
+        return 0.0
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+    return crop.shape[0] * min(1.0, sharpness / sharpness_ref)
+
+class PlateCandidate:
+    __slots__ = ("score", "crop", "read")
+
+    def __init__(self, score: float, crop: np.ndarray):
+        self.score = score
+        self.crop = crop
+        self.read = False
+
+class PlateCandidates:
+    """
+    v5.1 OCR Scheduler: one track's plate crops. Only the `top_k` best by quality are
+    kept; a crop is OCR'd right away only when it out-scores the best crop that already
+    gave a read by `min_gain`, and never more than `budget` times per track. One read is
+    held back for finalize(), which reads the best unread candidate when the track is
+    handed to the Jury.
+    """
+
+    def __init__(self, top_k: int, budget: int, min_height: int, min_gain: float,
+                 sharpness_ref: float, counters: Counter = None):
+        self.top_k = top_k
+        self.budget = budget
+        self.min_height = min_height
+        self.min_gain = min_gain
+        self.sharpness_ref = sharpness_ref
+        self.counters = counters if counters is not None else Counter()
+        self.candidates = [] # Best first
+        self.reads = 0
+        self.best_read_score = 0.0
+        self.finalized = False
+
+    def offer(self, crop: np.ndarray):
+        """Ranks a new plate crop; returns the PlateCandidate to OCR now, or None."""
+        self.counters["crops"] += 1
+        if self.finalized or crop is None or crop.size == 0:
+            self.counters["deferred"] += 1
+            return None
+        if crop.shape[0] < self.min_height:
+            self.counters["too_small"] += 1
+            return None
+        score = plate_quality(crop, self.sharpness_ref)
+        if len(self.candidates) >= self.top_k and score <= self.candidates[-1].score:
+            self.counters["deferred"] += 1
+            return None
+
+        cand = PlateCandidate(score, crop.copy())
+        pos = bisect.bisect_right([-c.score for c in self.candidates], -score)
+        self.candidates.insert(pos, cand)
+        del self.candidates[self.top_k:]
+
+        if score > self.best_read_score * self.min_gain and self.reads < self.budget - 1:
+            return self._read(cand)
+        self.counters["deferred"] += 1
+        return None
+
+    def record(self, cand: PlateCandidate, text):
+        """Result of OCR on `cand`; only a crop that produced text raises the bar for later reads."""
+        if text:
+            self.best_read_score = max(self.best_read_score, cand.score)
+
+    def finalize(self):
+        """Track is final: returns the best unread candidate (within budget) to OCR, or None. Frees the crops."""
+        if self.finalized:
+            return None
+        self.finalized = True
+        unread = [c for c in self.candidates if not c.read and c.score > self.best_read_score]
+        self.candidates = []
+        if not unread or self.reads >= self.budget:
+            return None
+        self.counters["final_reads"] += 1
+        return self._read(unread[0])
+
+    def _read(self, cand: PlateCandidate) -> PlateCandidate:
+        cand.read = True
+        self.reads += 1
+        self.counters["reads"] += 1
+        return cand
+
+class OCRScheduler:
+    """Builds PlateCandidates from settings for every track of a video and aggregates their counters."""
+
+    def __init__(self, top_k: int = None, budget: int = None, min_height: int = None,
+                 min_gain: float = None, sharpness_ref: float = None):
+        self.top_k = top_k or settings.OCR_TOP_K
+        self.budget = budget or settings.OCR_BUDGET_PER_TRACK
+        self.min_height = settings.OCR_MIN_PLATE_HEIGHT if min_height is None else min_height
+        self.min_gain = min_gain or settings.OCR_MIN_GAIN
+        self.sharpness_ref = sharpness_ref or settings.OCR_SHARPNESS_REF
+        self.counters = Counter()
+        self.tracks = 0
+
+    def track(self) -> PlateCandidates:
+        self.tracks += 1
+        return PlateCandidates(self.top_k, self.budget, self.min_height, self.min_gain,
+                               self.sharpness_ref, self.counters)
+
+    def stats(self) -> dict:
+        crops, reads = self.counters["crops"], self.counters["reads"]
+        return {
+            "tracks": self.tracks,
+            "plate_crops": crops,
+            "ocr_reads": reads,
+            "final_reads": self.counters["final_reads"],
+            "too_small": self.counters["too_small"],
+            "reads_per_track": round(reads / self.tracks, 2) if self.tracks else 0.0,
+            "ocr_saved_pct": round(100.0 * (1 - reads / crops), 1) if crops else 0.0,
+        }
+
+def pad_batch(crops: list) -> list:
+    """Pads crops (bottom/right, their own mean colour) to the batch's largest size, for engines that need one shape."""
+    h = max(c.shape[0] for c in crops)
+    w = max(c.shape[1] for c in crops)
+    padded = []
+    for c in crops:
+        fill = c.reshape(-1, c.shape[2] if c.ndim == 3 else 1).mean(axis=0).tolist()
+        padded.append(cv2.copyMakeBorder(c, 0, h - c.shape[0], 0, w - c.shape[1], cv2.BORDER_CONSTANT, value=fill))
+    return padded
+
+def plate_phash(crop: np.ndarray) -> int:
+    """64-bit DCT perceptual hash: low 8x8 frequencies of the 32x32 grey crop against their median (DC excluded)."""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    low = cv2.dct(cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32))[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+class PlateOCRCache:
+    """
+    v5.1 OCR Cache: bounded LRU of raw OCR engine reads keyed by (scope, size bucket,
+    perceptual hash) of the preprocessed plate crop. Scope is the track, so a crop
+    only reuses reads of its own vehicle; within a scope and size bucket any hash
+    within `max_hamming` bits counts as the same crop (stationary or slow vehicles).
+    """
+
+    def __init__(self, max_entries: int = 512, max_hamming: int = 4, bucket_px: int = 16):
+        self.max_entries = max_entries
+        self.max_hamming = max_hamming
+        self.bucket_px = bucket_px
+        self._entries = OrderedDict() # (scope, bucket, hash) -> read
+        self._hashes = {} # (scope, bucket) -> set of hashes, for near-duplicate lookup
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def key(self, scope, crop: np.ndarray) -> tuple:
+        h, w = crop.shape[:2]
+        return scope, (h // self.bucket_px, w // self.bucket_px), plate_phash(crop)
+
+    def get(self, key: tuple):
+        """Read cached for this crop or a near-duplicate of it, else None."""
+        scope, bucket, phash = key
+        with self._lock:
+            if key not in self._entries:
+                near = [other for other in self._hashes.get((scope, bucket), ())
+                        if bin(other ^ phash).count("1") <= self.max_hamming]
+                if not near:
+                    self.misses += 1
+                    return None
+                key = (scope, bucket, min(near, key=lambda other: bin(other ^ phash).count("1")))
+                self.near_hits += 1
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: tuple, read):
+        scope, bucket, phash = key
+        with self._lock:
+            self._entries[key] = read
+            self._entries.move_to_end(key)
+            self._hashes.setdefault((scope, bucket), set()).add(phash)
+            while len(self._entries) > self.max_entries:
+                (old_scope, old_bucket, old_hash), _ = self._entries.popitem(last=False)
+                hashes = self._hashes[(old_scope, old_bucket)]
+                hashes.discard(old_hash)
+                if not hashes:
+                    del self._hashes[(old_scope, old_bucket)]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "near_duplicate_hits": self.near_hits,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+class OCRQueue:
+    """
+    v5.1 OCR Queue Agent: plate crops from all tracks and frames of a video are queued
+    and recognized on a worker thread in batches of `batch_size` (a batch also goes once
+    its oldest crop waited `max_wait_sec`). submit() returns a Future; the optional
+    callback gets the recognize() result for that crop on the worker thread. Items are
+    passed to recognize() as submitted (a crop, or a crop with its track scope).
+    """
+
+    def __init__(self, recognize, batch_size: int, max_wait_sec: float = 0.05, clock=time.perf_counter):
+        self.recognize = recognize # list of crops -> list of results
+        self.batch_size = max(1, batch_size)
+        self.max_wait_sec = max_wait_sec
+        self.clock = clock
+        self._jobs = deque() # (crop, future, callback, submitted_at)
+        self._cv = threading.Condition()
+        self._closed = False
+        self._thread = None
+        self.batches = 0
+        self.crops = 0
+        self.ocr_sec = 0.0
+        self.latencies = deque(maxlen=2000) # submit -> result, seconds
+
+    def submit(self, crop, callback=None) -> Future:
+        future = Future()
+        with self._cv:
+            if self._closed:
+                raise RuntimeError("OCR queue is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ocr-queue", daemon=True)
+                self._thread.start()
+            self._jobs.append((crop, future, callback, self.clock()))
+            self._cv.notify()
+        return future
+
+    def _next_batch(self) -> list:
+        with self._cv:
+            while True:
+                if self._jobs:
+                    if len(self._jobs) >= self.batch_size or self._closed:
+                        break
+                    wait = self.max_wait_sec - (self.clock() - self._jobs[0][3])
+                    if wait <= 0:
+                        break
+                    self._cv.wait(wait)
+                elif self._closed:
+                    return []
+                else:
+                    self._cv.wait()
+            return [self._jobs.popleft() for _ in range(min(self.batch_size, len(self._jobs)))]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            t0 = self.clock()
+            try:
+                results = self.recognize([job[0] for job in batch])
+            except Exception as e:
+                logger.error(f"[OCR QUEUE] Batch of {len(batch)} failed: {e}")
+                for _, future, _, _ in batch:
+                    future.set_exception(e)
+                continue
+            done = self.clock()
+            self.batches += 1
+            self.crops += len(batch)
+            self.ocr_sec += done - t0
+            for (_, future, callback, submitted), result in zip(batch, results):
+                self.latencies.append(done - submitted)
+                if callback is not None:
+                    try:
+                        callback(result)
+                    except Exception as e:
+                        logger.error(f"[OCR QUEUE] Result callback failed: {e}")
+                future.set_result(result)
+
+    def close(self):
+        """Recognizes whatever is still queued, then stops the worker."""
+        with self._cv:
+            self._closed = True
+            self._cv.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self) -> dict:
+        lat = np.array(self.latencies) * 1000.0
+        return {
+            "batch_size": self.batch_size,
+            "batches": self.batches,
+            "crops": self.crops,
+            "avg_batch_fill": round(self.crops / (self.batches * self.batch_size), 3) if self.batches else 0.0,
+            "avg_ocr_ms_per_crop": round(self.ocr_sec * 1000.0 / self.crops, 2) if self.crops else 0.0,
+            "queue_latency_ms_avg": round(float(lat.mean()), 2) if len(lat) else 0.0,
+            "queue_latency_ms_p95": round(float(np.percentile(lat, 95)), 2) if len(lat) else 0.0,
+        }
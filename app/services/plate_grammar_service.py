@@ -0,0 +1,132 @@
+import os
+import re
+import json
+import itertools
+import logging
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Characters local OCR swaps for one another on plates (consensus voting and format corrections)
+CONFUSION_GROUPS = ["0ODQ", "8B", "1IL", "5S", "2Z", "6G"]
+_CONFUSABLE = {c: g.replace(c, "") for g in CONFUSION_GROUPS for c in g}
+
+INDIAN_STATE_CODES = [
+    "AN", "AP", "AR", "AS", "BR", "CH", "CT", "DN", "DD", "DL", "GA", "GJ", "HR", "HP", "JK", "JH", "KA",
+    "KL", "LD", "MP", "MH", "MN", "ML", "MZ", "NL", "OD", "OR", "PY", "PB", "RJ", "SK", "TN", "TG", "TS",
+    "TR", "UP", "UK", "UA", "WB",
+]
+
+# Declarations: per region an optional code list (token R) and formats made of space-separated
+# tokens: R = region code, D / L = digit / letter with an optional {n} or {m,n} count, anything
+# else is literal. PLATE_FORMATS_PATH may add or override regions with the same JSON shape.
+PLATE_FORMATS = {
+    "IN": {
+        "codes": INDIAN_STATE_CODES,
+        "formats": ["R D{1,2} L{1,3} D{1,4}", "R D{1,2} D{4}"],
+    },
+    "IN-BH": { # Bharat series: year, BH, number, letters
+        "formats": ["D{2} BH D{4} L{1,2}"],
+    },
+}
+
+_TOKEN = re.compile(r"^([DL])(?:\{(\d+)(?:,(\d+))?\})?$")
+
+def compile_format(spec: str, codes=None) -> str:
+    """Regex source for one declared format."""
+    parts = []
+    for token in spec.split():
+        m = _TOKEN.match(token)
+        if token == "R":
+            if not codes:
+                raise ValueError(f"Format '{spec}' uses R but the region declares no codes")
+            parts.append("(?:" + "|".join(sorted(map(re.escape, codes), key=len, reverse=True)) + ")")
+        elif m:
+            lo = m.group(2) or "1"
+            hi = m.group(3) if m.group(3) is not None else lo
+            count = "" if (lo, hi) == ("1", "1") else (f"{{{lo}}}" if lo == hi else f"{{{lo},{hi}}}")
+            parts.append(("[0-9]" if m.group(1) == "D" else "[A-Z]") + count)
+        else:
+            parts.append(re.escape(token))
+    return "".join(parts)
+
+class PlateGrammar:
+    """
+    v5.1 Grammar Agent: the plate formats of the regions we deploy in, compiled once into
+    one precompiled regex per region (plus a combined one for plain validity). A region's
+    codes are part of its regex, so an undeclared state/RTO code never matches.
+    correct() proposes the format-valid readings reachable by swapping confusable
+    characters (0/O, 1/I, 8/B, ...).
+    """
+
+    def __init__(self, formats: dict, regions=None):
+        regions = list(regions or formats)
+        unknown = [r for r in regions if r not in formats]
+        if unknown:
+            raise ValueError(f"Unknown plate regions {unknown}; declared: {sorted(formats)}")
+        self.regions = regions
+        self._patterns = {}
+        for r in regions:
+            sources = [compile_format(spec, formats[r].get("codes")) for spec in formats[r]["formats"]]
+            self._patterns[r] = re.compile("|".join(f"(?:{s})" for s in sources))
+        self._any = re.compile("|".join(f"(?:{p.pattern})" for p in self._patterns.values()))
+
+    def is_valid(self, text: str) -> bool:
+        return bool(text) and self._any.fullmatch(text) is not None
+
+    def validate(self, texts) -> list:
+        """is_valid() of every candidate, in order (a plain loop, one fullmatch per candidate)."""
+        match = self._any.fullmatch
+        return [bool(t) and match(t) is not None for t in texts]
+
+    def region_of(self, text: str):
+        """First region whose grammar accepts `text`, else None."""
+        if text:
+            for r in self.regions:
+                if self._patterns[r].fullmatch(text):
+                    return r
+        return None
+
+    def correct(self, text: str, max_edits: int = 2) -> list:
+        """
+        Format-valid readings of `text` with at most `max_edits` confusable-character swaps,
+        fewest swaps first: [(candidate, swaps, region)]. A valid `text` returns itself alone.
+        """
+        if not text:
+            return []
+        region = self.region_of(text)
+        if region:
+            return [(text, 0, region)]
+        positions = [i for i, c in enumerate(text) if c in _CONFUSABLE]
+        suggestions = []
+        for edits in range(1, max_edits + 1):
+            for idx in itertools.combinations(positions, edits):
+                for swap in itertools.product(*(_CONFUSABLE[text[i]] for i in idx)):
+                    chars = list(text)
+                    for i, c in zip(idx, swap):
+                        chars[i] = c
+                    candidate = "".join(chars)
+                    region = self.region_of(candidate)
+                    if region:
+                        suggestions.append((candidate, edits, region))
+            if suggestions:
+                break # Never prefer a reading that needs more swaps
+        return suggestions
+
+def _declared_formats() -> dict:
+    formats = dict(PLATE_FORMATS)
+    path = settings.PLATE_FORMATS_PATH
+    if path and os.path.exists(path):
+        try:
+            with open(path) as f:
+                formats.update(json.load(f))
+            logger.info(f"[GRAMMAR AGENT] Plate formats loaded from {path}")
+        except Exception as e:
+            logger.warning(f"[GRAMMAR AGENT] Failed to read plate formats at {path}: {e}")
+    return formats
+
+def load_grammar() -> PlateGrammar:
+    regions = [r.strip() for r in settings.PLATE_REGIONS.split(",") if r.strip()]
+    return PlateGrammar(_declared_formats(), regions)
+
+plate_grammar = load_grammar()
@@ -0,0 +1,204 @@
+import os
+import json
+import glob
+import logging
+import cv2
+import numpy as np
+from app.core.config import settings
+from app.services.model_service import ONNXRUNTIME_AVAILABLE, cached_export, weights_hash, _export_onnx
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+def stored_videos(root: str = None) -> list:
+    """Uploaded source videos in storage (rendered outputs and chunk cuts excluded)."""
+    root = root or settings.STORAGE_PATH
+    paths = [p for p in glob.glob(os.path.join(root, "*")) if p.lower().endswith(VIDEO_EXTENSIONS)]
+    return sorted(p for p in paths if not os.path.basename(p).startswith("out_"))
+
+def sample_frames(videos: list, n_frames: int, phase: float = 0.5) -> list:
+    """
+    n_frames spread evenly over all videos, deterministic: frame i of a video with k
+    picks sits at (i + phase) / k of its length. Calibration and evaluation use different
+    phases so the harness never scores on the frames the quantizer was calibrated on.
+    """
+    if not videos or n_frames <= 0:
+        return []
+    frames = []
+    per_video = [n_frames // len(videos) + (1 if i < n_frames % len(videos) else 0) for i in range(len(videos))]
+    for path, k in zip(videos, per_video):
+        if k == 0: continue
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for i in range(k):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int((i + phase) / k * max(total - 1, 0)))
+            ret, frame = cap.read()
+            if ret: frames.append(frame)
+        cap.release()
+    return frames
+
+def letterbox(frame: np.ndarray, size: int = 640) -> np.ndarray:
+    """Same input the exported graph gets from ultralytics: letterboxed to size x size, RGB, NCHW float32 in [0, 1]."""
+    h, w = frame.shape[:2]
+    r = min(size / h, size / w)
+    nw, nh = int(round(w * r)), int(round(h * r))
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+if ONNXRUNTIME_AVAILABLE:
+    from onnxruntime.quantization import CalibrationDataReader as _CalibrationBase
+else:
+    _CalibrationBase = object
+
+class FrameCalibrationReader(_CalibrationBase):
+    """Feeds letterboxed calibration frames to onnxruntime's static quantizer."""
+
+    def __init__(self, input_name: str, frames: list, size: int = 640):
+        self.input_name = input_name
+        self.frames = frames
+        self.size = size
+        self._pos = 0
+
+    def get_next(self):
+        if self._pos >= len(self.frames):
+            return None
+        self._pos += 1
+        return {self.input_name: letterbox(self.frames[self._pos - 1], self.size)}
+
+    def rewind(self):
+        self._pos = 0
+
+def _quantize_static(onnx_path: str, frames: list, out_path: str) -> str:
+    import onnxruntime as ort
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType, CalibrationMethod
+    input_name = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    quantize_static(
+        onnx_path, out_path,
+        FrameCalibrationReader(input_name, frames),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.Percentile, # MinMax lets rare outliers eat the int8 range
+    )
+    return out_path
+
+def int8_export(weights_path: str, frames: list = None) -> str:
+    """
+    v5.1 INT8 post-training static quantization of `weights_path`, calibrated on frames
+    from our stored videos (or the given crops/frames). Cached like the float export:
+    <stem>.<hash12>.int8.onnx next to the .pt.
+    """
+    def export(path):
+        calib = frames if frames is not None else sample_frames(stored_videos(), settings.QUANT_CALIBRATION_FRAMES)
+        if not calib:
+            raise RuntimeError(f"No calibration frames found under {settings.STORAGE_PATH}")
+        onnx_path = cached_export(path, _export_onnx, "onnx")
+        logger.info(f"[QUANT AGENT] Calibrating {path} on {len(calib)} frames")
+        return _quantize_static(onnx_path, calib, os.path.splitext(path)[0] + ".int8.tmp.onnx")
+    return cached_export(weights_path, export, "int8.onnx")
+
+# --- Accuracy harness metrics ---
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N, M) IoU of xyxy boxes."""
+    a, b = np.asarray(a, dtype=np.float64).reshape(-1, 4), np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def _match(pred: np.ndarray, ref: np.ndarray, iou_thr: float):
+    """Greedy by confidence, same class; returns a TP flag per pred (in confidence order) and the confidences."""
+    order = np.argsort(-pred[:, 4], kind="stable")
+    pred = pred[order]
+    tp = np.zeros(len(pred), dtype=bool)
+    if len(ref):
+        ious = box_iou(pred[:, :4], ref[:, :4])
+        ious[pred[:, 5][:, None] != ref[:, 5][None, :]] = 0
+        taken = np.zeros(len(ref), dtype=bool)
+        for i in range(len(pred)):
+            cand = np.where(~taken & (ious[i] >= iou_thr))[0]
+            if len(cand):
+                j = cand[np.argmax(ious[i, cand])]
+                taken[j] = tp[i] = True
+    return tp, pred[:, 4]
+
+def map50(preds: list, refs: list, iou_thr: float = 0.5) -> float:
+    """
+    mAP@0.5 of per-frame (N, 6) [x1, y1, x2, y2, conf, cls] predictions against per-frame
+    reference boxes (conf column ignored). With the float model's output as reference this
+    measures how far quantization moves the detector.
+    """
+    classes = sorted({int(c) for r in refs for c in np.asarray(r).reshape(-1, 6)[:, 5]})
+    if not classes:
+        return 1.0
+    aps = []
+    for cls in classes:
+        tps, confs, n_ref = [], [], 0
+        for pred, ref in zip(preds, refs):
+            pred, ref = np.asarray(pred).reshape(-1, 6), np.asarray(ref).reshape(-1, 6)
+            pred, ref = pred[pred[:, 5] == cls], ref[ref[:, 5] == cls]
+            n_ref += len(ref)
+            tp, conf = _match(pred, ref, iou_thr)
+            tps.append(tp)
+            confs.append(conf)
+        tp = np.concatenate(tps)[np.argsort(-np.concatenate(confs), kind="stable")]
+        if not len(tp):
+            aps.append(0.0)
+            continue
+        recall = np.cumsum(tp) / n_ref
+        precision = np.cumsum(tp) / np.arange(1, len(tp) + 1)
+        # All-point interpolation (VOC2010+/COCO style envelope)
+        precision = np.maximum.accumulate(precision[::-1])[::-1]
+        recall = np.concatenate([[0.0], recall])
+        aps.append(float(np.sum((recall[1:] - recall[:-1]) * precision)))
+    return float(np.mean(aps))
+
+def recall50(preds: list, refs: list, iou_thr: float = 0.5) -> float:
+    """Share of reference boxes (e.g. float-model plates) that the candidate model still finds."""
+    found = total = 0
+    for pred, ref in zip(preds, refs):
+        pred, ref = np.asarray(pred).reshape(-1, 6), np.asarray(ref).reshape(-1, 6)
+        total += len(ref)
+        if len(ref) and len(pred):
+            found += int(_match(pred, ref, iou_thr)[0].sum())
+    return found / total if total else 1.0
+
+# --- Operator gate ---
+
+def report_path() -> str:
+    return os.path.join(settings.STORAGE_PATH, "quantization_report.json")
+
+def write_report(weights_path: str, result: dict) -> dict:
+    """Records harness results for these exact weights and whether they are within tolerance."""
+    result = dict(result)
+    result["weights_hash"] = weights_hash(weights_path)
+    result["approved"] = bool(result.get("map_drift", 1.0) <= settings.QUANT_MAX_MAP_DRIFT and
+                              result.get("plate_recall_drift", 0.0) <= settings.QUANT_MAX_PLATE_RECALL_DRIFT)
+    path = report_path()
+    report = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            report = json.load(f)
+    report[os.path.abspath(weights_path)] = result
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return result
+
+def is_approved(weights_path: str) -> bool:
+    """True only if the harness passed for the current weights (retraining revokes approval)."""
+    path = report_path()
+    if not os.path.exists(path):
+        return False
+    with open(path) as f:
+        entry = json.load(f).get(os.path.abspath(weights_path))
+    return bool(entry and entry.get("approved") and entry.get("weights_hash") == weights_hash(weights_path))
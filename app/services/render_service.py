@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import queue
+import threading
+import logging
+import cv2
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def _open_writer(output_path: str, fps: float, width: int, height: int):
+    # Use mp4v for better compatibility on Windows without OpenH264
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not out.isOpened():
+        # Extreme fallback
+        out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'XVID'), fps, (width, height))
+    return out
+
+def draw_tracks(frame: np.ndarray, boxes, labels: dict = None):
+    """Draws [track_id, x1, y1, x2, y2] boxes with their plate (or ID) label in place."""
+    for tid, x1, y1, x2, y2 in boxes:
+        label = (labels or {}).get(tid) or f"ID:{tid}"
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.rectangle(frame, (x1, max(0, y1 - 24)), (x1 + 12 * len(label) + 8, y1), (0, 0, 0), -1)
+        cv2.putText(frame, label, (x1 + 4, max(16, y1 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    return frame
+
+class AsyncVideoWriter:
+    """
+    v5.1 Writer Agent: takes mp4v encoding (and box drawing) off the analysis loop.
+    write() copies the frame into a preallocated slot and returns; a dedicated
+    thread annotates and encodes. The slot pool bounds memory, so a slow encoder
+    applies backpressure instead of growing a queue (reported as writer stall).
+    """
+
+    def __init__(self, output_path: str, fps: float, width: int, height: int, depth: int = 16):
+        self.writer = _open_writer(output_path, fps, width, height)
+        self._buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(max(2, depth))]
+        self._free = queue.Queue()
+        for slot in range(len(self._buffers)):
+            self._free.put(slot)
+        self._ready = queue.Queue()
+        self.stall_sec = 0.0
+        self.encode_sec = 0.0
+        self.frames = 0
+        self._thread = threading.Thread(target=self._run, name="video-writer", daemon=True)
+        self._thread.start()
+
+    def isOpened(self) -> bool:
+        return self.writer.isOpened()
+
+    def write(self, frame: np.ndarray, boxes=None):
+        t0 = time.perf_counter()
+        slot = self._free.get()
+        self.stall_sec += time.perf_counter() - t0
+        buf = self._buffers[slot]
+        if buf.shape == frame.shape:
+            np.copyto(buf, frame)
+        else:
+            buf = self._buffers[slot] = frame.copy()
+        self._ready.put((slot, boxes))
+
+    def _run(self):
+        while True:
+            item = self._ready.get()
+            if item is None: break
+            slot, boxes = item
+            t0 = time.perf_counter()
+            try:
+                frame = self._buffers[slot]
+                if boxes: draw_tracks(frame, boxes)
+                self.writer.write(frame)
+                self.frames += 1
+            except Exception as e:
+                logger.error(f"[WRITER AGENT] Encode failed: {e}")
+            finally:
+                self.encode_sec += time.perf_counter() - t0
+                self._free.put(slot)
+
+    def release(self):
+        self._ready.put(None)
+        self._thread.join()
+        self.writer.release()
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "encode_sec": round(self.encode_sec, 3),
+            "writer_stall_sec": round(self.stall_sec, 3),
+        }
+
+class RenderAgent:
+    """
+    v5.1 Render-on-Demand: processing only stores per-frame track boxes
+    (storage/results/tracks_<id>.json); the annotated clip is encoded the first
+    time a user asks for it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._video_locks = {}
+
+    def tracks_path(self, video_id: int) -> str:
+        return os.path.join(settings.STORAGE_PATH, "results", f"tracks_{video_id}.json")
+
+    def save_tracks(self, video_id: int, fps: float, width: int, height: int, track_boxes: list):
+        """track_boxes: [[timestamp, [[track_id, x1, y1, x2, y2], ...]], ...] in frame order."""
+        path = self.tracks_path(video_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"fps": fps, "width": width, "height": height, "frames": track_boxes}, f, separators=(",", ":"))
+        return path
+
+    def render_annotated(self, video, db) -> str:
+        """Encodes the annotated clip from stored track boxes and detections; returns its path."""
+        with self._lock:
+            video_lock = self._video_locks.setdefault(video.id, threading.Lock())
+        with video_lock:
+            # A concurrent request may have rendered it while we waited
+            db.refresh(video)
+            if video.output_path and os.path.exists(video.output_path):
+                return video.output_path
+            return self._render(video, db)
+
+    def _render(self, video, db) -> str:
+        from app.models.models import VehicleDetection
+        tracks_path = self.tracks_path(video.id)
+        if not os.path.exists(tracks_path):
+            return None
+        with open(tracks_path) as f:
+            tracks = json.load(f)
+
+        labels = {}
+        for det in db.query(VehicleDetection).filter(VehicleDetection.video_id == video.id).all():
+            if det.track_id is not None and det.plate_number and det.plate_number != "NO PLATE":
+                labels[det.track_id] = det.plate_number
+
+        cap = cv2.VideoCapture(video.filepath)
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS) or tracks["fps"]
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        output_path = os.path.join(settings.STORAGE_PATH, f"out_{video.id}_{video.filename}")
+        out = _open_writer(output_path, fps, width, height)
+
+        # Boxes were stored on the analysis timeline: hold each entry until the next one
+        entries = tracks["frames"]
+        hold_sec = 1.5 # Same gap after which a track counts as exited
+        pos, idx = 0, 0
+        start = time.time()
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret: break
+                ts = idx / fps
+                while pos + 1 < len(entries) and entries[pos + 1][0] <= ts:
+                    pos += 1
+                if entries and entries[pos][0] <= ts <= entries[pos][0] + hold_sec:
+                    draw_tracks(frame, entries[pos][1], labels)
+                out.write(frame)
+                idx += 1
+        finally:
+            cap.release()
+            out.release()
+
+        video.output_path = output_path
+        db.add(video)
+        db.commit()
+        logger.info(f"[RENDER AGENT] Rendered {idx} frames for video {video.id} in {time.time() - start:.1f}s")
+        return output_path
+
+render_manager = RenderAgent()
@@ -0,0 +1,134 @@
+import os
+import json
+import threading
+import logging
+import cv2
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NORMALIZED_REFERENCE = (1920, 1080) # Raster size for the reference mask of 0..1 polygons
+
+class ROIRegion:
+    """
+    v5.1 ROI Agent: one camera's region of interest, from a mask image or from
+    polygons. The mask is built once per frame resolution and cached, so chunks
+    and cameras with different sizes never resize a shared mask back and forth.
+    Polygons are rasterized directly at each resolution (no resampling of a
+    bitmap); `size` is their pixel reference, without it coordinates are 0..1.
+    """
+
+    def __init__(self, name: str, mask: np.ndarray = None, polygons=None, size=None):
+        if mask is None and not polygons:
+            raise ValueError("ROI needs a mask or at least one polygon")
+        self.name = name
+        self._source_mask = mask
+        self._polygons = [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in (polygons or [])]
+        self._size = tuple(size) if size else None
+        self._masks = {} # (h, w) -> uint8 0/255
+        self._rects = {} # (h, w) -> (x1, y1, x2, y2)
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Mask at the ROI's own reference resolution (for consumers that resample it themselves)."""
+        if self._source_mask is not None:
+            return self._source_mask
+        w, h = self._size or NORMALIZED_REFERENCE
+        return self.mask_for((h, w))
+
+    def mask_for(self, shape) -> np.ndarray:
+        key = tuple(shape[:2])
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self._masks[key] = self._rasterize(*key)
+        return mask
+
+    def _rasterize(self, h: int, w: int) -> np.ndarray:
+        if self._source_mask is not None:
+            src = self._source_mask
+            if src.shape[:2] != (h, w):
+                src = cv2.resize(src, (w, h), interpolation=cv2.INTER_NEAREST)
+            return np.where(src > 0, 255, 0).astype(np.uint8)
+        ref_w, ref_h = self._size or (1.0, 1.0)
+        scale = np.array([w / ref_w, h / ref_h])
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.fillPoly(mask, [np.round(p * scale).astype(np.int32) for p in self._polygons], 255)
+        return mask
+
+    def rect_for(self, shape) -> tuple:
+        """Bounding rectangle (x1, y1, x2, y2) of the ROI at this resolution; the full frame if it's empty."""
+        key = tuple(shape[:2])
+        rect = self._rects.get(key)
+        if rect is None:
+            x, y, w, h = cv2.boundingRect(self.mask_for(key))
+            rect = self._rects[key] = (x, y, x + w, y + h) if w and h else (0, 0, key[1], key[0])
+        return rect
+
+    def contains(self, xyxy, shape) -> np.ndarray:
+        """Vectorized centre-in-mask test for (N, 4) boxes in frame pixels; returns a bool array."""
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        mask = self.mask_for(shape)
+        h, w = mask.shape
+        cx = ((xyxy[:, 0] + xyxy[:, 2]) // 2).astype(np.int64)
+        cy = ((xyxy[:, 1] + xyxy[:, 3]) // 2).astype(np.int64)
+        inside = (cx >= 0) & (cx < w) & (cy >= 0) & (cy < h)
+        keep = np.zeros(len(xyxy), dtype=bool)
+        keep[inside] = mask[cy[inside], cx[inside]] > 0
+        return keep
+
+class ROIAgent:
+    """
+    Resolves the ROI for a camera: a polygon entry in ROI_POLYGONS_PATH, else the
+    site-wide ROI_MASK_PATH image, else None (full frame). Regions are built once
+    and shared; the polygons file looks like
+    {"<camera_id>": {"size": [1920, 1080], "polygons": [[[x, y], ...], ...]}}.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._regions = {}
+        self._polygons = None
+
+    def _load_polygons(self) -> dict:
+        if self._polygons is None:
+            self._polygons = {}
+            path = settings.ROI_POLYGONS_PATH
+            if path and os.path.exists(path):
+                try:
+                    with open(path) as f:
+                        self._polygons = json.load(f)
+                    logger.info(f"[ROI AGENT] Polygon ROIs loaded for cameras: {list(self._polygons)}")
+                except Exception as e:
+                    logger.warning(f"[ROI AGENT] Failed to read polygon ROIs at {path}: {e}")
+        return self._polygons
+
+    def _default_region(self):
+        if os.path.exists(settings.ROI_MASK_PATH):
+            mask = cv2.imread(settings.ROI_MASK_PATH, cv2.IMREAD_GRAYSCALE)
+            if mask is not None:
+                logger.info(f"[ROI AGENT] Mask loaded from {settings.ROI_MASK_PATH}")
+                return ROIRegion("default", mask=mask)
+            logger.warning(f"[ROI AGENT] Failed to decode mask at {settings.ROI_MASK_PATH}")
+        else:
+            logger.info("[ROI AGENT] No ROI mask found. Full-frame detection active.")
+        return None
+
+    def region_for(self, camera_id: str = None):
+        with self._lock:
+            polygons = self._load_polygons()
+            key = camera_id if camera_id in polygons else None
+            if key not in self._regions:
+                if key is None:
+                    self._regions[key] = self._default_region()
+                else:
+                    entry = polygons[key]
+                    self._regions[key] = ROIRegion(key, polygons=entry.get("polygons"), size=entry.get("size"))
+            return self._regions[key]
+
+    def reload(self):
+        with self._lock:
+            self._regions.clear()
+            self._polygons = None
+
+roi_manager = ROIAgent()
@@ -0,0 +1,232 @@
+import time
+import logging
+from collections import deque
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VEHICLE_CLASSES = [2, 3, 5, 7] # COCO car, motorcycle, bus, truck
+
+def slice_grid(width: int, height: int, slice_w: int, slice_h: int, overlap: float) -> np.ndarray:
+    """(K, 4) int array of [x1, y1, x2, y2] tiles covering the frame; the last row/column is aligned to the border."""
+    def starts(size, tile):
+        if size <= tile: return [0]
+        step = max(1, int(tile * (1.0 - overlap)))
+        out = list(range(0, size - tile, step))
+        out.append(size - tile)
+        return out
+    tw, th = min(slice_w, width), min(slice_h, height)
+    return np.array([[x, y, x + tw, y + th] for y in starts(height, th) for x in starts(width, tw)], dtype=np.int32)
+
+def nms(dets: np.ndarray, threshold: float = 0.5, metric: str = "IOS") -> np.ndarray:
+    """
+    Greedy NMS over (N, >=5) [x1, y1, x2, y2, conf, ...]; returns kept indices (by confidence).
+    Overlaps for all pairs are computed in one vectorized pass. IOS (intersection over the
+    smaller box) also catches boxes truncated at a tile edge, which plain IoU lets through.
+    """
+    if len(dets) == 0:
+        return np.empty(0, dtype=np.int64)
+    order = np.argsort(-dets[:, 4], kind="stable")
+    boxes = dets[order, :4]
+    areas = np.maximum(0, boxes[:, 2] - boxes[:, 0]) * np.maximum(0, boxes[:, 3] - boxes[:, 1])
+
+    ix1 = np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+    iy1 = np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+    ix2 = np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+    iy2 = np.minimum(boxes[:, None, 3], boxes[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    if metric == "IOS":
+        denom = np.minimum(areas[:, None], areas[None, :])
+    else:
+        denom = areas[:, None] + areas[None, :] - inter
+    overlap = np.triu(inter / np.maximum(denom, 1e-9) > threshold, k=1)
+
+    keep = np.ones(len(boxes), dtype=bool)
+    for i in range(len(boxes)):
+        if keep[i]:
+            keep &= ~overlap[i]
+    return order[keep]
+
+class SlicingPlanner:
+    """
+    v5.1 Perspective-aware slicing for a fixed camera: vehicles only get small in the
+    far field, so only that band needs tiles. The planner watches where small boxes
+    (too few pixels for the full-frame pass) appear, restricts them to the ROI, and
+    tiles just the rows they occupy; the near field is covered by the full-frame
+    pass alone. Until `warmup_frames` are observed the whole frame is tiled, and the
+    layout is recomputed every `replan_frames` from a rolling window of boxes. An empty
+    band still runs the full grid on the frame that triggers each replan, so far-field
+    vehicles that only show up later can bring the tiles back.
+    """
+
+    def __init__(self, shape, slice_w: int, slice_h: int, overlap: float, full_pass_size: int,
+                 roi_mask: np.ndarray = None, small_px: int = 24, warmup_frames: int = 30,
+                 replan_frames: int = 300, history: int = 2000):
+        self.h, self.w = shape[:2]
+        self.slice_w, self.slice_h, self.overlap = slice_w, slice_h, overlap
+        # A box of height h (frame px) is h * full_scale px tall in the full-frame pass input
+        self.full_scale = min(1.0, full_pass_size / float(max(self.h, self.w)))
+        self.small_px = small_px
+        self.warmup_frames = warmup_frames
+        self.replan_frames = replan_frames
+        self._boxes = deque(maxlen=history) # (y1, y2, is_small) per observed box
+        self._frames = 0
+        self._issued = 0 # Frames handed tiles; ahead of _frames by the frames in flight
+        self._next_plan = warmup_frames
+        self._probed = None # _next_plan whose probe frame already ran the full grid
+
+        self.roi_rect = (0, 0, self.w, self.h)
+        if roi_mask is not None:
+            mask = roi_mask if roi_mask.shape[:2] == (self.h, self.w) else \
+                cv2.resize(roi_mask, (self.w, self.h), interpolation=cv2.INTER_NEAREST)
+            x, y, w, h = cv2.boundingRect((mask > 0).astype(np.uint8))
+            if w and h: self.roi_rect = (x, y, x + w, y + h)
+
+        self.full_grid = slice_grid(self.w, self.h, slice_w, slice_h, overlap)
+        self.tiles = self.full_grid
+        self.band = (0, self.h)
+        self.replans = 0
+        self.probes = 0
+
+    def next_tiles(self) -> np.ndarray:
+        """Tiles for the next frame: the planned layout, or the full grid for an empty band's probe frame."""
+        self._issued += 1
+        if len(self.tiles) == 0 and self._issued >= self._next_plan and self._probed != self._next_plan:
+            self._probed = self._next_plan
+            self.probes += 1
+            return self.full_grid
+        return self.tiles
+
+    def observe(self, dets: np.ndarray):
+        """Feeds one frame's merged detections (N, >=4) in frame pixels."""
+        self._frames += 1
+        if len(dets):
+            heights = dets[:, 3] - dets[:, 1]
+            small = heights * self.full_scale < self.small_px
+            self._boxes.extend(zip(dets[:, 1].tolist(), dets[:, 3].tolist(), small.tolist()))
+        if self._frames >= self._next_plan:
+            self._next_plan = self._frames + self.replan_frames
+            self.plan()
+
+    def plan(self) -> np.ndarray:
+        rx1, ry1, rx2, ry2 = self.roi_rect
+        boxes = list(self._boxes) # Snapshot: sessions of the same camera may still be observing
+        small = np.array([(y1, y2) for y1, y2, is_small in boxes if is_small], dtype=np.float32).reshape(-1, 2)
+        if len(small) == 0:
+            self.tiles, self.band = np.empty((0, 4), dtype=np.int32), (0, 0) # Full-frame pass covers everything
+        else:
+            # Robust band of small-object rows plus half a tile of margin, clipped to the ROI
+            margin = self.slice_h // 2
+            top = max(ry1, int(np.percentile(small[:, 0], 2)) - margin)
+            bottom = min(ry2, int(np.percentile(small[:, 1], 98)) + margin)
+            bottom = max(bottom, min(ry2, top + self.slice_h))
+            grid = slice_grid(rx2 - rx1, bottom - top, self.slice_w, self.slice_h, self.overlap)
+            self.tiles = grid + np.array([rx1, top, rx1, top], dtype=np.int32)
+            self.band = (top, bottom)
+        self.replans += 1
+        logger.info(f"[SLICING PLANNER] {self.w}x{self.h}: far-field band {self.band}, "
+                    f"{len(self.tiles)}/{len(self.full_grid)} tiles")
+        return self.tiles
+
+class SliceEngine:
+    """
+    v5.1 Sliced inference (replaces the SAHI wrapper): tiles of the full-resolution
+    frame, plus the whole frame as the standard pass, go through the already-loaded
+    YOLO model in one batched forward pass. Predictions are gathered into a single
+    (N, 6) numpy array [x1, y1, x2, y2, conf, cls] in frame pixels and merged with
+    vectorized NMS, ready for ByteTrack.
+    With `plan` set, a SlicingPlanner per camera (`scope`), ROI and resolution decides
+    which tiles to run; `roi` is anything with name and mask_for(shape) (an ROIRegion).
+    """
+
+    def __init__(self, model, slice_w: int, slice_h: int, overlap: float,
+                 classes=VEHICLE_CLASSES, merge_threshold: float = 0.5, plan: bool = False,
+                 roi=None, planner_args: dict = None, planners: dict = None, scope: str = None):
+        self.model = model
+        self.slice_w, self.slice_h = slice_w, slice_h
+        self.overlap = overlap
+        self.classes = list(classes)
+        self.merge_threshold = merge_threshold
+        self.plan = plan
+        self.roi = roi
+        self.scope = scope # Camera whose layouts these are: its far field is nobody else's
+        self.planner_args = planner_args or {}
+        self._grids = {} # (h, w) -> tile grid
+        self.planners = {} if planners is None else planners # (scope, roi name, h, w) -> SlicingPlanner
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.tiles = 0
+        self.full_grid_tiles = 0
+        self.images = 0
+        self.infer_sec = 0.0
+
+    def planner_for(self, shape) -> SlicingPlanner:
+        key = (self.scope, self.roi.name if self.roi else None) + tuple(shape[:2])
+        planner = self.planners.get(key)
+        if planner is None:
+            planner = self.planners[key] = SlicingPlanner(
+                shape, self.slice_w, self.slice_h, self.overlap, max(self.slice_w, self.slice_h),
+                roi_mask=self.roi.mask_for(shape) if self.roi else None, **self.planner_args)
+        return planner
+
+    def tiles_for(self, shape) -> np.ndarray:
+        if self.plan:
+            return self.planner_for(shape).next_tiles()
+        h, w = shape[:2]
+        grid = self._grids.get((h, w))
+        if grid is None:
+            grid = self._grids[(h, w)] = slice_grid(w, h, self.slice_w, self.slice_h, self.overlap)
+        return grid
+
+    def predict_batch(self, frames, conf: float):
+        """One forward pass for every tile of every frame; returns one (N, 6) array per frame."""
+        images, owners = [], []
+        for i, frame in enumerate(frames):
+            tiles = self.tiles_for(frame.shape)
+            for x1, y1, x2, y2 in tiles:
+                images.append(frame[y1:y2, x1:x2])
+                owners.append((i, x1, y1))
+            self.tiles += len(tiles)
+            self.full_grid_tiles += len(self.planner_for(frame.shape).full_grid) if self.plan else len(tiles)
+            if len(tiles) != 1 or tuple(tiles[0]) != (0, 0, frame.shape[1], frame.shape[0]):
+                images.append(frame) # Standard full-frame pass for large, near-field vehicles
+                owners.append((i, 0, 0))
+        self.frames += len(frames)
+
+        t0 = time.perf_counter()
+        results = self.model.predict(images, imgsz=max(self.slice_w, self.slice_h), classes=self.classes,
+                                     conf=conf, verbose=False) if images else []
+        self.infer_sec += time.perf_counter() - t0
+        self.images += len(images)
+        parts = [[] for _ in frames]
+        for (i, x_off, y_off), result in zip(owners, results):
+            data = result.boxes.cpu().numpy().data
+            if len(data) == 0: continue
+            data = data[:, :6].astype(np.float32, copy=True)
+            data[:, [0, 2]] += x_off
+            data[:, [1, 3]] += y_off
+            parts[i].append(data)
+
+        merged = []
+        for frame, frame_parts in zip(frames, parts):
+            dets = np.concatenate(frame_parts) if frame_parts else np.empty((0, 6), dtype=np.float32)
+            dets = dets[nms(dets, self.merge_threshold)]
+            if self.plan: self.planner_for(frame.shape).observe(dets)
+            merged.append(dets)
+        return merged
+
+    def stats(self) -> dict:
+        per_image = self.infer_sec / self.images if self.images else 0.0
+        return {
+            "frames": self.frames,
+            "tiles_per_frame": self.tiles / self.frames if self.frames else 0.0,
+            "full_grid_tiles_per_frame": self.full_grid_tiles / self.frames if self.frames else 0.0,
+            "avg_image_sec": round(per_image, 4),
+            "estimated_saved_sec": round((self.full_grid_tiles - self.tiles) * per_image, 2),
+            "layouts": {f"{roi or 'full'}@{w}x{h}": {"band": list(p.band), "tiles": len(p.tiles),
+                                                     "replans": p.replans, "probes": p.probes}
+                        for (scope, roi, h, w), p in list(self.planners.items()) if scope == self.scope},
+        }
@@ -0,0 +1,169 @@
+import time
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class VehicleTracker:
+    """
+    v5.1 ByteTrack Agent: the same BYTETracker that YOLO.track(persist=True) runs
+    internally, driven explicitly so detection can be batched across frames while
+    tracking still advances one frame at a time, in order.
+    """
+
+    def __init__(self, tracker_cfg: str = "bytetrack.yaml", frame_rate: int = 30):
+        from ultralytics.utils import IterableSimpleNamespace, yaml_load
+        from ultralytics.utils.checks import check_yaml
+        self._cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker_cfg)))
+        self._frame_rate = frame_rate
+        self.reset()
+
+    def reset(self):
+        from ultralytics.trackers.byte_tracker import BYTETracker
+        self.tracker = BYTETracker(args=self._cfg, frame_rate=self._frame_rate)
+
+    def update(self, result):
+        """Feeds one frame's ultralytics Result; returns its Boxes with track ids (as YOLO.track does)."""
+        return self.update_array(result.boxes.cpu().numpy().data, result.orig_img)
+
+    def update_array(self, dets: np.ndarray, img: np.ndarray):
+        """
+        dets: (N, 6) [x1, y1, x2, y2, conf, cls] in img pixels (e.g. merged slice predictions).
+        Returns ultralytics Boxes; ids stay unset on frames where nothing is tracked, like YOLO.track.
+        """
+        from ultralytics.engine.results import Boxes
+        boxes = Boxes(dets, img.shape[:2])
+        tracks = self.tracker.update(boxes, img)
+        if len(tracks) == 0:
+            return boxes
+        return Boxes(tracks[:, :-1], img.shape[:2]) # [x1, y1, x2, y2, track_id, conf, cls]
+
+class BatchSizeTuner:
+    """
+    Picks the detection batch size with the best measured frames/sec.
+    Every candidate runs `trials` full batches (after one warmup batch), then the
+    fastest is locked in for the rest of the video.
+    """
+
+    def __init__(self, candidates=(1, 2, 4, 8, 16), max_size: int = 16, trials: int = 3):
+        self.candidates = [c for c in candidates if c <= max_size] or [1]
+        self.trials = trials
+        self._samples = {c: [] for c in self.candidates}
+        self._pos = 0
+        self._warm = False
+        self.locked = None
+
+    @property
+    def batch_size(self) -> int:
+        return self.locked or self.candidates[self._pos]
+
+    def record(self, frames: int, seconds: float):
+        if self.locked or frames != self.batch_size or seconds <= 0:
+            return # Partial batches (gated frames, end of video) say nothing about throughput
+        if not self._warm:
+            self._warm = True # First forward pass pays for model/kernel setup
+            return
+        samples = self._samples[self.batch_size]
+        samples.append(frames / seconds)
+        if len(samples) < self.trials:
+            return
+        self._pos += 1
+        if self._pos == len(self.candidates):
+            rates = {c: float(np.median(s)) for c, s in self._samples.items()}
+            self.locked = max(rates, key=rates.get)
+            logger.info(f"[BATCH TUNER] Locked batch size {self.locked} ({rates[self.locked]:.1f} FPS; trials: {rates})")
+
+    def stats(self) -> dict:
+        return {
+            "locked": self.locked,
+            "fps_by_batch_size": {c: round(float(np.median(s)), 2) for c, s in self._samples.items() if s},
+        }
+
+class FrameMicroBatcher:
+    """
+    v5.1 Micro-batching: groups sampled frames so `detect_batch` runs one forward
+    pass for several of them, then yields every frame back in order with its
+    detections. Frames are copied into a reusable pool because upstream readers
+    recycle their buffers; a yielded frame stays valid until the next batch fills.
+    A frame whose batch flushes at once (batch size 1) is passed through uncopied.
+    Frames rejected by `gate` (Motion Gate) ride along without detection, so the
+    tracker sees exactly the sequence the one-frame loop would give it.
+    """
+
+    def __init__(self, detect_batch, batch_size: int = 1, tuner: BatchSizeTuner = None, gate=None):
+        self.detect_batch = detect_batch
+        self.fixed_size = max(1, int(batch_size))
+        self.tuner = tuner
+        self.gate = gate
+        self._pool = []
+
+        # Telemetry
+        self.detect_sec = 0.0
+        self.detected_frames = 0
+        self.batches = 0
+
+    @property
+    def batch_size(self) -> int:
+        return self.tuner.batch_size if self.tuner else self.fixed_size
+
+    def _stash(self, slot: int, frame: np.ndarray) -> np.ndarray:
+        if slot == len(self._pool):
+            self._pool.append(np.empty_like(frame))
+        buf = self._pool[slot]
+        if buf.shape != frame.shape:
+            buf = self._pool[slot] = np.empty_like(frame)
+        np.copyto(buf, frame)
+        return buf
+
+    def _flush(self, pending):
+        to_detect = [frame for _, _, frame, detect in pending if detect]
+        results = iter([])
+        if to_detect:
+            t0 = time.perf_counter()
+            results = iter(self.detect_batch(to_detect))
+            dt = time.perf_counter() - t0
+            self.detect_sec += dt
+            self.detected_frames += len(to_detect)
+            self.batches += 1
+            if self.tuner: self.tuner.record(len(to_detect), dt)
+        for idx, ts, frame, detect in pending:
+            yield idx, ts, frame, True, (next(results) if detect else [])
+        pending.clear()
+
+    def run(self, frames):
+        """Iterates (idx, ts, frame, sampled) and yields (idx, ts, frame, sampled, vehicles)."""
+        pending, queued = [], 0
+        for idx, ts, frame, sampled in frames:
+            if not sampled:
+                # Only delivered when every frame is kept (output video): keep order
+                yield from self._flush(pending)
+                queued = 0
+                yield idx, ts, frame, False, []
+                continue
+
+            detect = self.gate is None or self.gate(frame, ts)
+            if not detect and not pending:
+                yield idx, ts, frame, True, [] # Nothing waiting on a forward pass
+                continue
+
+            if detect and not pending and self.batch_size <= 1:
+                # Detected and yielded before the reader is asked for its next frame: no copy
+                yield from self._flush([(idx, ts, frame, True)])
+                continue
+
+            pending.append((idx, ts, self._stash(len(pending), frame), detect))
+            queued += detect
+            if queued >= self.batch_size or len(pending) >= 2 * self.batch_size:
+                yield from self._flush(pending)
+                queued = 0
+        yield from self._flush(pending)
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "batches": self.batches,
+            "detected_frames": self.detected_frames,
+            "avg_batch_fill": self.detected_frames / self.batches if self.batches else 0.0,
+            "detect_sec": round(self.detect_sec, 3),
+            "tuner": self.tuner.stats() if self.tuner else None,
+        }
@@ -6,12 +6,25 @@ import json
 import uuid
 import subprocess
 import shutil
+import threading
+from collections import deque
+from concurrent.futures import wait as futures_wait
 from sqlalchemy.orm import Session
 from app.models.models import Video, VehicleDetection, VideoStatus, DetectionBatch, RecheckStatus
 
 from app.services.ai_service import ai_service, create_ai_collage
-from app.services.ingest_service import ingest_manager
+from app.services.ingest_service import ingest_manager, CONDITIONED_FPS
+from app.services.motion_service import MotionGateAgent
+from app.services.render_service import AsyncVideoWriter, render_manager
+from app.services.decode_service import SampledFrameReader, PrefetchFrameReader, LatestFrameReader, open_live_capture, sampling_step
 from app.services.enhancer_service import enhancer_manager
+from app.services.tracking_service import FrameMicroBatcher, BatchSizeTuner
+from app.services.chunk_service import probe_keyframes, plan_chunk_cuts, CHUNK_TRACK_ID_STRIDE
+from app.services.governor_service import ThroughputGovernor
+from app.services.detection_service import BatchLatencyStats
+from app.services.ocr_service import OCRScheduler, OCRQueue, PlateOCRCache
+from app.services.consensus_service import PlateConsensus
+from app.services.plate_grammar_service import plate_grammar
 from app.agents.orchestrator import orchestrator
 from app.core.config import settings
 import logging
@@ -31,6 +44,9 @@ def safe_int(val, default=0):
         return default
 
 class VideoService:
+    def __init__(self):
+        self._live_streams = {} # video_id -> stop Event for running live streams
+
     def process_video(self, video_id: int, db: Session):
         import json  # Defensive import for hot-reload scenarios
         start_time = time.time()
@@ -43,14 +59,34 @@ class VideoService:
         db.commit()
 
         try:
+            # v5.1: ON_DEMAND renders the annotated clip only when someone asks for it
+            write_video_output = settings.ENABLE_FULL_VIDEO_OUTPUT and settings.VIDEO_OUTPUT_MODE.upper() == "ASYNC"
+
+            # v5.1 Virtual chunk: only [range_start_frame, range_end_frame) of the source is analysed
+            range_start_sec, range_duration_sec = self._range_seconds(video)
+
             # v4.0: Video Conditioner Agent (Ingest Layer)
-            self._log_event(db, video.id, "FORMATTER", "Conditioning video stream (CFR/Stabilization/Sharpening)...")
-            conditioned_path = ingest_manager.process(video.filepath)
-            
-            cap = cv2.VideoCapture(conditioned_path)
-            if not cap.isOpened():
-                logger.warning(f"Failed to open conditioned video {conditioned_path}, falling back to original.")
+            ingest_mode = settings.INGEST_MODE.upper()
+            if ingest_mode == "FILE" and range_duration_sec:
+                ingest_mode = "STREAM" # Conditioning the whole file per range would redo it for every chunk
+            if ingest_mode == "STREAM":
+                # v5.1: FFmpeg conditions into a rawvideo pipe, overlapping with inference.
+                # Without an output video, unsampled frames are dropped inside FFmpeg.
+                frame_step = 1 if write_video_output else sampling_step(CONDITIONED_FPS, settings.FRAME_SKIP_AI, settings.AI_SAMPLE_FPS)
+                self._log_event(db, video.id, "FORMATTER", "Streaming conditioned frames (CFR/Sharpening) straight into detection...")
+                cap = ingest_manager.open_stream(video.filepath, frame_step=frame_step,
+                                                 start_sec=range_start_sec, duration_sec=range_duration_sec)
+            elif ingest_mode == "FILE":
+                self._log_event(db, video.id, "FORMATTER", "Conditioning video stream (CFR/Stabilization/Sharpening)...")
+                conditioned_path = ingest_manager.process(video.filepath)
+                cap = cv2.VideoCapture(conditioned_path)
+                if not cap.isOpened():
+                    logger.warning(f"Failed to open conditioned video {conditioned_path}, falling back to original.")
+                    cap = cv2.VideoCapture(video.filepath)
+            else:
                 cap = cv2.VideoCapture(video.filepath)
+                if video.range_start_frame:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, video.range_start_frame)
             
             if not cap.isOpened():
                 raise Exception(f"Could not open video file {video.filepath}")
@@ -62,15 +98,10 @@ class VideoService:
             output_filename = f"out_{video.id}_{video.filename}"
             output_path = os.path.join(settings.STORAGE_PATH, output_filename)
             
-            write_video_output = settings.ENABLE_FULL_VIDEO_OUTPUT
             out = None
             if write_video_output:
-                # Use mp4v for better compatibility on Windows without OpenH264
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-                if not out.isOpened():
-                    # Extreme fallback
-                    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'XVID'), fps, (width, height))
+                # v5.1 Writer Agent: encoding runs on its own thread behind a bounded slot pool
+                out = AsyncVideoWriter(output_path, fps, width, height, depth=settings.VIDEO_WRITER_DEPTH)
 
             current_frame_idx = 0
             all_detections = []
@@ -80,161 +111,108 @@ class VideoService:
             tracks_to_batch = [] # Queue for Collage Generator
             frame_counts = {} # v2.3.2 Per-frame vehicle monitoring
             unique_plates = {} # v2.3.2 Global De-duplication registry
+            track_boxes = [] # v5.1 [timestamp, [[tid, x1, y1, x2, y2], ...]] per analysed frame
+            frame_boxes = []
             
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            range_frames = int(round(range_duration_sec * fps)) if range_duration_sec else 0
+            if range_frames:
+                total_frames = range_frames
             print(f">>> [AGENT] Starting v5.0 Master Analysis. Hub-and-Spoke Active. Total Frames: {total_frames}")
             self._log_event(db, video.id, "SYSTEM", f"Started master v5.0 analysis: {total_frames} frames", is_error=False)
             
+            # v5.1 Decode Agent: frames that are never analysed are only grabbed
+            reader = SampledFrameReader(
+                cap, fps,
+                frame_skip=settings.FRAME_SKIP_AI,
+                sample_fps=settings.AI_SAMPLE_FPS,
+                keep_all_frames=out is not None,
+                max_frames=range_frames
+            )
+            # v5.1 Prefetch Agent: decode on a producer thread into a reusable frame ring
+            frames = reader
+            if settings.DECODE_PREFETCH_DEPTH > 0:
+                frames = PrefetchFrameReader(reader, settings.DECODE_PREFETCH_DEPTH, frame_shape=(height, width, 3))
+            next_tune_idx = 0
+            next_commit_idx = 300
+
+            # v5.1 Detection Session: this video's own tracker, threshold and ROI on the shared weights
+            session = ai_service.new_session(video.camera_id, name=f"video {video.id}")
+
+            # v5.1 Motion Gate: background subtraction inside the ROI decides if YOLO runs
+            motion_gate = MotionGateAgent(session.roi.mask_for((height, width)) if session.roi else None) \
+                if settings.ENABLE_MOTION_GATE else None
+
+            def gate(frame, timestamp):
+                if motion_gate is None: return True
+                active = motion_gate.check(frame, timestamp) # Empty scene: ByteTrack simply sees a gap
+                reader.stride_scale = motion_gate.stride_scale
+                return active
+
+            # v5.1 Micro-batching: N sampled frames per forward pass, ByteTrack still frame by frame.
+            # The output video needs strict frame order, so it keeps one frame per pass.
+            batch_size = 1 if out is not None else settings.DETECTION_BATCH_SIZE
+            tuner = BatchSizeTuner(max_size=settings.DETECTION_BATCH_MAX) if batch_size <= 0 else None
+            batcher = FrameMicroBatcher(session.detect_vehicles_batch, batch_size, tuner=tuner, gate=gate)
+
+            plate_stats = BatchLatencyStats() # v5.1: plate-detection latency vs vehicles per frame
+            ocr_scheduler = OCRScheduler() # v5.1: OCR only on improving plate crops, within a per-track budget
+            ocr_cache = PlateOCRCache(settings.OCR_CACHE_SIZE, settings.OCR_CACHE_MAX_HAMMING) # v5.1: near-duplicate crops skip OCR
+            ocr_queue = self._ocr_queue(ocr_cache) # v5.1: Plate crops of all tracks recognized in batches, off the detection loop
+
+            # v5.1 Governor Agent: trades sampling, resolution, slicing and OCR rate for a target speed
+            governor = ThroughputGovernor(settings.GOVERNOR_TARGET_SPEED, reader, session,
+                                          settings.GOVERNOR_INTERVAL_SEC) if settings.GOVERNOR_TARGET_SPEED > 0 else None
+
             try:
-                while cap.isOpened():
-                    ret, frame = cap.read()
-                    if not ret: break
-                    
-                    timestamp = current_frame_idx / fps
-                    
+                # 2. IA Engine (Detection & Tracking) runs inside the batcher: vehicles arrive with each frame
+                for current_frame_idx, timestamp, frame, sampled, vehicles in batcher.run(frames):
                     # 1. Temporal & Motion Skip
                     # v2.3 High Sensitivity: We still skip frames but ByteTrack handles the gaps
-                    if current_frame_idx % settings.FRAME_SKIP_AI != 0:
-                        current_frame_idx += 1
-                        if out: out.write(frame)
+                    if not sampled:
+                        if out: out.write(frame, frame_boxes)
                         continue
 
-                    # 2. IA Engine: Detection & Tracking
-                    vehicles = ai_service.detect_vehicles(frame)
+                    frame_boxes = []
+                    track_boxes.append([round(timestamp, 3), frame_boxes])
                     
-                    for vehicle in vehicles:
-                        x1, y1, x2, y2 = map(int, vehicle.xyxy[0])
-                        track_id = int(vehicle.id[0]) if vehicle.id is not None else -1
-                        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                        
-                        # v2.3.2 per-frame count increment
-                        frame_counts[current_frame_idx] = frame_counts.get(current_frame_idx, 0) + 1
-
-                        if track_id == -1: continue # Collage strategy requires tracking
-                        
-                        vehicle_crop = frame[y1:y2, x1:x2]
-                        if vehicle_crop.size == 0: continue
-
-                        # Initialize Track if New (v3.0 Comprehensive)
-                        if track_id not in track_data:
-                            track_data[track_id] = {
-                                'first_seen': timestamp,
-                                'last_seen': timestamp,
-                                'frames_seen': 0,
-                                'processed': False,
-                                # v2.3 Fields
-                                'best_blur': 0.0,
-                                'best_crop': None,
-                                'best_meta': None,
-                                'best_local_plate': None,
-                                'best_local_conf': 0.0,
-                                'vehicle_crop': None,
-                                # v3.0 Agentic Integrity Fields
-                                'first_pos': (cx, cy),
-                                'max_box_area': 0.0,
-                                'golden_frame_idx': -1,
-                                'visual_embedding': None,
-                                'blur_score': 0.0,
-                                'best_ts': timestamp,
-                                'travel_distance': 0.0
-                            }
-                        
-                        data = track_data[track_id]
-                        data['frames_seen'] += 1
-                        data['last_seen'] = timestamp
-                        
-                        # v3.0: Ghost Track Removal (Ghost Trapping)
-                        dist = ((cx - data['first_pos'][0])**2 + (cy - data['first_pos'][1])**2)**0.5
-                        data['travel_distance'] = dist
-                        
-                        # v3.0: Re-ID Guardian (ID Swap Protection)
-                        if data['frames_seen'] % 15 == 0:
-                            new_embed = ai_service.reid_guardian_embedding(vehicle_crop)
-                            data['visual_embedding'] = new_embed
- 
-                        # v3.0: Quality Gatekeeper (Filtering)
-                        sharpness = ai_service.quality_gatekeeper_score(vehicle_crop)
-                        
-                        # v3.0: Capture Strategy (The Sniper) - "Golden Frame" selection
-                        box_area = (x2 - x1) * (y2 - y1)
-                        if box_area > data['max_box_area'] and sharpness > 50:
-                            data['max_box_area'] = box_area
-                            data['vehicle_crop'] = vehicle_crop.copy()
-                            data['blur_score'] = sharpness
-                            data['golden_frame_idx'] = current_frame_idx
-                            data['best_ts'] = timestamp
-                            print(f">>> [CAPTURE AGENT] Sniped Golden Frame for ID {track_id} (Area: {box_area}, Clarity: {sharpness:.1f})")
- 
-                        # v3.0: High-Res Plate Capture (for Jury Agent)
-                        plates = ai_service.detect_plates(vehicle_crop)
-                        if plates:
-                            for plate_box in plates:
-                                px1, py1, px2, py2 = map(int, plate_box.xyxy[0])
-                                plate_crop = vehicle_crop[py1:py2, px1:px2]
-                                
-                                # Local OCR for Jury
-                                l_text, l_conf, _, _ = ai_service.recognize_plate(plate_crop, allow_gemini=False)
-                                if l_text and l_conf > data['best_local_conf']:
-                                    data['best_local_plate'] = l_text
-                                    data['best_local_conf'] = l_conf
-                                    data['best_crop'] = plate_crop.copy()
+                    # 3. Track Agent: per-track golden frame & local plate reads
+                    self._ingest_vehicles(vehicles, frame, current_frame_idx, timestamp, track_data, frame_counts, frame_boxes,
+                                          ocr_every=governor.ocr_every if governor else 1, plate_stats=plate_stats,
+                                          ocr_scheduler=ocr_scheduler, ocr_queue=ocr_queue)
+                    if governor: governor.update(timestamp)
 
                     # 4. Filter Agent: Dynamic Persistence
-                    # HIGH: 5, BALANCED: 15, LOW: 25
-                    persistence_thresh = settings.TRACK_PERSISTENCE_FRAMES
-                    if ai_service.sensitivity == "HIGH": persistence_thresh = 3 # More aggressive capture
-                    elif ai_service.sensitivity == "LOW": persistence_thresh = 25
-
-                    for tid, data in track_data.items():
-                        if not data['processed'] and tid not in tracks_to_batch:
-                            # v2.3.9: Logic Refinement - Batch whenever persistence is reached, 
-                            # even if no plate was detected yet (Contextual Forensics)
-                            if (timestamp - data['last_seen'] > 1.5): # Increased timeout for robustness
-                                if data['frames_seen'] >= persistence_thresh:
-                                    # Ensure we have at least a vehicle_crop for the collage
-                                    if data.get('vehicle_crop') is not None:
-                                        tracks_to_batch.append(tid)
-                                        msg = f"Track {tid} validated ({data['frames_seen']} frames)"
-                                        self._log_event(db, video.id, "FILTER", msg, current_frame_idx, timestamp)
-                                        print(f">>> [FILTER AGENT] {msg}")
-                                else:
-                                    # Low persistence - skip to save API costs
-                                    data['processed'] = True
-                                    msg = f"Dropped Track {tid} (Insufficient frames: {data['frames_seen']})"
-                                    self._log_event(db, video.id, "FILTER", msg, current_frame_idx, timestamp)
-                                    print(f">>> [FILTER AGENT] {msg}")
-                                    
-                            # v2.8: Periodic Batching for long tracks
-                            if not data['processed'] and data['frames_seen'] >= 100 and data['frames_seen'] % 100 == 0:
-                                if data.get('vehicle_crop') is not None and tid not in tracks_to_batch:
-                                    tracks_to_batch.append(tid)
-                                    print(f">>> [MONITOR AGENT] Periodic batching for active track {tid}")
+                    self._filter_tracks(db, video, session, track_data, tracks_to_batch, current_frame_idx, timestamp)
                     
                     # 4b. Monitor Agent: Tune every 500 frames
-                    if current_frame_idx % 500 == 0:
+                    if current_frame_idx >= next_tune_idx:
+                        next_tune_idx = current_frame_idx + 500
                         active_tracks = len([t for t in track_data.values() if timestamp - t['last_seen'] < 2.0])
-                        ai_service.monitor_agent_tune(active_tracks / 500.0)
+                        session.monitor_agent_tune(active_tracks / 500.0)
                     
                     # 5. Batch Manager: Trigger Batch
                     while len(tracks_to_batch) >= settings.COLLAGE_SIZE:
                         batch_ids = tracks_to_batch[:settings.COLLAGE_SIZE]
                         try:
-                            self._process_batch(db, video, batch_ids, track_data, all_detections)
+                            self._process_batch(db, video, batch_ids, track_data, all_detections, ocr_queue)
                         except Exception as e:
                             logger.error(f"Batch processing failed: {e}")
                             self._log_event(db, video.id, "ERROR", f"Batch failed: {str(e)[:100]}", is_error=True)
                         tracks_to_batch = tracks_to_batch[settings.COLLAGE_SIZE:]
 
-                    if out: out.write(frame)
-                    current_frame_idx += 1
+                    if out: out.write(frame, frame_boxes)
                     
-                    if current_frame_idx % 300 == 0:
+                    if current_frame_idx >= next_commit_idx:
+                        next_commit_idx = current_frame_idx + 300
                         db.commit() # Sync periodically
 
+                current_frame_idx = reader.frame_idx
+
                 # Final flush (v2.3.9: Collect all active tracks that haven't exited)
                 persistence_thresh = settings.TRACK_PERSISTENCE_FRAMES
-                if ai_service.sensitivity == "HIGH": persistence_thresh = 5
-                elif ai_service.sensitivity == "LOW": persistence_thresh = 25
+                if session.sensitivity == "HIGH": persistence_thresh = 5
+                elif session.sensitivity == "LOW": persistence_thresh = 25
                 
                 for tid, data in track_data.items():
                     if not data['processed'] and tid not in tracks_to_batch:
@@ -244,7 +222,7 @@ class VideoService:
                 while tracks_to_batch:
                     batch_ids = tracks_to_batch[:settings.COLLAGE_SIZE]
                     try:
-                        self._process_batch(db, video, batch_ids, track_data, all_detections)
+                        self._process_batch(db, video, batch_ids, track_data, all_detections, ocr_queue)
                     except Exception as e:
                         logger.error(f"Final batch failed: {e}")
                         self._log_event(db, video.id, "ERROR", f"Final batch failed: {str(e)[:100]}", is_error=True)
@@ -252,9 +230,12 @@ class VideoService:
 
             finally:
                 print(">>> [DEBUG] Exiting main loop, releasing resources...")
+                ocr_queue.close()
+                if frames is not reader: frames.close()
                 cap.release()
                 if out: out.release()
                 print(">>> [DEBUG] Resources released successfully")
+            render_manager.save_tracks(video.id, fps, width, height, track_boxes)
             import json
             print(">>> [DEBUG] Starting Final Report generation...")
             # Final Report (v2.3.9 Serialization Fix)
@@ -293,18 +274,7 @@ class VideoService:
             unique_v_count = len(all_dets)
             
             # v2.5 Deep Aggregation
-            stats = {
-                "CAR": 0, "MOTORCYCLE": 0, "SCOOTER": 0, "BICYCLE": 0, "BUS": 0, "TRUCK": 0, "AUTO": 0, "UNKNOWN": 0,
-                "HELMET": 0, "NO_HELMET": 0,
-                "OVERLOADED_BIKES": 0 # More than 2 on a bike
-            }
-            for d in all_dets:
-                stats[d.vehicle_type] = stats.get(d.vehicle_type, 0) + 1
-                if d.helmet_status == "HELMET": stats["HELMET"] += 1
-                elif d.helmet_status == "NO_HELMET": stats["NO_HELMET"] += 1
-                
-                if d.vehicle_type in ["MOTORCYCLE", "SCOOTER"] and d.passenger_count > 2:
-                    stats["OVERLOADED_BIKES"] += 1
+            stats = self._vehicle_stats(all_dets)
 
             analytics = {
                 "total_vehicles_seen": unique_v_count,
@@ -316,13 +286,26 @@ class VideoService:
                     "total_batches": len(all_batches),
                     "successful_batches": sum(1 for b in all_batches if b.raw_json),
                     "failed_batches": sum(1 for b in all_batches if not b.raw_json),
-                    "total_captured_images": len(all_dets) # In v3.0, every track has a sniped image
+                    "total_captured_images": len(all_dets), # In v3.0, every track has a sniped image
+                    "cloud_skipped_by_consensus": sum(1 for d in all_dets if d.ocr_source == "LOCAL (Temporal Consensus)"),
                 },
                 "metadata": {
                     "total_frames": current_frame_idx,
+                    "fps": fps, # Rate of frame_series / frame_index (merge_results shifts chunks with it)
                     "resolution": f"{width}x{height}",
                     "processing_duration_sec": time.time() - start_time,
                     "avg_fps": current_frame_idx / (time.time() - start_time) if (time.time() - start_time) > 0 else 0,
+                    "decode": reader.stats(),
+                    "prefetch": frames.stats() if frames is not reader else None,
+                    "writer": out.stats() if out else None,
+                    "detection_batching": batcher.stats(),
+                    "motion_gate": motion_gate.stats(batcher.detect_sec / batcher.detected_frames if batcher.detected_frames else 0.0) if motion_gate else None,
+                    "slicing": session.slicer.stats() if settings.ENABLE_SLICING else None,
+                    "governor": governor.stats() if governor else None,
+                    "plate_detection_by_vehicle_count": plate_stats.stats(),
+                    "ocr_scheduling": ocr_scheduler.stats(),
+                    "ocr_queue": ocr_queue.stats(),
+                    "ocr_cache": ocr_cache.stats(),
                 },
                 "processed_at": time.strftime("%Y-%m-%d %H:%M:%S")
             }
@@ -350,53 +333,636 @@ class VideoService:
             video.status = VideoStatus.FAILED
             db.commit()
 
-    def _process_batch(self, db: Session, video, track_ids, track_data, all_detections):
+    def split_video(self, filepath: str, chunk_minutes: int):
+        """
+        v5.1 Chunk Agent: stream-copy segmentation (no re-encode) for parallel fan-out.
+        Cuts snap to the last keyframe before each CHUNK_DURATION_MINUTES boundary so
+        every chunk starts decodable; each chunk runs CHUNK_OVERLAP_SECONDS past the
+        next cut so a vehicle crossing the boundary is seen whole by one of them
+        (the duplicate read is dropped in merge_results).
+        Returns [(chunk_path, start_sec), ...].
+        """
+        keyframes, duration = probe_keyframes(filepath)
+        overlap = float(settings.CHUNK_OVERLAP_SECONDS)
+        cuts = plan_chunk_cuts(keyframes, duration, chunk_minutes * 60.0, overlap)
+
+        chunk_dir = os.path.join(settings.STORAGE_PATH, "chunks")
+        os.makedirs(chunk_dir, exist_ok=True)
+        base, ext = os.path.splitext(os.path.basename(filepath))
+        chunks = []
+        for i, start in enumerate(cuts):
+            chunk_path = os.path.join(chunk_dir, f"{base}_chunk{i:03d}{ext or '.mp4'}")
+            cmd = ['ffmpeg', '-y', '-nostdin', '-loglevel', 'error', '-ss', f"{start:.6f}", '-i', filepath]
+            if i + 1 < len(cuts):
+                cmd += ['-t', f"{cuts[i + 1] - start + overlap:.6f}"]
+            cmd += ['-map', '0', '-c', 'copy', '-avoid_negative_ts', 'make_zero', chunk_path]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise Exception(f"Chunk {i} split failed: {result.stderr.strip()[:200]}")
+            chunks.append((chunk_path, start))
+            print(f">>> [CHUNK AGENT] Chunk {i}: {start:.2f}s -> {os.path.basename(chunk_path)}")
+        return chunks
+
+    def merge_results(self, parent_video_id: int, db: Session):
+        """
+        v5.1 Chunk Agent: folds finished chunks into the parent Video.
+        Detections, batches, cases and logs are re-parented with bulk UPDATEs
+        (timestamps shifted by the chunk offset, track ids namespaced per chunk), so
+        merge cost follows the detection count, not the video length. Reads of the
+        same plate from both sides of an overlap window keep the most confident one.
+        Chunk frame indices count the frames the chunk analysed (CONDITIONED_FPS unless
+        ingest was off), so they are shifted by the offset at that rate, not the source's.
+        """
+        from app.models.models import VehicleCase, ProcessingLog
+        parent = db.query(Video).filter(Video.id == parent_video_id).first()
+        if not parent:
+            logger.error(f"Video with id {parent_video_id} not found")
+            return
+        chunks = db.query(Video).filter(Video.parent_video_id == parent.id).order_by(Video.chunk_offset_sec).all()
+
+        cap = cv2.VideoCapture(parent.filepath)
+        fps = cap.get(cv2.CAP_PROP_FPS) or CONDITIONED_FPS # Render timing of the parent's own file
+        cap.release()
+
+        frame_series = {}
+        merged_meta = {"total_frames": 0, "processing_duration_sec": 0.0, "chunks": len(chunks), "failed_chunks": []}
+        merged_tracks = []
+        for i, chunk in enumerate(chunks):
+            offset = chunk.chunk_offset_sec or 0.0
+            chunk_analytics = json.loads(chunk.analytics_data) if chunk.analytics_data else {}
+            meta = chunk_analytics.get("metadata", {})
+            frame_offset = int(round(offset * (meta.get("fps") or CONDITIONED_FPS)))
+            tid_offset = i * CHUNK_TRACK_ID_STRIDE
+            if chunk.status != VideoStatus.COMPLETED:
+                merged_meta["failed_chunks"].append(chunk.id)
+
+            db.query(VehicleDetection).filter(VehicleDetection.video_id == chunk.id).update({
+                VehicleDetection.video_id: parent.id,
+                VehicleDetection.timestamp: VehicleDetection.timestamp + offset,
+                VehicleDetection.best_frame_timestamp: VehicleDetection.best_frame_timestamp + offset,
+                VehicleDetection.frame_index: VehicleDetection.frame_index + frame_offset,
+                VehicleDetection.track_id: VehicleDetection.track_id + tid_offset,
+            }, synchronize_session=False)
+            db.query(DetectionBatch).filter(DetectionBatch.video_id == chunk.id).update(
+                {DetectionBatch.video_id: parent.id}, synchronize_session=False)
+            db.query(VehicleCase).filter(VehicleCase.video_id == chunk.id).update({
+                VehicleCase.video_id: parent.id,
+                VehicleCase.track_id: VehicleCase.track_id + tid_offset,
+            }, synchronize_session=False)
+            db.query(ProcessingLog).filter(ProcessingLog.video_id == chunk.id).update({
+                ProcessingLog.video_id: parent.id,
+                ProcessingLog.timestamp: ProcessingLog.timestamp + offset,
+                ProcessingLog.frame_index: ProcessingLog.frame_index + frame_offset,
+            }, synchronize_session=False)
+
+            if chunk_analytics:
+                for idx, count in chunk_analytics.get("frame_series", {}).items():
+                    key = int(idx) + frame_offset
+                    frame_series[key] = max(frame_series.get(key, 0), count) # Overlap frames counted once
+                merged_meta["total_frames"] = max(merged_meta["total_frames"], frame_offset + meta.get("total_frames", 0))
+                merged_meta["processing_duration_sec"] += meta.get("processing_duration_sec", 0.0)
+
+            # Annotated-output track boxes, so render-on-demand works for the parent too
+            tracks_path = render_manager.tracks_path(chunk.id)
+            if os.path.exists(tracks_path):
+                with open(tracks_path) as f:
+                    chunk_tracks = json.load(f)
+                next_offset = chunks[i + 1].chunk_offset_sec if i + 1 < len(chunks) else None
+                for ts, boxes in chunk_tracks["frames"]:
+                    if next_offset is not None and ts + offset >= next_offset: break
+                    merged_tracks.append([round(ts + offset, 3), [[tid + tid_offset, *box] for tid, *box in boxes]])
+        db.commit()
+
+        # Overlap de-duplication: only detections near a chunk boundary are loaded
+        overlap = float(settings.CHUNK_OVERLAP_SECONDS)
+        removed = 0
+        for chunk in chunks[1:]:
+            boundary = chunk.chunk_offset_sec or 0.0
+            window = db.query(VehicleDetection).filter(
+                VehicleDetection.video_id == parent.id,
+                VehicleDetection.timestamp >= boundary - 1.5,
+                VehicleDetection.timestamp <= boundary + overlap + 1.5,
+                VehicleDetection.plate_number != "NO PLATE"
+            ).all()
+            by_plate = {}
+            for det in window:
+                by_plate.setdefault(det.plate_number, []).append(det)
+            for dets in by_plate.values():
+                if len({d.track_id // CHUNK_TRACK_ID_STRIDE for d in dets}) < 2: continue
+                keep = max(dets, key=lambda d: d.confidence or 0.0)
+                for det in dets:
+                    if det is not keep:
+                        db.delete(det)
+                        removed += 1
+        db.commit()
+
+        all_dets = db.query(VehicleDetection).filter(VehicleDetection.video_id == parent.id).order_by(VehicleDetection.timestamp).all()
+        all_batches = db.query(DetectionBatch).filter(DetectionBatch.video_id == parent.id).all()
+
+        results_dir = os.path.join(settings.STORAGE_PATH, "results")
+        os.makedirs(results_dir, exist_ok=True)
+        with open(os.path.join(results_dir, f"results_{parent.id}_{parent.filename}.json"), "w") as f:
+            json.dump([{
+                "id": d.id,
+                "plate_number": d.plate_number,
+                "confidence": float(d.confidence or 0.0),
+                "vehicle_info": d.vehicle_info,
+                "timestamp": float(d.timestamp or 0.0),
+                "video_id": d.video_id,
+                "track_id": d.track_id
+            } for d in all_dets], f, indent=4)
+        if merged_tracks:
+            render_manager.save_tracks(parent.id, fps, 0, 0, merged_tracks)
+
+        merged_meta["overlap_duplicates_removed"] = removed
+        parent.analytics_data = json.dumps({
+            "total_vehicles_seen": len(all_dets),
+            "counts": self._vehicle_stats(all_dets),
+            "frame_series": frame_series,
+            "peak_vehicle_density": max(frame_series.values()) if frame_series else 0,
+            "capture_metrics": {
+                "total_detections": len(all_dets),
+                "total_batches": len(all_batches),
+                "successful_batches": sum(1 for b in all_batches if b.raw_json),
+                "failed_batches": sum(1 for b in all_batches if not b.raw_json),
+                "total_captured_images": len(all_dets)
+            },
+            "metadata": merged_meta,
+            "processed_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        })
+        parent.status = VideoStatus.FAILED if chunks and len(merged_meta["failed_chunks"]) == len(chunks) else VideoStatus.COMPLETED
+        db.commit()
+
+        # Stream-copied chunks are as large as the source: drop them once merged
+        for chunk in chunks:
+            if chunk.range_end_frame is not None or chunk.filepath == parent.filepath: continue # Virtual chunk
+            if chunk.status == VideoStatus.COMPLETED and chunk.filepath and os.path.exists(chunk.filepath):
+                os.remove(chunk.filepath)
+        self._log_event(db, parent.id, "SYSTEM", f"Merged {len(chunks)} chunks: {len(all_dets)} vehicles ({removed} overlap duplicates removed)")
+        db.commit()
+        print(f">>> [CHUNK AGENT] Merged {len(chunks)} chunks into video {parent.id}")
+
+    def start_stream(self, video_id: int):
+        """Runs process_stream for a live Video row on its own thread (with its own DB session)."""
+        from app.db.session import SessionLocal
+        if video_id in self._live_streams:
+            return False
+        stop_event = threading.Event()
+        self._live_streams[video_id] = stop_event
+
+        def _run():
+            db = SessionLocal()
+            try:
+                self.process_stream(video_id, db, stop_event)
+            finally:
+                db.close()
+                self._live_streams.pop(video_id, None)
+
+        threading.Thread(target=_run, name=f"live-stream-{video_id}", daemon=True).start()
+        return True
+
+    def stop_stream(self, video_id: int) -> bool:
+        stop_event = self._live_streams.get(video_id)
+        if stop_event is None:
+            return False
+        stop_event.set()
+        return True
+
+    def process_stream(self, video_id: int, db: Session, stop_event: threading.Event = None):
+        """
+        v5.1 Live Agent: long-running analysis of a camera stream (URL in video.filepath).
+        State is rolling so memory stays flat however long the stream runs:
+        exited tracks are retired from track_data, partial collage batches are flushed
+        after STREAM_BATCH_MAX_WAIT_SEC, detections are committed as each batch resolves
+        and only a recent window of the per-frame series is kept. Timestamps are
+        seconds since the stream started; plate latency (track last seen -> detection
+        committed) is reported in analytics.
+        """
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if not video:
+            logger.error(f"Video with id {video_id} not found")
+            return
+        stop_event = stop_event or threading.Event()
+
+        video.status = VideoStatus.PROCESSING
+        db.commit()
+
+        track_data = {}
+        tracks_to_batch = []
+        queued_at = {} # track_id -> wall time it entered tracks_to_batch
+        ocr_scheduler = OCRScheduler()
+        ocr_queue = self._ocr_queue(PlateOCRCache(settings.OCR_CACHE_SIZE, settings.OCR_CACHE_MAX_HAMMING))
+        frame_counts = {}
+        latencies = deque(maxlen=1000)
+        state = {"detections": 0, "batches": 0, "reconnects": 0, "source_fps": 25.0, "frames": 0, "dropped": 0}
+        session = ai_service.new_session(video.camera_id, name=f"stream {video.id}")
+        motion_gate = MotionGateAgent(session.roi.mask if session.roi else None) if settings.ENABLE_MOTION_GATE else None
+        sample_period = 1.0 / settings.STREAM_SAMPLE_FPS if settings.STREAM_SAMPLE_FPS > 0 else 0.0
+        start_wall = time.time()
+        next_analytics = start_wall + settings.STREAM_ANALYTICS_INTERVAL_SEC
+        next_tune = start_wall
+        current_frame_idx, timestamp = 0, 0.0
+        failures = 0
+
+        print(f">>> [LIVE AGENT] Connecting to {video.filepath}")
+        self._log_event(db, video.id, "SYSTEM", f"Started live analysis of {video.filepath}", is_error=False)
+
+        def flush(force=False):
+            while tracks_to_batch and (force or len(tracks_to_batch) >= settings.COLLAGE_SIZE
+                                       or time.time() - queued_at[tracks_to_batch[0]] >= settings.STREAM_BATCH_MAX_WAIT_SEC):
+                batch_ids = tracks_to_batch[:settings.COLLAGE_SIZE]
+                del tracks_to_batch[:settings.COLLAGE_SIZE]
+                written = []
+                try:
+                    self._process_batch(db, video, batch_ids, track_data, written, ocr_queue)
+                except Exception as e:
+                    logger.error(f"Live batch failed: {e}")
+                    self._log_event(db, video.id, "ERROR", f"Batch failed: {str(e)[:100]}", is_error=True)
+                now = time.time()
+                for tid in batch_ids:
+                    queued_at.pop(tid, None)
+                    latencies.append(now - (start_wall + track_data[tid]['last_seen']))
+                state["detections"] += len(written)
+                state["batches"] += 1
+
+        try:
+            while not stop_event.is_set():
+                cap = open_live_capture(video.filepath, settings.STREAM_READ_TIMEOUT_SEC)
+                if not cap.isOpened():
+                    failures += 1
+                    if failures > settings.STREAM_MAX_RECONNECTS:
+                        raise Exception(f"Stream unreachable after {failures - 1} reconnects")
+                    backoff = min(30.0, 2.0 ** failures)
+                    logger.warning(f"[LIVE AGENT] Cannot open stream {video_id}, retrying in {backoff:.0f}s")
+                    stop_event.wait(backoff)
+                    continue
+
+                state["source_fps"] = cap.get(cv2.CAP_PROP_FPS) or state["source_fps"]
+                frames = LatestFrameReader(cap)
+                next_sample = time.time()
+                try:
+                    while not stop_event.is_set():
+                        if sample_period:
+                            stop_event.wait(max(0.0, next_sample - time.time()))
+                            next_sample = max(next_sample + sample_period, time.time())
+                        ok, current_frame_idx, frame = frames.read(timeout=settings.STREAM_READ_TIMEOUT_SEC)
+                        if not ok: break
+                        failures = 0
+                        current_frame_idx += state["frames"] # Keep indices monotonic across reconnects
+                        timestamp = time.time() - start_wall
+
+                        if motion_gate is not None and not motion_gate.check(frame, timestamp):
+                            vehicles = []
+                        else:
+                            vehicles = session.detect_vehicles(frame)
+
+                        self._ingest_vehicles(vehicles, frame, current_frame_idx, timestamp, track_data, frame_counts, [],
+                                              ocr_scheduler=ocr_scheduler, ocr_queue=ocr_queue)
+                        self._filter_tracks(db, video, session, track_data, tracks_to_batch, current_frame_idx, timestamp)
+                        for tid in tracks_to_batch:
+                            queued_at.setdefault(tid, time.time())
+                        flush()
+
+                        # Rolling state: retire exited tracks and old per-frame counts
+                        retire_before = timestamp - settings.STREAM_TRACK_RETIRE_SEC
+                        for tid in [t for t, d in track_data.items() if d['last_seen'] < retire_before and t not in queued_at]:
+                            del track_data[tid]
+                        oldest_idx = current_frame_idx - int(settings.STREAM_ANALYTICS_WINDOW_SEC * state["source_fps"])
+                        for idx in [i for i in frame_counts if i < oldest_idx]:
+                            del frame_counts[idx]
+
+                        if time.time() >= next_tune:
+                            next_tune = time.time() + 30.0
+                            active_tracks = len([t for t in track_data.values() if timestamp - t['last_seen'] < 2.0])
+                            session.monitor_agent_tune(active_tracks / 500.0)
+
+                        if time.time() >= next_analytics:
+                            next_analytics = time.time() + settings.STREAM_ANALYTICS_INTERVAL_SEC
+                            video.analytics_data = json.dumps(self._live_analytics(
+                                state, frame_counts, track_data, latencies, frames, motion_gate, start_wall))
+                            db.commit()
+                finally:
+                    frames.close()
+                    cap.release()
+                    state["frames"] += frames.frame_idx
+                    state["dropped"] += frames.dropped_frames
+
+                if not stop_event.is_set():
+                    state["reconnects"] += 1
+                    self._log_event(db, video.id, "SYSTEM", "Stream interrupted, reconnecting", current_frame_idx, timestamp)
+                    stop_event.wait(1.0)
+
+            # Stopped: everything still on screen becomes final
+            for tid, data in track_data.items():
+                if not data['processed'] and tid not in tracks_to_batch and data.get('vehicle_crop') is not None:
+                    tracks_to_batch.append(tid)
+                    queued_at.setdefault(tid, time.time())
+            flush(force=True)
+            video.status = VideoStatus.COMPLETED
+            self._log_event(db, video.id, "SYSTEM", f"Live analysis stopped. {state['detections']} detections written.", current_frame_idx, timestamp)
+        except Exception as e:
+            logger.error(f"Error processing live stream {video_id}: {e}")
+            self._log_event(db, video.id, "ERROR", f"Live stream failed: {str(e)[:100]}", is_error=True)
+            video.status = VideoStatus.FAILED
+        finally:
+            ocr_queue.close()
+            video.analytics_data = json.dumps(self._live_analytics(
+                state, frame_counts, track_data, latencies, None, motion_gate, start_wall))
+            db.commit()
+            print(f">>> [LIVE AGENT] Stream {video_id} finished ({video.status.value})")
+
+    def _live_analytics(self, state, frame_counts, track_data, latencies, frames, motion_gate, start_wall) -> dict:
+        ordered = sorted(latencies)
+        pct = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2) if ordered else None
+        return {
+            "live": True,
+            "total_vehicles_seen": state["detections"],
+            "frame_series": frame_counts,
+            "peak_vehicle_density": max(frame_counts.values()) if frame_counts else 0,
+            "capture_metrics": {
+                "total_detections": state["detections"],
+                "total_batches": state["batches"],
+            },
+            "latency": {
+                "plate_latency_p50_sec": pct(0.5),
+                "plate_latency_p95_sec": pct(0.95),
+                "plate_latency_max_sec": round(ordered[-1], 2) if ordered else None,
+                "samples": len(ordered),
+            },
+            "metadata": {
+                "uptime_sec": round(time.time() - start_wall, 1),
+                "total_frames": state["frames"] + (frames.frame_idx if frames else 0),
+                "dropped_frames": state["dropped"] + (frames.dropped_frames if frames else 0),
+                "active_tracks": len(track_data),
+                "reconnects": state["reconnects"],
+                "motion_gate": motion_gate.stats() if motion_gate else None,
+            },
+            "processed_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def _range_seconds(self, video):
+        """(start_sec, duration_sec) of a virtual chunk's frame range; (0, 0) for whole files."""
+        if video.range_end_frame is None:
+            return 0.0, 0.0
+        probe = cv2.VideoCapture(video.filepath)
+        src_fps = probe.get(cv2.CAP_PROP_FPS) or 30.0
+        probe.release()
+        start = video.range_start_frame or 0
+        return start / src_fps, (video.range_end_frame - start) / src_fps
+
+    def _ingest_vehicles(self, vehicles, frame, current_frame_idx, timestamp, track_data, frame_counts, frame_boxes,
+                         ocr_every: int = 1, plate_stats: BatchLatencyStats = None, ocr_scheduler: OCRScheduler = None,
+                         ocr_queue: OCRQueue = None):
+        """
+        Folds one analysed frame's tracked vehicles (Detections) into the per-track
+        state (golden frame, Re-ID embedding, best local plate read).
+        `ocr_every` > 1 (Governor Agent) runs plate detection + OCR on every n-th sighting of a track.
+        Plate detection runs once per frame for all vehicles (`plate_stats` records its latency);
+        plate crops go through the track's OCR schedule (`ocr_scheduler`) instead of OCR on every sighting,
+        and are recognized on `ocr_queue` when given; finished reads are applied here, on this thread,
+        the next time the track offers a crop (or when its batch is reviewed).
+        """
+        if not len(vehicles): return
+        ocr_scheduler = ocr_scheduler or OCRScheduler()
+
+        # v2.3.2 per-frame count increment
+        frame_counts[current_frame_idx] = frame_counts.get(current_frame_idx, 0) + len(vehicles)
+
+        plate_jobs = [] # (track_id, vehicle_crop) for this frame's single plate-model pass
+
+        # v5.1: boxes/ids converted once per frame, plain ints from here on
+        for (x1, y1, x2, y2), track_id in zip(vehicles.int_boxes().tolist(), vehicles.ids.tolist()):
+            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+
+            if track_id == -1: continue # Collage strategy requires tracking
+            frame_boxes.append([track_id, x1, y1, x2, y2])
+            
+            vehicle_crop = frame[y1:y2, x1:x2]
+            if vehicle_crop.size == 0: continue
+
+            # Initialize Track if New (v3.0 Comprehensive)
+            if track_id not in track_data:
+                track_data[track_id] = {
+                    'first_seen': timestamp,
+                    'last_seen': timestamp,
+                    'frames_seen': 0,
+                    'processed': False,
+                    # v2.3 Fields
+                    'best_blur': 0.0,
+                    'best_crop': None,
+                    'best_meta': None,
+                    'best_local_plate': None,
+                    'best_local_conf': 0.0,
+                    'plate_candidates': ocr_scheduler.track(), # v5.1 OCR Scheduler
+                    'plate_consensus': PlateConsensus(plate_grammar.is_valid, settings.CONSENSUS_MIN_READS,
+                                                      settings.CONSENSUS_MIN_CONF), # v5.1 Consensus Agent
+                    'vehicle_crop': None,
+                    # v3.0 Agentic Integrity Fields
+                    'first_pos': (cx, cy),
+                    'max_box_area': 0.0,
+                    'golden_frame_idx': -1,
+                    'visual_embedding': None,
+                    'blur_score': 0.0,
+                    'best_ts': timestamp,
+                    'travel_distance': 0.0
+                }
+            
+            data = track_data[track_id]
+            data['frames_seen'] += 1
+            data['last_seen'] = timestamp
+            
+            # v3.0: Ghost Track Removal (Ghost Trapping)
+            dist = ((cx - data['first_pos'][0])**2 + (cy - data['first_pos'][1])**2)**0.5
+            data['travel_distance'] = dist
+            
+            # v3.0: Re-ID Guardian (ID Swap Protection)
+            if data['frames_seen'] % 15 == 0:
+                new_embed = ai_service.reid_guardian_embedding(vehicle_crop)
+                data['visual_embedding'] = new_embed
+
+            # v3.0: Quality Gatekeeper (Filtering)
+            sharpness = ai_service.quality_gatekeeper_score(vehicle_crop)
+            
+            # v3.0: Capture Strategy (The Sniper) - "Golden Frame" selection
+            box_area = (x2 - x1) * (y2 - y1)
+            if box_area > data['max_box_area'] and sharpness > 50:
+                data['max_box_area'] = box_area
+                data['vehicle_crop'] = vehicle_crop.copy()
+                data['blur_score'] = sharpness
+                data['golden_frame_idx'] = current_frame_idx
+                data['best_ts'] = timestamp
+                print(f">>> [CAPTURE AGENT] Sniped Golden Frame for ID {track_id} (Area: {box_area}, Clarity: {sharpness:.1f})")
+
+            # v3.0: High-Res Plate Capture (for Jury Agent)
+            if (data['frames_seen'] - 1) % ocr_every: continue
+            plate_jobs.append((track_id, vehicle_crop))
+
+        if not plate_jobs: return
+        t0 = time.perf_counter()
+        all_plates = ai_service.detect_plates_batch([crop for _, crop in plate_jobs])
+        if plate_stats is not None: plate_stats.record(len(plate_jobs), time.perf_counter() - t0)
+
+        for (track_id, vehicle_crop), plates in zip(plate_jobs, all_plates):
+            data = track_data[track_id]
+            self._drain_plate_reads(data) # Earlier reads first: they raise the bar for this frame's crops
+            for px1, py1, px2, py2 in plates.int_boxes().tolist():
+                cand = data['plate_candidates'].offer(vehicle_crop[py1:py2, px1:px2])
+                if cand is not None: self._read_plate(data, cand, ocr_queue, scope=track_id)
+
+    def _ocr_queue(self, cache: PlateOCRCache = None) -> OCRQueue:
+        """Queue items are (plate crop, scope); the scope (track id) keeps cached reads per track."""
+        def recognize(jobs):
+            return ai_service.recognize_plates_batch([crop for crop, _ in jobs], allow_gemini=False,
+                                                     cache=cache, scopes=[scope for _, scope in jobs])
+        return OCRQueue(recognize, ai_service.ocr_batch_size, settings.OCR_QUEUE_MAX_WAIT_SEC)
+
+    def _read_plate(self, data, cand, ocr_queue: OCRQueue = None, scope=None):
+        """Local OCR for Jury, inline or through the OCR queue (the track keeps the Futures until drained)."""
+        if ocr_queue is None:
+            self._apply_plate_read(data, cand, ai_service.recognize_plate(cand.crop, allow_gemini=False))
+        else:
+            data.setdefault('ocr_jobs', []).append((ocr_queue.submit((cand.crop, scope)), cand))
+
+    def _drain_plate_reads(self, data, wait: bool = False):
+        """
+        Applies the track's finished queued reads. Runs on the detection thread, the only one
+        touching track state; the queue's worker thread only completes the Futures.
+        """
+        jobs = data.get('ocr_jobs')
+        if not jobs: return
+        if wait: futures_wait([future for future, _ in jobs])
+        pending = []
+        for future, cand in jobs:
+            if not future.done():
+                pending.append((future, cand))
+                continue
+            try:
+                self._apply_plate_read(data, cand, future.result())
+            except Exception as e:
+                logger.error(f"[OCR QUEUE] Plate read failed: {e}")
+        data['ocr_jobs'] = pending
+
+    def _apply_plate_read(self, data, cand, result):
+        """Keeps the track's most confident local read; every read also votes in the track's consensus."""
+        l_text, l_conf, _, _ = result
+        data['plate_candidates'].record(cand, l_text)
+        data['plate_consensus'].add(l_text, l_conf)
+        if l_text and l_conf > data['best_local_conf']:
+            data['best_local_plate'] = l_text
+            data['best_local_conf'] = l_conf
+            data['best_crop'] = cand.crop
+
+    def _filter_tracks(self, db: Session, video, session, track_data, tracks_to_batch, current_frame_idx, timestamp):
+        """
+        Queues exited (or long-running) tracks for collage batching and drops short ghost tracks.
+        Persistence follows the sensitivity of the video's own DetectionSession.
+        """
+        # HIGH: 5, BALANCED: 15, LOW: 25
+        persistence_thresh = settings.TRACK_PERSISTENCE_FRAMES
+        if session.sensitivity == "HIGH": persistence_thresh = 3 # More aggressive capture
+        elif session.sensitivity == "LOW": persistence_thresh = 25
+
+        for tid, data in track_data.items():
+            if not data['processed'] and tid not in tracks_to_batch:
+                # v2.3.9: Logic Refinement - Batch whenever persistence is reached, 
+                # even if no plate was detected yet (Contextual Forensics)
+                if (timestamp - data['last_seen'] > 1.5): # Increased timeout for robustness
+                    if data['frames_seen'] >= persistence_thresh:
+                        # Ensure we have at least a vehicle_crop for the collage
+                        if data.get('vehicle_crop') is not None:
+                            tracks_to_batch.append(tid)
+                            msg = f"Track {tid} validated ({data['frames_seen']} frames)"
+                            self._log_event(db, video.id, "FILTER", msg, current_frame_idx, timestamp)
+                            print(f">>> [FILTER AGENT] {msg}")
+                    else:
+                        # Low persistence - skip to save API costs
+                        data['processed'] = True
+                        msg = f"Dropped Track {tid} (Insufficient frames: {data['frames_seen']})"
+                        self._log_event(db, video.id, "FILTER", msg, current_frame_idx, timestamp)
+                        print(f">>> [FILTER AGENT] {msg}")
+                        
+                # v2.8: Periodic Batching for long tracks
+                if not data['processed'] and data['frames_seen'] >= 100 and data['frames_seen'] % 100 == 0:
+                    if data.get('vehicle_crop') is not None and tid not in tracks_to_batch:
+                        tracks_to_batch.append(tid)
+                        print(f">>> [MONITOR AGENT] Periodic batching for active track {tid}")
+
+    def _vehicle_stats(self, all_dets) -> dict:
+        """v2.5 Deep Aggregation: vehicle-type, helmet and overloading counts."""
+        stats = {
+            "CAR": 0, "MOTORCYCLE": 0, "SCOOTER": 0, "BICYCLE": 0, "BUS": 0, "TRUCK": 0, "AUTO": 0, "UNKNOWN": 0,
+            "HELMET": 0, "NO_HELMET": 0,
+            "OVERLOADED_BIKES": 0 # More than 2 on a bike
+        }
+        for d in all_dets:
+            stats[d.vehicle_type] = stats.get(d.vehicle_type, 0) + 1
+            if d.helmet_status == "HELMET": stats["HELMET"] += 1
+            elif d.helmet_status == "NO_HELMET": stats["NO_HELMET"] += 1
+            
+            if d.vehicle_type in ["MOTORCYCLE", "SCOOTER"] and d.passenger_count > 2:
+                stats["OVERLOADED_BIKES"] += 1
+        return stats
+
+    def _process_batch(self, db: Session, video, track_ids, track_data, all_detections, ocr_queue: OCRQueue = None):
         """
         Agent specific: Handles the batching intelligence loop.
+        With `ocr_queue`, final plate reads go through it too, so the OCR engine is only driven by the queue's thread.
         """
         import json  # Defensive import for hot-reload scenarios
         print(f">>> [ORCHESTRATOR] Triggering Case Review for IDs: {track_ids}")
+        # v5.1 OCR Scheduler: track is final, read its best plate crop not yet OCR'd (one batched call);
+        # queued reads of these tracks must have landed before the Jury sees best_local_plate
+        finals = []
+        for tid in track_ids:
+            data = track_data.get(tid)
+            if not data: continue
+            self._drain_plate_reads(data, wait=True)
+            cand = data['plate_candidates'].finalize()
+            if cand is not None: finals.append((tid, data, cand))
+        if finals:
+            if ocr_queue is not None:
+                for tid, data, cand in finals:
+                    self._read_plate(data, cand, ocr_queue, scope=tid)
+                for _, data, _ in finals:
+                    self._drain_plate_reads(data, wait=True)
+            else:
+                results = ai_service.recognize_plates_batch([cand.crop for _, _, cand in finals], allow_gemini=False)
+                for (_, data, cand), result in zip(finals, results):
+                    self._apply_plate_read(data, cand, result)
+
+        # v5.1 Consensus Agent: a confident, well-formed fused plate needs no cloud recheck
+        fused_ids = []
+        if settings.ENABLE_PLATE_CONSENSUS:
+            for tid in track_ids:
+                if tid not in track_data: continue
+                text, conf, confident = track_data[tid]['plate_consensus'].fuse()
+                if confident:
+                    track_data[tid]['fused_plate'], track_data[tid]['fused_conf'] = text, conf
+                    fused_ids.append(tid)
+                    print(f">>> [CONSENSUS AGENT] Track {tid}: {text} ({conf:.2f}), cloud recheck skipped")
+
         # v2.3.8: Use vehicle_crop instead of best_crop (plate crop)
         crops = []
         valid_ids = []
         for tid in track_ids:
             c = track_data[tid].get('vehicle_crop')
-            if c is not None:
+            if c is not None and tid not in fused_ids:
                 crops.append(c)
                 valid_ids.append(tid)
         
-        if not crops: return
+        if not crops and not fused_ids: return
         
         # v2.7: Mark processed EARLY to avoid retry loops on failure
         for tid in track_ids:
             if tid in track_data:
                 track_data[tid]['processed'] = True
 
-        collage = create_ai_collage(crops, valid_ids)
-        
-        # Save for diagnostic
-        os.makedirs(os.path.join(settings.STORAGE_PATH, "collages"), exist_ok=True)
-        import uuid
-        c_name = f"collage_{video.id}_{uuid.uuid4().hex[:8]}.jpg"
-        c_path = os.path.join(settings.STORAGE_PATH, "collages", c_name)
-        cv2.imwrite(c_path, collage)
-        
-        batch = DetectionBatch(video_id=video.id, collage_path=c_path, cost_estimate=0.5)
-        db.add(batch)
-        db.flush()
-        self._log_event(db, video.id, "CAPTURER", f"Generated 3x3 forensic grid for IDs: {track_ids}", extra_data=c_path)
+        batch, results = None, []
+        if crops:
+            batch, results = self._cloud_review(db, video, valid_ids, crops)
+        if fused_ids:
+            self._log_event(db, video.id, "CONSENSUS", f"Fused local plates accepted without cloud for IDs: {fused_ids}")
 
-        # Call Gemini Vision Agent
-        self._log_event(db, video.id, "GEMINI", f"Requesting cloud forensic analysis for batch of {len(track_ids)}...")
-        results = ai_service.rechecker.recheck_batch(collage, video.id)
-        import json  # Defensive import
-        print(f">>> [DEBUG] About to save batch.raw_json for {len(track_ids)} tracks...")
-        batch.raw_json = json.dumps(results)
-        print(">>> [DEBUG] Batch raw_json saved successfully")
-        
-        # v2.3.9: Store rich result in log (GEMINI tag)
-        self._log_event(db, video.id, "GEMINI", f"Result: {len(results)}/{len(track_ids)} IDs identified", extra_data=batch.raw_json)
-        
         for track_id_batch in track_ids:
             res = next((r for r in results if int(r.get('track_id', -1)) == track_id_batch), None) if results else None
             track = track_data[track_id_batch]
@@ -424,14 +990,17 @@ class VideoService:
                 pass
 
             # Weighted Arbitration
-            plate, ocr_source = ai_service.ocr_jury_arbitrate(
-                l_plate, 
-                raw_ai_plate, 
-                (res.get('type') or "UNKNOWN").upper()
-            )
+            if track_id_batch in fused_ids:
+                plate, ocr_source = track['fused_plate'], "LOCAL (Temporal Consensus)"
+            else:
+                plate, ocr_source = ai_service.ocr_jury_arbitrate(
+                    l_plate, 
+                    raw_ai_plate, 
+                    ((res or {}).get('type') or "UNKNOWN").upper()
+                )
             
             # v4.0: Semantic Validator Agent (Context Layer)
-            v_type = (res.get('type') or "UNKNOWN").upper()
+            v_type = ((res or {}).get('type') or "UNKNOWN").upper()
             if not ai_service.semantic_validator(plate, v_type):
                 self._log_event(db, video.id, "SEMANTIC", f"Warning: Logical mismatch for Track #{track_id_batch} ({v_type} <-> {plate})")
                 # We still keep it for audit but flag it (Status could be updated if needed)
@@ -440,6 +1009,8 @@ class VideoService:
             conf = res.get('confidence', 0.9) if res else (track.get('best_local_conf', 0.5) if l_plate else 0.0)
             v_info = f"{res.get('color', '')} {res.get('make', '')}".strip() if res else "IDENTIFIED"
             recheck_status = RecheckStatus.SUCCESS if ocr_source != "LOCAL" else RecheckStatus.FAILED
+            if track_id_batch in fused_ids:
+                conf, recheck_status = track['fused_conf'], RecheckStatus.SKIPPED
 
             # v2.9: Stateful Track Aggregation (Deduplication Logic)
             existing_det = db.query(VehicleDetection).filter(
@@ -464,11 +1035,11 @@ class VideoService:
                     existing_det.plate_number = plate
                     existing_det.confidence = conf
                     existing_det.vehicle_info = v_info
-                    existing_det.batch_id = batch.id
+                    existing_det.batch_id = batch.id if batch else existing_det.batch_id
                     existing_det.make_model = res.get('make') if res else existing_det.make_model
-                    existing_det.vehicle_type = (res.get('type') or existing_det.vehicle_type or "UNKNOWN").upper()
-                    existing_det.helmet_status = (res.get('helmet_status') or existing_det.helmet_status or "N/A").upper()
-                    existing_det.passenger_count = safe_int(res.get('passengers', 0))
+                    existing_det.vehicle_type = ((res or {}).get('type') or existing_det.vehicle_type or "UNKNOWN").upper()
+                    existing_det.helmet_status = ((res or {}).get('helmet_status') or existing_det.helmet_status or "N/A").upper()
+                    existing_det.passenger_count = safe_int((res or {}).get('passengers', 0))
                     existing_det.recheck_status = recheck_status
                     
                     # v3.0 Fields
@@ -486,14 +1057,14 @@ class VideoService:
                 else:
                     det = VehicleDetection(
                         video_id=video.id,
-                        batch_id=batch.id,
+                        batch_id=batch.id if batch else None,
                         plate_number=plate,
                         confidence=conf,
                         vehicle_info=v_info,
                         make_model=res.get('make') if res else None,
-                        vehicle_type=(res.get('type') or "UNKNOWN").upper(),
-                        helmet_status=(res.get('helmet_status') or "N/A").upper(),
-                        passenger_count=safe_int(res.get('passengers', 0)),
+                        vehicle_type=((res or {}).get('type') or "UNKNOWN").upper(),
+                        helmet_status=((res or {}).get('helmet_status') or "N/A").upper(),
+                        passenger_count=safe_int((res or {}).get('passengers', 0)),
                         recheck_status=recheck_status,
                         is_validated=True,
                         timestamp=track.get('best_ts', track['first_seen']),
@@ -513,6 +1084,34 @@ class VideoService:
         # Detections already added and recorded in memory
         db.commit()
 
+    def _cloud_review(self, db: Session, video, track_ids, crops):
+        """Collage of the tracks' vehicle crops -> one Gemini batch recheck. Returns (DetectionBatch, results)."""
+        collage = create_ai_collage(crops, track_ids)
+        
+        # Save for diagnostic
+        os.makedirs(os.path.join(settings.STORAGE_PATH, "collages"), exist_ok=True)
+        import uuid
+        c_name = f"collage_{video.id}_{uuid.uuid4().hex[:8]}.jpg"
+        c_path = os.path.join(settings.STORAGE_PATH, "collages", c_name)
+        cv2.imwrite(c_path, collage)
+        
+        batch = DetectionBatch(video_id=video.id, collage_path=c_path, cost_estimate=0.5)
+        db.add(batch)
+        db.flush()
+        self._log_event(db, video.id, "CAPTURER", f"Generated 3x3 forensic grid for IDs: {track_ids}", extra_data=c_path)
+
+        # Call Gemini Vision Agent
+        self._log_event(db, video.id, "GEMINI", f"Requesting cloud forensic analysis for batch of {len(track_ids)}...")
+        results = ai_service.rechecker.recheck_batch(collage, video.id)
+        import json  # Defensive import
+        print(f">>> [DEBUG] About to save batch.raw_json for {len(track_ids)} tracks...")
+        batch.raw_json = json.dumps(results)
+        print(">>> [DEBUG] Batch raw_json saved successfully")
+        
+        # v2.3.9: Store rich result in log (GEMINI tag)
+        self._log_event(db, video.id, "GEMINI", f"Result: {len(results)}/{len(track_ids)} IDs identified", extra_data=batch.raw_json)
+        return batch, results
+
     def _record_detection(self, db: Session, video, all_detections, plate_number, confidence, timestamp, frame_idx, frame, x1, y1, x2, y2, track_id, vehicle_info=None, raw_text=None, recheck_status=None, plate_crop=None):
         from app.models.models import RecheckStatus
         
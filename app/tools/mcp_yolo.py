@@ -1,7 +1,7 @@
 import json
 import torch
-from ultralytics import YOLO
 from app.core.config import settings
+from app.services.model_service import load_detector
 
 def tool(func):
     """Simple decorator to mark functions as tools."""
@@ -15,7 +15,7 @@ class YOLOTool:
     Returns: JSON structure of detections
     """
     def __init__(self):
-        self.model = YOLO(settings.YOLO_MODEL_PATH)
+        self.model = load_detector(settings.YOLO_MODEL_PATH)
 
     @tool
     def detect_vehicles(self, frame):
@@ -2,6 +2,7 @@ from celery import Celery
 from app.core.config import settings
 from app.db.session import SessionLocal
 from app.services.video_service import video_service
+from app.services.chunk_service import plan_frame_ranges
 from app.models.models import Video, VideoStatus
 import logging
 import os
@@ -54,23 +55,39 @@ def process_video_task(video_id: int):
                 logger.info(f"Video duration {duration_sec}s > {chunk_threshold_sec}s. Initiating CHUNKING.")
                 
                 # 1. Split Video
-                chunk_paths = video_service.split_video(video.filepath, settings.CHUNK_DURATION_MINUTES)
+                # v5.1: Virtual chunks are frame ranges over the original (no copies, fan-out starts at once)
+                if settings.VIRTUAL_CHUNKING:
+                    base, ext = os.path.splitext(video.filename)
+                    chunk_specs = [
+                        (video.filepath, f"{base}_chunk{i:03d}{ext}", start / fps, (start, end))
+                        for i, (start, end) in enumerate(plan_frame_ranges(
+                            int(frame_count), fps, chunk_threshold_sec, settings.CHUNK_OVERLAP_SECONDS))
+                    ]
+                else:
+                    chunk_specs = [
+                        (path, os.path.basename(path), start_sec, (None, None))
+                        for path, start_sec in video_service.split_video(video.filepath, settings.CHUNK_DURATION_MINUTES)
+                    ]
                 
                 # 2. Create DB entries
                 chunk_ids = []
-                for i, path in enumerate(chunk_paths):
-                    chunk_filename = os.path.basename(path)
+                for path, chunk_filename, start_sec, (start_frame, end_frame) in chunk_specs:
                     chunk_video = Video(
                         filename=chunk_filename,
                         filepath=path,
                         owner_id=video.owner_id,
                         is_chunk=True,
                         parent_video_id=video.id,
+                        chunk_offset_sec=start_sec,
+                        range_start_frame=start_frame,
+                        range_end_frame=end_frame,
+                        camera_id=video.camera_id,
                         status=VideoStatus.PENDING
                     )
                     db.add(chunk_video)
                     db.flush()
                     chunk_ids.append(chunk_video.id)
+                video.status = VideoStatus.PROCESSING
                 db.commit()
                 
                 # 3. Mode-based fan-out
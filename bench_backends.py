@@ -0,0 +1,48 @@
+"""
+Per-frame vehicle detection latency on CPU: PyTorch weights vs the v5.1 ONNX Runtime backend.
+Each frame is predict + ByteTrack update, i.e. the production one-frame path.
+
+Usage: python bench_backends.py [video_path] [n_frames]
+Without a path, synthetic 1280x720 frames are used.
+"""
+import sys
+import os
+import time
+import numpy as np
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.core.config import settings
+from app.services.model_service import load_detector
+from app.services.tracking_service import VehicleTracker
+from bench_batching import load_frames
+
+BACKENDS = ("torch", "onnx")
+
+def bench(model, frames):
+    tracker = VehicleTracker()
+    for frame in frames[:3]: # Warmup
+        model.predict(frame, classes=[2, 3, 5, 7], verbose=False)
+    latencies, tracked = [], 0
+    for frame in frames:
+        t0 = time.perf_counter()
+        result = model.predict(frame, classes=[2, 3, 5, 7], verbose=False, conf=settings.DETECTION_THRESHOLD)[0]
+        tracked += len(tracker.update(result))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return np.array(latencies), tracked
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    n_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    if not os.path.exists(settings.YOLO_MODEL_PATH):
+        sys.exit(f"Weights not found at {settings.YOLO_MODEL_PATH}")
+    frames = load_frames(path, n_frames)
+    print(f">>> Inference backend benchmark: {len(frames)} frames, model {settings.YOLO_MODEL_PATH}, CPU")
+
+    baseline = None
+    for backend in BACKENDS:
+        lat, tracked = bench(load_detector(settings.YOLO_MODEL_PATH, backend), frames)
+        baseline = baseline or lat.mean()
+        print(f"  {backend:<6} mean {lat.mean():7.1f} ms  p50 {np.percentile(lat, 50):7.1f} ms  "
+              f"p95 {np.percentile(lat, 95):7.1f} ms  ({baseline / lat.mean():4.2f}x)  tracked boxes: {tracked}")
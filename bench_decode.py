@@ -0,0 +1,82 @@
+"""
+Decode cost per analysed frame: read-every-frame loop vs the v5.1 sampled reader.
+
+Usage: python bench_decode.py [video_path] [frame_skip]
+Without a path, a synthetic 1280x720 clip is generated in storage/bench/.
+"""
+import sys
+import os
+import time
+import shutil
+import cv2
+import numpy as np
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.services.decode_service import SampledFrameReader, sampling_step
+from app.services.ingest_service import FFmpegFrameStream, CONDITIONED_FPS
+
+def make_clip(path, n_frames=300, size=(1280, 720), fps=30):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    w, h = size
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+    for i in range(n_frames):
+        frame = np.roll(base, i * 4, axis=1)
+        cv2.rectangle(frame, (i * 3 % w, h // 2), (i * 3 % w + 120, h // 2 + 60), (0, 0, 255), -1)
+        out.write(frame)
+    out.release()
+    return path
+
+def bench_legacy(path, frame_skip):
+    """Baseline: cap.read() on every frame, analyse every frame_skip-th."""
+    cap = cv2.VideoCapture(path)
+    idx, analysed = 0, 0
+    t0 = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret: break
+        if idx % frame_skip == 0: analysed += 1
+        idx += 1
+    dt = time.perf_counter() - t0
+    cap.release()
+    return dt, analysed
+
+def bench_reader(cap, fps, frame_skip, sample_fps=0.0):
+    reader = SampledFrameReader(cap, fps, frame_skip=frame_skip, sample_fps=sample_fps)
+    t0 = time.perf_counter()
+    analysed = sum(1 for *_, sampled in reader if sampled)
+    dt = time.perf_counter() - t0
+    cap.release()
+    return dt, analysed
+
+def report(label, dt, analysed):
+    per = dt / analysed * 1000 if analysed else float('nan')
+    print(f"{label:<44} {analysed:>6} analysed  {dt:7.2f}s  {per:7.2f} ms/analysed frame")
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else make_clip(os.path.join("storage", "bench", "bench_decode.mp4"))
+    frame_skip = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    probe = cv2.VideoCapture(path)
+    fps = probe.get(cv2.CAP_PROP_FPS) or 30.0
+    w, h = int(probe.get(cv2.CAP_PROP_FRAME_WIDTH)), int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    n = int(probe.get(cv2.CAP_PROP_FRAME_COUNT))
+    probe.release()
+    print(f">>> Decode benchmark: {path} ({w}x{h} @ {fps:.1f} FPS, {n} frames), FRAME_SKIP_AI={frame_skip}")
+
+    report("before: cap.read() every frame", *bench_legacy(path, frame_skip))
+    report("after:  grab() for skipped frames", *bench_reader(cv2.VideoCapture(path), fps, frame_skip))
+    report("after:  time mode (5 analysed frames/s)", *bench_reader(cv2.VideoCapture(path), fps, frame_skip, sample_fps=5))
+
+    if shutil.which('ffmpeg'):
+        n_cfr = int(round(n / fps * CONDITIONED_FPS))
+        full = FFmpegFrameStream(path, w, h, n_cfr)
+        report("before: FFmpeg stream, all frames piped", *bench_reader(full, CONDITIONED_FPS, frame_skip))
+        step = sampling_step(CONDITIONED_FPS, frame_skip)
+        dropped = FFmpegFrameStream(path, w, h, n_cfr, frame_step=step)
+        report(f"after:  FFmpeg stream, select every {step}", *bench_reader(dropped, CONDITIONED_FPS, frame_skip))
+    else:
+        print("(ffmpeg not on PATH: streaming comparison skipped)")
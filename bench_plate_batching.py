@@ -0,0 +1,63 @@
+"""
+Plate detection latency per frame vs vehicles in the frame: one plate-model call per
+vehicle crop (pre-v5.1) against one batched call for all crops of the frame.
+
+Usage: python bench_plate_batching.py [video_path] [repeats]
+Crops come from the vehicle model on the video's first frames; without a path,
+synthetic 240x180 crops are used.
+"""
+import sys
+import os
+import time
+import numpy as np
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.core.config import settings
+from app.services.model_service import load_detector
+from app.services.detection_service import BatchLatencyStats
+from bench_batching import load_frames
+
+VEHICLE_COUNTS = (1, 5, 10, 25)
+
+def load_crops(path, n):
+    if not path:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 255, (180, 240, 3), dtype=np.uint8) for _ in range(n)]
+    vehicle_model = load_detector(settings.YOLO_MODEL_PATH)
+    crops = []
+    for frame in load_frames(path, 200):
+        for x1, y1, x2, y2 in vehicle_model.predict(frame, classes=[2, 3, 5, 7], verbose=False)[0].boxes.xyxy.cpu().numpy().astype(int):
+            crops.append(frame[y1:y2, x1:x2])
+        if len(crops) >= n: break
+    return (crops * n)[:n] if crops else load_crops(None, n)
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    if not os.path.exists(settings.PLATE_MODEL_PATH):
+        sys.exit(f"Plate weights not found at {settings.PLATE_MODEL_PATH}")
+    plate_model = load_detector(settings.PLATE_MODEL_PATH)
+    crops = load_crops(path, max(VEHICLE_COUNTS))
+    plate_model(crops[:2], verbose=False) # Warmup
+    sequential, batched = BatchLatencyStats(), BatchLatencyStats()
+    print(f">>> Plate detection benchmark: model {settings.PLATE_MODEL_PATH}, {repeats} frames per count")
+
+    for n in VEHICLE_COUNTS:
+        frame_crops = crops[:n]
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            for crop in frame_crops:
+                plate_model(crop, verbose=False)
+            sequential.record(n, time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            for start in range(0, n, settings.PLATE_BATCH_MAX):
+                plate_model(frame_crops[start:start + settings.PLATE_BATCH_MAX], verbose=False)
+            batched.record(n, time.perf_counter() - t0)
+
+    seq, bat = sequential.stats(), batched.stats()
+    for n in VEHICLE_COUNTS:
+        label = BatchLatencyStats.bucket(n)
+        print(f"  vehicles={n:<3} per-vehicle {seq[label]['avg_ms']:8.1f} ms/frame   "
+              f"batched {bat[label]['avg_ms']:8.1f} ms/frame   ({seq[label]['avg_ms'] / bat[label]['avg_ms']:4.2f}x)")
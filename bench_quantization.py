@@ -0,0 +1,78 @@
+"""
+INT8 regression harness (v5.1): float ONNX vs statically quantized ONNX on a fixed frame set
+sampled from our stored videos. Reports mAP@0.5 drift and speedup for the vehicle model, plate
+recall drift for the plate model (on vehicle crops), and records whether each model is within
+QUANT_MAX_MAP_DRIFT / QUANT_MAX_PLATE_RECALL_DRIFT. INFERENCE_BACKEND=int8 only loads approved models.
+
+There are no hand labels for our footage, so the float model's detections are the reference:
+drift is how much quantization changes what the detector sees.
+
+Usage: python bench_quantization.py [n_eval_frames]
+"""
+import sys
+import os
+import time
+import numpy as np
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.core.config import settings
+from app.services.model_service import cached_export, load_onnx, _export_onnx
+from app.services.quantization_service import (
+    stored_videos, sample_frames, int8_export, map50, recall50, write_report
+)
+
+VEHICLE_CLASSES = [2, 3, 5, 7]
+
+def run(model, images, classes=None):
+    preds, times = [], []
+    for img in images:
+        t0 = time.perf_counter()
+        result = model.predict(img, classes=classes, conf=settings.DETECTION_THRESHOLD, verbose=False)[0]
+        times.append(time.perf_counter() - t0)
+        preds.append(result.boxes.cpu().numpy().data[:, :6].copy() if result.boxes is not None else np.empty((0, 6)))
+    return preds, float(np.mean(times)) if times else 0.0
+
+def vehicle_crops(preds, frames):
+    crops = []
+    for dets, frame in zip(preds, frames):
+        for x1, y1, x2, y2 in dets[:, :4].astype(int):
+            if x2 - x1 > 20 and y2 - y1 > 20:
+                crops.append(frame[max(0, y1):y2, max(0, x1):x2])
+    return crops
+
+def evaluate(name, weights, calib, images, classes=None, plates=False):
+    float_model = load_onnx(cached_export(weights, _export_onnx, "onnx"))
+    int8_model = load_onnx(int8_export(weights, calib))
+    ref, float_sec = run(float_model, images, classes)
+    cand, int8_sec = run(int8_model, images, classes)
+    result = {
+        "eval_images": len(images),
+        "map50_vs_float": round(map50(cand, ref), 4),
+        "float_ms": round(float_sec * 1000, 2),
+        "int8_ms": round(int8_sec * 1000, 2),
+        "speedup": round(float_sec / int8_sec, 2) if int8_sec else 0.0,
+    }
+    result["map_drift"] = round(1.0 - result["map50_vs_float"], 4)
+    if plates:
+        result["plate_recall_drift"] = round(1.0 - recall50(cand, ref), 4)
+    result = write_report(weights, result)
+    print(f"  {name:<8} {result}")
+    return float_model, ref
+
+if __name__ == "__main__":
+    n_eval = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    videos = stored_videos()
+    if not videos:
+        sys.exit(f"No stored videos under {settings.STORAGE_PATH} to calibrate/evaluate on")
+    calib = sample_frames(videos, settings.QUANT_CALIBRATION_FRAMES, phase=0.5)
+    frames = sample_frames(videos, n_eval, phase=0.25) # Disjoint from the calibration picks
+    print(f">>> INT8 harness: {len(videos)} videos, {len(calib)} calibration / {len(frames)} evaluation frames")
+
+    vehicle_model, vehicle_ref = evaluate("vehicle", settings.YOLO_MODEL_PATH, calib, frames, VEHICLE_CLASSES)
+    if os.path.exists(settings.PLATE_MODEL_PATH):
+        # The plate model sees vehicle crops in production, so calibrate and score it on those
+        calib_preds, _ = run(vehicle_model, calib, VEHICLE_CLASSES)
+        evaluate("plate", settings.PLATE_MODEL_PATH, vehicle_crops(calib_preds, calib),
+                 vehicle_crops(vehicle_ref, frames), plates=True)
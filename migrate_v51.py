@@ -0,0 +1,34 @@
+from sqlalchemy import create_engine, text
+import os
+
+# Database connection URL
+if os.path.exists("vehicle_detect.db"):
+    DB_URL = "sqlite:///vehicle_detect.db"
+    engine = create_engine(DB_URL)
+
+    with engine.connect() as conn:
+        print(">>> Adding v5.1 Chunking columns...")
+
+        # 1. chunk_offset_sec
+        try:
+            conn.execute(text("ALTER TABLE videos ADD COLUMN chunk_offset_sec FLOAT"))
+            print("  - Added chunk_offset_sec")
+        except Exception as e: print(f"  - chunk_offset_sec exists or error: {e}")
+
+        # 2. range_start_frame / range_end_frame (virtual chunks)
+        for col in ("range_start_frame", "range_end_frame"):
+            try:
+                conn.execute(text(f"ALTER TABLE videos ADD COLUMN {col} INTEGER"))
+                print(f"  - Added {col}")
+            except Exception as e: print(f"  - {col} exists or error: {e}")
+
+        # 3. camera_id (per-camera ROI polygons)
+        try:
+            conn.execute(text("ALTER TABLE videos ADD COLUMN camera_id VARCHAR"))
+            print("  - Added camera_id")
+        except Exception as e: print(f"  - camera_id exists or error: {e}")
+
+        conn.commit()
+    print(">>> v5.1 Migration Complete.")
+else:
+    print("Database not found.")
@@ -0,0 +1,26 @@
+import sys
+import subprocess
+
+# Serves a local video as a looping live stream for testing live mode:
+#   python sim_stream.py storage/sample.mp4 [port]
+# then POST /api/videos/live with {"url": "http://127.0.0.1:8554/live.ts"}
+
+if len(sys.argv) < 2:
+    print("Usage: python sim_stream.py <video_file> [port]")
+    sys.exit(1)
+
+video_file = sys.argv[1]
+port = sys.argv[2] if len(sys.argv) > 2 else "8554"
+url = f"http://127.0.0.1:{port}/live.ts"
+
+print(f">>> Serving {video_file} at {url} (Ctrl+C to stop)")
+while True:
+    # -listen serves one client at a time; restart so the API can reconnect
+    code = subprocess.call([
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-re", "-stream_loop", "-1", "-i", video_file,
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency", "-an",
+        "-f", "mpegts", "-listen", "1", url
+    ])
+    if code not in (0, 1):
+        break
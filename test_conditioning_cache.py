@@ -0,0 +1,57 @@
+import sys
+import os
+import time
+import tempfile
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.services.ingest_service import ConditioningCache
+
+RECIPE = "fps=fps=30,unsharp -c:v libx264"
+
+def write(path: str, data: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def test_peek_never_hashes_the_source():
+    print(">>> Testing stat-only cache lookup for streaming ingest...")
+    root = tempfile.mkdtemp()
+    cache = ConditioningCache(root, max_bytes=1 << 30)
+    source = write(os.path.join(tempfile.mkdtemp(), "cam.mp4"), b"raw" * 1000)
+
+    assert cache.peek(source, RECIPE) is None
+    assert cache._digests == {}, "No FILE-mode entry yet: the source bytes are never read"
+
+    key = cache.key_for(source, RECIPE)
+    stored = cache.store(write(os.path.join(root, "tmp.partial.mp4"), b"conditioned"), key)
+    cache.remember(source, RECIPE, key)
+    cache._digests.clear()
+    assert cache.peek(source, RECIPE) == stored
+    assert cache._digests == {}, "Hit found by (path, size, mtime) alone"
+    assert cache.peek(source, "other recipe") is None
+
+    time.sleep(0.01)
+    write(source, b"raw" * 1001) # Re-uploaded under the same name
+    assert cache.peek(source, RECIPE) is None
+
+def test_eviction_drops_stale_hints():
+    print(">>> Testing that evicted entries take their source hints with them...")
+    root = tempfile.mkdtemp()
+    cache = ConditioningCache(root, max_bytes=15)
+    sources = [write(os.path.join(tempfile.mkdtemp(), f"cam{i}.mp4"), bytes([i]) * 100) for i in range(2)]
+    for i, source in enumerate(sources):
+        key = cache.key_for(source, RECIPE)
+        cache.store(write(os.path.join(root, f"tmp{i}.partial.mp4"), b"x" * 10), key)
+        cache.remember(source, RECIPE, key)
+        time.sleep(0.01)
+    cache.evict()
+
+    assert cache.peek(sources[0], RECIPE) is None
+    assert cache.peek(sources[1], RECIPE) is not None
+    assert len([n for n in os.listdir(root) if n.endswith(".source")]) == 1
+
+if __name__ == "__main__":
+    test_peek_never_hashes_the_source()
+    test_eviction_drops_stale_hints()
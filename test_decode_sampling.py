@@ -0,0 +1,132 @@
+import sys
+import os
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+import numpy as np
+import time
+from app.services.decode_service import SampledFrameReader, PrefetchFrameReader, LatestFrameReader, sampling_step
+
+class MockCapture:
+    """Counts full decodes vs grab-only advances."""
+    def __init__(self, n_frames, frame_step=1):
+        self.n_frames = n_frames
+        self.pos = 0
+        self.reads = 0
+        self.grabs = 0
+        if frame_step > 1:
+            self.frame_step = frame_step
+
+    def read(self, image=None):
+        if self.pos >= self.n_frames: return False, None
+        if image is None: image = np.empty((4, 4, 3), dtype=np.uint8)
+        image.fill(self.pos % 256)
+        self.pos += 1
+        self.reads += 1
+        return True, image
+
+    def grab(self):
+        if self.pos >= self.n_frames: return False
+        self.pos += 1
+        self.grabs += 1
+        return True
+
+def test_frame_mode_grabs_skipped_frames():
+    print(">>> Testing FRAME_SKIP_AI sampling (grab-only skips)...")
+    cap = MockCapture(10)
+    reader = SampledFrameReader(cap, fps=30, frame_skip=3)
+    sampled = [idx for idx, ts, frame, s in reader if s]
+    print(f"Sampled: {sampled}, reads: {cap.reads}, grabs: {cap.grabs}")
+    assert sampled == [0, 3, 6, 9], "Should match idx % FRAME_SKIP_AI == 0"
+    assert cap.reads == 4 and cap.grabs == 6, "Skipped frames must not be decoded"
+    assert reader.frame_idx == 10
+
+def test_keep_all_frames_for_output_video():
+    print(">>> Testing full decode when output video is written...")
+    cap = MockCapture(6)
+    reader = SampledFrameReader(cap, fps=30, frame_skip=3, keep_all_frames=True)
+    frames = list(reader)
+    assert all(f is not None for _, _, f, _ in frames)
+    assert [s for *_, s in frames] == [True, False, False, True, False, False]
+    assert cap.grabs == 0
+
+def test_time_mode_ignores_source_fps():
+    print(">>> Testing time-based sampling (N frames per second of source)...")
+    for fps in (25, 30, 60):
+        cap = MockCapture(fps * 4)
+        reader = SampledFrameReader(cap, fps=fps, frame_skip=3, sample_fps=5)
+        n = sum(1 for *_, s in reader if s)
+        print(f"  {fps} FPS source -> {n} analysed frames in 4s")
+        assert n == 20, "Expected 5 analysed frames per second"
+
+def test_max_frames_ends_range():
+    print(">>> Testing virtual chunk range limit...")
+    cap = MockCapture(100)
+    reader = SampledFrameReader(cap, fps=30, frame_skip=3, max_frames=30)
+    sampled = [idx for idx, ts, frame, s in reader if s]
+    assert sampled == list(range(0, 30, 3)) and cap.pos == 30, "Nothing past the range may be read"
+
+def test_upstream_frame_step_keeps_source_indices():
+    print(">>> Testing FFmpeg-side frame dropping (frame_step)...")
+    cap = MockCapture(4, frame_step=3) # Upstream already emits every 3rd frame
+    reader = SampledFrameReader(cap, fps=30, frame_skip=3)
+    got = [(idx, s) for idx, ts, frame, s in reader]
+    assert got == [(0, True), (3, True), (6, True), (9, True)]
+    assert sampling_step(30, 3) == 3 and sampling_step(30, 3, sample_fps=10) == 3
+
+def test_prefetch_reuses_ring_buffers():
+    print(">>> Testing threaded prefetch ring (no per-frame allocation)...")
+    cap = MockCapture(30)
+    reader = SampledFrameReader(cap, fps=30, frame_skip=3)
+    prefetch = PrefetchFrameReader(reader, depth=3, frame_shape=(4, 4, 3))
+    seen, buffers = [], set()
+    try:
+        for idx, ts, frame, sampled in prefetch:
+            assert sampled and int(frame[0, 0, 0]) == idx, "Frame content must match its index"
+            seen.append(idx)
+            buffers.add(id(frame))
+    finally:
+        prefetch.close()
+    stats = prefetch.stats()
+    print(f"Frames: {len(seen)}, distinct buffers: {len(buffers)}, stats: {stats}")
+    assert seen == list(range(0, 30, 3))
+    assert len(buffers) <= 3 and stats["reallocations"] == 0
+    assert prefetch.frame_idx == 30
+
+class LiveMockCapture(MockCapture):
+    """Emits frames at a fixed rate like a camera."""
+    def read(self, image=None):
+        time.sleep(0.005)
+        return super().read(image)
+
+def test_live_reader_drops_stale_frames():
+    print(">>> Testing live reader (newest frame wins, bounded buffers)...")
+    cap = LiveMockCapture(60)
+    reader = LatestFrameReader(cap)
+    seen, buffers = [], set()
+    try:
+        while True:
+            ok, idx, frame = reader.read(timeout=1.0)
+            if not ok: break
+            assert int(frame[0, 0, 0]) == idx % 256, "Frame content must match its index"
+            seen.append(idx)
+            buffers.add(id(frame))
+            time.sleep(0.02) # Slow consumer
+    finally:
+        reader.close()
+    stats = reader.stats()
+    print(f"Delivered: {len(seen)}, stats: {stats}")
+    assert seen == sorted(seen) and seen[-1] == 59, "Must always deliver the newest frame"
+    assert stats["dropped_frames"] > 0 and stats["dropped_frames"] + len(seen) == 60
+    assert len(buffers) <= 3
+
+if __name__ == "__main__":
+    test_frame_mode_grabs_skipped_frames()
+    test_keep_all_frames_for_output_video()
+    test_time_mode_ignores_source_fps()
+    test_max_frames_ends_range()
+    test_upstream_frame_step_keeps_source_indices()
+    test_prefetch_reuses_ring_buffers()
+    test_live_reader_drops_stale_frames()
+    print(">>> Decode Sampling Tests PASSED.")
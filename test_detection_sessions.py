@@ -0,0 +1,170 @@
+import sys
+import os
+import time
+import threading
+import numpy as np
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.services.model_service import SharedModel
+from app.services.detection_service import DetectionSession, Detections, BatchLatencyStats
+
+class FakeBoxes:
+    def __init__(self, data, cols=7): self.data = np.asarray(data, dtype=np.float32).reshape(-1, cols)
+    def cpu(self): return self
+    def numpy(self): return self
+    @property
+    def xyxy(self): return self.data[:, :4]
+    def __len__(self): return len(self.data)
+    def __getitem__(self, idx): return FakeBoxes(self.data[idx])
+
+class FakeResult:
+    def __init__(self, data): self.boxes = FakeBoxes(data, cols=6)
+
+class FakeModel:
+    """Returns the frame's fill value as a box x offset; records overlapping calls."""
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.confs = []
+
+    def predict(self, images, conf=None, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        self.confs.append(conf)
+        time.sleep(0.002)
+        self.active -= 1
+        return [FakeResult([[int(img[0, 0, 0]), 10, int(img[0, 0, 0]) + 20, 30, 0.9, 2]]) for img in images]
+
+class FakeTracker:
+    """Counts frames and hands out its own ids, like ByteTrack's per-instance counter."""
+    def __init__(self):
+        self.frames = 0
+    def update_array(self, dets, img):
+        self.frames += 1
+        return FakeBoxes([[*dets[0, :4], self.frames, 0.9, 2]])
+
+class IoUTracker:
+    """Minimal ByteTrack stand-in: a box keeps the id of last frame's box it overlaps (IoU > 0.5)."""
+    def __init__(self):
+        self.last, self.next_id, self.inputs = [], 1, []
+
+    def update_array(self, dets, img):
+        self.inputs.append(dets[:, :4].copy())
+        tracked = []
+        for box in dets:
+            match = next((tid for tid, prev in self.last if _iou(box[:4], prev) > 0.5), None)
+            if match is None:
+                match, self.next_id = self.next_id, self.next_id + 1
+            tracked.append([*box[:4], match, box[4], box[5]])
+        self.last = [(row[4], np.array(row[:4])) for row in tracked]
+        return FakeBoxes(tracked)
+
+def _iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    return inter / ((a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter)
+
+class ScaledModel:
+    """One car at a fixed full-resolution position, reported in the pixels of whatever image it is given."""
+    def __init__(self, box, frame_w):
+        self.box, self.frame_w = np.array(box, dtype=np.float32), frame_w
+
+    def predict(self, images, **kwargs):
+        return [FakeResult([[*(self.box * img.shape[1] / self.frame_w), 0.9, 2]]) for img in images]
+
+def _session(model, name):
+    return DetectionSession(model, threshold=0.25, sensitivity="BALANCED", tracker=FakeTracker(), name=name)
+
+def test_sessions_isolate_tracker_and_threshold():
+    print(">>> Testing per-video detection sessions...")
+    model = SharedModel(FakeModel())
+    a, b = _session(model, "video 1"), _session(model, "video 2")
+    frame = np.full((120, 160, 3), 7, dtype=np.uint8)
+    for _ in range(3): a.detect_vehicles(frame)
+    first_b = b.detect_vehicles(frame)
+    assert a.tracker.frames == 3 and b.tracker.frames == 1
+    assert first_b.ids.tolist() == [1], "A new video starts its own track ids"
+
+    a.monitor_agent_tune(0.0) # Quiet scene: lower threshold for video 1 only
+    assert a.current_threshold == 0.2 and b.current_threshold == 0.25
+    b.detect_vehicles(frame)
+    assert model.model.confs[-1] == 0.25, "Video 2 keeps its own threshold"
+
+def test_shared_model_serializes_concurrent_sessions():
+    print(">>> Testing concurrent sessions on shared weights...")
+    fake = FakeModel()
+    model = SharedModel(fake)
+    sessions = [_session(model, f"video {i}") for i in range(4)]
+    errors = []
+
+    def run(session, value):
+        frame = np.full((120, 160, 3), value, dtype=np.uint8)
+        for _ in range(20):
+            boxes = session.detect_vehicles(frame)
+            if boxes.xyxy[0, 0] != value: errors.append((value, boxes.xyxy[0, 0]))
+
+    threads = [threading.Thread(target=run, args=(s, i * 10)) for i, s in enumerate(sessions)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    print(f"Max overlapping forward passes: {fake.max_active}")
+    assert not errors, "Each session gets its own frame's detections"
+    assert fake.max_active == 1
+    assert all(s.tracker.frames == 20 for s in sessions)
+
+def test_track_ids_survive_resolution_changes():
+    print(">>> Testing that Governor resolution changes keep live track ids...")
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    box = [900, 500, 1100, 650]
+    session = DetectionSession(SharedModel(ScaledModel(box, 1920)), threshold=0.25, sensitivity="BALANCED",
+                               tracker=IoUTracker(), name="governed")
+    session.slicing = False
+    ids = []
+    for resolution in (1280, 1280, 960, 640, 640, 1280):
+        session.detection_resolution = resolution # As ThroughputGovernor._apply does between frames
+        dets = session.detect_vehicles(frame)
+        ids.extend(dets.ids.tolist())
+    print(f"Track ids: {ids}")
+    assert ids == [1] * 6, "Same car, same id at every detection resolution"
+    assert all(np.allclose(b, [box], atol=1.0) for b in session.tracker.inputs), "Tracker sees full-resolution pixels"
+
+def test_detections_struct_of_arrays():
+    print(">>> Testing Detections container...")
+    tracked = np.array([[10.7, 20.2, 50.9, 60.5, 3, 0.8, 2],
+                        [100, 100, 140, 150, 9, 0.6, 7]], dtype=np.float32)
+    dets = Detections.from_array(tracked, scale=0.5, offset=(100, 0)) # Detected at half res on an ROI crop
+    assert dets.ids.tolist() == [3, 9] and dets.classes.tolist() == [2, 7]
+    assert dets.int_boxes()[0].tolist() == [121, 40, 201, 121], "Rescaled, offset, truncated like int()"
+    assert np.allclose(dets.confs, [0.8, 0.6])
+    assert dets.xyxy.flags['C_CONTIGUOUS'] and dets.xyxy.dtype == np.float32
+
+    untracked = Detections.from_array(np.array([[1, 2, 3, 4, 0.5, 3]], dtype=np.float32))
+    assert untracked.ids.tolist() == [-1] and untracked.classes.tolist() == [3]
+
+    kept = dets[np.array([False, True])]
+    assert len(kept) == 1 and kept.ids.tolist() == [9]
+    assert len(Detections.empty()) == 0 and len(Detections.from_boxes(None)) == 0
+
+def test_batch_latency_by_vehicle_count():
+    print(">>> Testing plate-detection latency report...")
+    stats = BatchLatencyStats()
+    stats.record(1, 0.010)
+    stats.record(3, 0.015)
+    stats.record(4, 0.021)
+    stats.record(25, 0.050)
+    stats.record(0, 1.0) # Frames without vehicles don't call the plate model
+    report = stats.stats()
+    print(f"Report: {report}")
+    assert set(report) == {"1", "2-4", "20+"}
+    assert report["2-4"]["calls"] == 2 and report["2-4"]["avg_items"] == 3.5
+    assert report["20+"]["ms_per_item"] == 2.0
+
+if __name__ == "__main__":
+    test_sessions_isolate_tracker_and_threshold()
+    test_shared_model_serializes_concurrent_sessions()
+    test_track_ids_survive_resolution_changes()
+    test_detections_struct_of_arrays()
+    test_batch_latency_by_vehicle_count()
+    print(">>> Detection Session Tests PASSED.")
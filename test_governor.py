@@ -0,0 +1,65 @@
+import sys
+import os
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.services.governor_service import ThroughputGovernor
+
+class FakeReader:
+    def __init__(self, frame_skip=3, sample_fps=0.0):
+        self.frame_skip = frame_skip
+        self.sample_fps = sample_fps
+
+class FakeSession:
+    def __init__(self, resolution=1280, slicing=True):
+        self.detection_resolution = resolution
+        self.slicing = slicing
+
+class Clock:
+    def __init__(self): self.t = 0.0
+    def __call__(self): return self.t
+
+def _drive(gov, clock, speed, windows, media):
+    """Processes `windows` decision windows at `speed` media sec per wall sec."""
+    for _ in range(windows):
+        clock.t += gov.interval_sec
+        media[0] += speed * gov.interval_sec
+        gov.update(media[0])
+
+def test_governor_degrades_until_on_target():
+    print(">>> Testing governor degradation when behind real time...")
+    clock, reader, session = Clock(), FakeReader(), FakeSession()
+    gov = ThroughputGovernor(1.0, reader, session, interval_sec=10.0, clock=clock)
+    media = [0.0]
+    gov.update(0.0)
+    _drive(gov, clock, 0.5, 3, media)
+    print(f"Decisions: {gov.decisions}")
+    assert gov.level == 3 and len(gov.decisions) == 3
+    assert gov.ocr_every == 2 and session.slicing is False and session.detection_resolution == 960
+    assert reader.frame_skip == 3, "Sampling is the last resort"
+    _drive(gov, clock, 0.5, 10, media)
+    assert gov.level == len(gov.levels) - 1, "Stops at the last step"
+    assert reader.frame_skip == 9 and session.detection_resolution == 640
+
+def test_governor_restores_with_headroom_and_holds_in_band():
+    print(">>> Testing governor recovery and hysteresis...")
+    clock, reader, session = Clock(), FakeReader(sample_fps=6.0), FakeSession(slicing=False)
+    gov = ThroughputGovernor(3.0, reader, session, interval_sec=5.0, clock=clock) # 15-min chunk in 5 min
+    assert all(not lvl["slicing"] for lvl in gov.levels)
+    assert len(gov.levels) == len({tuple(sorted(l.items())) for l in gov.levels}), "No-op steps are skipped"
+    media = [0.0]
+    gov.update(0.0)
+    _drive(gov, clock, 1.0, 3, media)
+    assert reader.sample_fps == 3.0, "TIME mode: stride halves the sample rate"
+    level = gov.level
+    _drive(gov, clock, 3.2, 4, media) # Within [0.95, 1.3] x target: hold
+    assert gov.level == level
+    _drive(gov, clock, 6.0, 10, media)
+    assert gov.level == 0 and reader.sample_fps == 6.0 and session.detection_resolution == 1280
+    assert gov.stats()["decisions"][-1]["reason"].startswith("headroom")
+
+if __name__ == "__main__":
+    test_governor_degrades_until_on_target()
+    test_governor_restores_with_headroom_and_holds_in_band()
+    print(">>> Governor Tests PASSED.")
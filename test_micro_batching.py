@@ -0,0 +1,70 @@
+import sys
+import os
+import numpy as np
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.services.tracking_service import FrameMicroBatcher, BatchSizeTuner
+
+def _frames(n, sampled_every=1):
+    buf = np.empty((4, 4, 3), dtype=np.uint8) # Upstream reader recycles one buffer
+    for i in range(n):
+        buf.fill(i)
+        yield i, i / 30.0, buf, i % sampled_every == 0
+
+def test_batches_keep_frame_order():
+    print(">>> Testing micro-batch ordering...")
+    calls = []
+    def detect_batch(frames):
+        calls.append(len(frames))
+        return [[int(f[0, 0, 0])] for f in frames] # "Detection" = frame content
+    batcher = FrameMicroBatcher(detect_batch, batch_size=4)
+    out = [(idx, int(frame[0, 0, 0]), vehicles) for idx, ts, frame, s, vehicles in batcher.run(_frames(10))]
+    print(f"Batch calls: {calls}")
+    assert [o[0] for o in out] == list(range(10))
+    assert all(idx == content == vehicles[0] for idx, content, vehicles in out), "Frames must be copied out of the recycled buffer"
+    assert calls == [4, 4, 2]
+
+def test_gated_frames_ride_along():
+    print(">>> Testing Motion Gate inside a micro-batch...")
+    seen = []
+    def detect_batch(frames):
+        seen.extend(int(f[0, 0, 0]) for f in frames)
+        return [["car"] for _ in frames]
+    gate = lambda frame, ts: int(frame[0, 0, 0]) % 3 != 1
+    batcher = FrameMicroBatcher(detect_batch, batch_size=4, gate=gate)
+    out = list(batcher.run(_frames(12)))
+    assert [o[0] for o in out] == list(range(12))
+    assert 1 not in seen and 4 not in seen, "Gated frames must skip the forward pass"
+    assert all((v == []) == (idx % 3 == 1) for idx, _, _, _, v in out)
+
+def test_single_frame_batches_skip_the_copy():
+    print(">>> Testing that batch size 1 passes the reader's buffer through...")
+    batcher = FrameMicroBatcher(lambda frames: [[int(f[0, 0, 0])] for f in frames], batch_size=1)
+    buffers, out = set(), []
+    for idx, ts, frame, s, vehicles in batcher.run(_frames(5)):
+        buffers.add(id(frame))
+        out.append((idx, int(frame[0, 0, 0]), vehicles))
+    assert len(buffers) == 1, "Every frame is the reader's own recycled buffer"
+    assert all(idx == content == vehicles[0] for idx, content, vehicles in out)
+    assert batcher._pool == [], "No frame was copied into the pool"
+    assert batcher.batches == 5
+
+def test_tuner_locks_fastest_size():
+    print(">>> Testing batch size auto-tuning...")
+    tuner = BatchSizeTuner(candidates=(1, 4, 8), trials=2)
+    per_frame = {1: 0.010, 4: 0.004, 8: 0.005}
+    tuner.record(1, 1.0) # Warmup
+    while tuner.locked is None:
+        size = tuner.batch_size
+        tuner.record(size, size * per_frame[size])
+    print(f"Tuner: {tuner.stats()}")
+    assert tuner.locked == 4
+
+if __name__ == "__main__":
+    test_batches_keep_frame_order()
+    test_gated_frames_ride_along()
+    test_single_frame_batches_skip_the_copy()
+    test_tuner_locks_fastest_size()
+    print(">>> Micro-batching Tests PASSED.")
@@ -0,0 +1,51 @@
+import sys
+import os
+import tempfile
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.services.model_service import cached_export, export_cache_path
+
+def _fake_exporter(calls):
+    def export(weights_path):
+        calls.append(weights_path)
+        produced = os.path.splitext(weights_path)[0] + ".onnx" # Where ultralytics writes it
+        with open(produced, "wb") as f:
+            f.write(b"onnx")
+        return produced
+    return export
+
+def test_export_is_cached_by_weight_hash():
+    print(">>> Testing ONNX export cache...")
+    with tempfile.TemporaryDirectory() as tmp:
+        weights = os.path.join(tmp, "yolov8n.pt")
+        with open(weights, "wb") as f:
+            f.write(b"weights-v1")
+        calls = []
+        first = cached_export(weights, _fake_exporter(calls))
+        second = cached_export(weights, _fake_exporter(calls))
+        print(f"Export: {os.path.basename(first)}, exports run: {len(calls)}")
+        assert first == second == export_cache_path(weights)
+        assert len(calls) == 1, "Second load must reuse the cached export"
+        assert os.path.dirname(first) == tmp, "Export lives next to the .pt"
+
+def test_new_weights_invalidate_export():
+    print(">>> Testing export invalidation on retrained weights...")
+    with tempfile.TemporaryDirectory() as tmp:
+        weights = os.path.join(tmp, "plates.pt")
+        with open(weights, "wb") as f:
+            f.write(b"weights-v1")
+        calls = []
+        old = cached_export(weights, _fake_exporter(calls))
+        with open(weights, "wb") as f:
+            f.write(b"weights-v2")
+        new = cached_export(weights, _fake_exporter(calls))
+        assert new != old and len(calls) == 2
+        assert not os.path.exists(old), "Stale export of the old weights is removed"
+        assert os.path.exists(new)
+
+if __name__ == "__main__":
+    test_export_is_cached_by_weight_hash()
+    test_new_weights_invalidate_export()
+    print(">>> Model Backend Tests PASSED.")
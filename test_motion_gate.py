@@ -0,0 +1,52 @@
+import sys
+import os
+import cv2
+import numpy as np
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.services.motion_service import MotionGateAgent
+
+def _frame(car_x=None):
+    frame = np.full((360, 640, 3), 90, dtype=np.uint8)
+    cv2.line(frame, (0, 200), (640, 200), (200, 200, 200), 3) # Static lane marking
+    if car_x is not None:
+        cv2.rectangle(frame, (car_x, 150), (car_x + 80, 190), (0, 0, 255), -1)
+    return frame
+
+def test_idle_scene_is_gated():
+    print(">>> Testing Motion Gate on an empty road...")
+    gate = MotionGateAgent()
+    fps = 10.0
+    decisions = [gate.check(_frame(), i / fps) for i in range(60)]
+    stats = gate.stats()
+    print(f"Stats: {stats}")
+    assert all(decisions[:10]), "Warmup frames must pass through"
+    assert not any(decisions[40:]), "Static scene should be gated after the hangover"
+    assert gate.stride_scale == gate.idle_stride
+
+def test_motion_reopens_gate():
+    print(">>> Testing Motion Gate when a vehicle enters...")
+    gate = MotionGateAgent()
+    fps = 10.0
+    for i in range(60): gate.check(_frame(), i / fps)
+    assert not gate.active
+    opened = gate.check(_frame(car_x=100), 6.0)
+    assert opened and gate.stride_scale == 1, "Moving vehicle must re-enable detection at full rate"
+
+def test_motion_outside_roi_is_ignored():
+    print(">>> Testing Motion Gate ROI restriction...")
+    roi = np.zeros((360, 640), dtype=np.uint8)
+    roi[:, 320:] = 255 # Only the right half matters
+    gate = MotionGateAgent(roi_mask=roi)
+    fps = 10.0
+    for i in range(60): gate.check(_frame(), i / fps)
+    decisions = [gate.check(_frame(car_x=20 + i * 5), 6.0 + i / fps) for i in range(20)]
+    assert not any(decisions), "Motion in the masked-out half must not open the gate"
+
+if __name__ == "__main__":
+    test_idle_scene_is_gated()
+    test_motion_reopens_gate()
+    test_motion_outside_roi_is_ignored()
+    print(">>> Motion Gate Tests PASSED.")
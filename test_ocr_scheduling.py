@@ -0,0 +1,155 @@
+import sys
+import os
+import time
+import numpy as np
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.services.ocr_service import OCRScheduler, OCRQueue, PlateOCRCache, pad_batch, plate_phash, plate_quality
+
+def plate(h: int, sharp: bool = True, seed: int = 0) -> np.ndarray:
+    """Synthetic plate crop: random texture is sharp, a flat grey crop has no edges."""
+    if not sharp:
+        return np.full((h, h * 4, 3), 128, dtype=np.uint8)
+    return np.random.default_rng(seed).integers(0, 255, (h, h * 4, 3), dtype=np.uint8)
+
+def approaching_track(scheduler, sizes):
+    """A vehicle driving towards the camera: plate crops grow every sighting. Returns the crops read."""
+    track = scheduler.track()
+    read = []
+    for i, h in enumerate(sizes):
+        cand = track.offer(plate(h, seed=i))
+        if cand is not None:
+            read.append(cand.crop.shape[0])
+            track.record(cand, "MH12AB1234")
+    return track, read
+
+def test_quality_ranks_size_and_sharpness():
+    print(">>> Testing plate quality score...")
+    assert plate_quality(plate(40)) > plate_quality(plate(20))
+    assert plate_quality(plate(40, sharp=False)) == 0.0
+    assert plate_quality(np.zeros((0, 0, 3), dtype=np.uint8)) == 0.0
+
+def test_ocr_runs_only_on_improving_candidates_within_budget():
+    print(">>> Testing OCR schedule on an approaching vehicle (200 sightings)...")
+    scheduler = OCRScheduler(top_k=3, budget=4, min_height=12, min_gain=1.15, sharpness_ref=100.0)
+    track, read = approaching_track(scheduler, [12 + i // 4 for i in range(200)])
+    print(f"Immediate reads at plate heights {read}")
+    assert 1 <= len(read) <= 3, "One read is held back for finalization"
+    assert read == sorted(read)
+    assert len(track.candidates) == 3 and all(c.crop.shape[0] == 61 for c in track.candidates), "Top-K keeps the largest crops"
+
+    final = track.finalize()
+    assert final is not None and final.crop.shape[0] == 61, "Finalize reads the best crop nobody read yet"
+    assert track.finalize() is None and track.candidates == []
+    assert track.offer(plate(80)) is None, "No OCR once the track went to the Jury"
+    stats = scheduler.stats()
+    assert stats["ocr_reads"] == len(read) + 1 <= 4
+    assert stats["ocr_saved_pct"] > 95
+
+def test_small_and_worse_crops_never_read():
+    print(">>> Testing minimum plate height and no re-reads of worse crops...")
+    scheduler = OCRScheduler(top_k=2, budget=4, min_height=16, min_gain=1.15, sharpness_ref=100.0)
+    track = scheduler.track()
+    assert track.offer(plate(10)) is None
+    assert scheduler.stats()["too_small"] == 1
+    first = track.offer(plate(40))
+    assert first is not None
+    track.record(first, "KA01MJ2022")
+    assert track.offer(plate(30)) is None
+    assert track.offer(plate(42)) is None, "Within min_gain of the best read"
+    assert track.offer(plate(80, sharp=False)) is None
+    assert track.finalize() is not None, "42px crop is better than the one read"
+
+def test_failed_read_does_not_raise_the_bar():
+    print(">>> Testing that a crop without text keeps later crops eligible...")
+    scheduler = OCRScheduler(top_k=3, budget=3, min_height=12, min_gain=1.15, sharpness_ref=100.0)
+    track = scheduler.track()
+    cand = track.offer(plate(40))
+    track.record(cand, None)
+    assert track.offer(plate(30, seed=1)) is not None
+    assert track.offer(plate(50, seed=2)) is None, "Budget: last read is reserved for finalize"
+    assert track.finalize().crop.shape[0] == 50
+
+def test_pad_batch_common_shape():
+    print(">>> Testing crop padding for batched OCR...")
+    crops = [plate(20), plate(32, seed=1), np.full((10, 90, 3), 200, dtype=np.uint8)]
+    padded = pad_batch(crops)
+    assert {p.shape for p in padded} == {(32, 128, 3)}
+    assert (padded[0][:20, :80] == crops[0]).all(), "Original pixels stay top-left"
+    assert (padded[2] == 200).all(), "Padding uses the crop's own mean colour"
+
+def test_ocr_queue_batches_and_routes_results():
+    print(">>> Testing OCR queue batching and result routing...")
+    calls = []
+    def recognize(crops):
+        calls.append(len(crops))
+        time.sleep(0.005)
+        return [(f"T{int(c[0, 0, 0])}", 0.9, None, "NONE") for c in crops]
+
+    queue = OCRQueue(recognize, batch_size=4, max_wait_sec=0.02)
+    tracks = {tid: {} for tid in range(10)}
+    futures = []
+    for tid in tracks:
+        crop = np.full((20, 80, 3), tid, dtype=np.uint8)
+        futures.append(queue.submit(crop, lambda res, data=tracks[tid]: data.update(text=res[0])))
+    results = [f.result(timeout=2) for f in futures]
+    queue.close()
+
+    assert [r[0] for r in results] == [f"T{tid}" for tid in range(10)]
+    assert all(data["text"] == f"T{tid}" for tid, data in tracks.items()), "Callbacks land on their own track"
+    assert sum(calls) == 10 and max(calls) <= 4 and len(calls) < 10
+    stats = queue.stats()
+    print(f"Batches {calls}, stats {stats}")
+    assert stats["batches"] == len(calls) and stats["crops"] == 10
+    assert 0 < stats["avg_batch_fill"] <= 1.0
+    assert stats["queue_latency_ms_p95"] >= stats["queue_latency_ms_avg"] > 0
+
+def test_ocr_queue_partial_batch_after_max_wait():
+    print(">>> Testing that a lone crop is not stuck waiting for a full batch...")
+    queue = OCRQueue(lambda crops: [len(crops)] * len(crops), batch_size=32, max_wait_sec=0.01)
+    assert queue.submit(plate(20)).result(timeout=1) == 1
+    queue.close()
+    assert not queue._thread.is_alive()
+
+def test_phash_near_duplicates():
+    print(">>> Testing perceptual hash of plate crops...")
+    crop = plate(40)
+    noisy = np.clip(crop.astype(np.int16) + np.random.default_rng(9).integers(-4, 5, crop.shape), 0, 255).astype(np.uint8)
+    distance = lambda a, b: bin(plate_phash(a) ^ plate_phash(b)).count("1")
+    assert distance(crop, noisy) <= 4
+    assert distance(crop, plate(40, seed=5)) > 16
+
+def test_ocr_cache_scoped_per_track():
+    print(">>> Testing OCR cache hits, track scope and LRU bound...")
+    cache = PlateOCRCache(max_entries=3, max_hamming=4)
+    crop = plate(40)
+    read = [("MH12AB1234", 0.91)]
+    key = cache.key(7, crop)
+    assert cache.get(key) is None
+    cache.put(key, read)
+
+    brighter = np.clip(crop.astype(np.int16) + 3, 0, 255).astype(np.uint8)
+    assert cache.get(cache.key(7, crop)) == read
+    assert cache.get(cache.key(7, brighter)) == read, "Near-duplicate of the same track"
+    assert cache.get(cache.key(8, crop)) is None, "Another track never sees this read"
+    assert cache.get(cache.key(7, plate(80))) is None, "Different size bucket"
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["near_duplicate_hits"] <= 1 and stats["hit_rate"] == 0.4
+
+    for tid in range(3):
+        cache.put(cache.key(tid, plate(40, seed=tid + 1)), [])
+    assert cache.stats()["entries"] == 3
+    assert cache.get(cache.key(7, crop)) is None, "Least recently used entry evicted"
+
+if __name__ == "__main__":
+    test_quality_ranks_size_and_sharpness()
+    test_ocr_runs_only_on_improving_candidates_within_budget()
+    test_small_and_worse_crops_never_read()
+    test_failed_read_does_not_raise_the_bar()
+    test_pad_batch_common_shape()
+    test_ocr_queue_batches_and_routes_results()
+    test_ocr_queue_partial_batch_after_max_wait()
+    test_phash_near_duplicates()
+    test_ocr_cache_scoped_per_track()
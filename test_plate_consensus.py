@@ -0,0 +1,82 @@
+import sys
+import os
+import re
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.services.consensus_service import PlateConsensus, align
+
+def indian_format(text):
+    """Simplified private-series format for the tests (state, district, series, 4 digits)."""
+    return re.match(r"^[A-Z]{2}[0-9]{2}[A-Z]{1,2}[0-9]{4}$", text) is not None
+
+def test_alignment_handles_dropped_and_extra_characters():
+    print(">>> Testing OCR read alignment...")
+    assert align("MH12AB123", "MH12AB1234") == list("MH12AB123") + [None]
+    assert align("MH122AB1234", "MH12AB1234") == list("MH12AB1234")
+    assert align("MHI2AB1234", "MH12AB1234")[2] == "I", "Confusable characters align as substitutions"
+
+def test_confusions_pool_and_resolve_to_format():
+    print(">>> Testing character voting with 0/O, 8/B, 1/I confusions...")
+    consensus = PlateConsensus(indian_format, min_reads=2, min_conf=0.85)
+    for text, conf in [("MH12AB1234", 0.70), ("MH12A81234", 0.80), ("MHI2AB1234", 0.75), ("MH12AB123", 0.60)]:
+        consensus.add(text, conf)
+    text, conf, confident = consensus.fuse()
+    print(f"Fused {text} ({conf:.3f})")
+    assert text == "MH12AB1234" and confident
+
+    consensus = PlateConsensus(indian_format)
+    consensus.add("DLO8CA5O3O", 0.8)
+    consensus.add("DL08CA5030", 0.7)
+    text, _, _ = consensus.fuse()
+    assert text == "DL08CA5030", "Letter/digit member picked so the plate fits the format"
+
+    def counting(text):
+        counting.calls += 1
+        return False
+    counting.calls = 0
+    consensus = PlateConsensus(counting)
+    consensus.add("O" * 11, 0.9) # Each O may stay a letter or be a 0: 2 ** 11 plates
+    assert not consensus.fuse()[2]
+    assert counting.calls == 1, "Too many combinations: only the voted plate is checked"
+
+def test_single_or_disputed_reads_go_to_cloud():
+    print(">>> Testing when the cloud recheck is still needed...")
+    single = PlateConsensus(indian_format)
+    single.add("KA01MJ2022", 0.95)
+    assert single.fuse() == ("KA01MJ2022", 0.95, False), "One read is no consensus"
+
+    duplicate = PlateConsensus(indian_format)
+    duplicate.add("KA01MJ2022", 0.95)
+    duplicate.add("KA01MJ2022", 0.95) # Same engine read served from the OCR cache
+    assert len(duplicate.reads) == 1 and not duplicate.fuse()[2]
+
+    disputed = PlateConsensus(indian_format)
+    for text, conf in [("KA01MJ2022", 0.9), ("KA01MJ2922", 0.85), ("KA01MJ2022", 0.6)]:
+        disputed.add(text, conf)
+    text, conf, confident = disputed.fuse()
+    assert text == "KA01MJ2022" and conf < 0.85 and not confident
+
+    truncated = PlateConsensus(indian_format)
+    for text, conf in [("MH12AB1234", 0.95), ("MH12AB123", 0.95), ("H12AB1234", 0.9)]:
+        truncated.add(text, conf)
+    text, conf, confident = truncated.fuse()
+    print(f"Truncated reads fused to {text} ({conf:.3f}, confident={confident})")
+    assert text == "MH12AB1234", "Each dropped character is covered by the other reads"
+
+    spurious = PlateConsensus(indian_format)
+    for text, conf in [("MH12AB1234", 0.9), ("MH12AB1234", 0.8), ("MH12AB12345", 0.6)]:
+        spurious.add(text, conf)
+    assert spurious.fuse()[0] == "MH12AB1234", "An extra character only one read has is not part of the plate"
+
+    invalid = PlateConsensus(indian_format)
+    invalid.add("STOPHERE", 0.9)
+    invalid.add("STOPHERE", 0.8)
+    assert not invalid.fuse()[2], "Confident but not a plate"
+    assert PlateConsensus(indian_format).fuse() == (None, 0.0, False)
+
+if __name__ == "__main__":
+    test_alignment_handles_dropped_and_extra_characters()
+    test_confusions_pool_and_resolve_to_format()
+    test_single_or_disputed_reads_go_to_cloud()
@@ -0,0 +1,103 @@
+import sys
+import os
+import re
+import json
+import time
+import tempfile
+import numpy as np
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.core.config import settings
+from app.services.plate_grammar_service import PlateGrammar, PLATE_FORMATS, compile_format, load_grammar, plate_grammar
+
+def _legacy_indian_format(text):
+    """The pre-v5.1 AIService._is_valid_indian_format, as reference."""
+    if not text or len(text) < 4: return False
+    state_codes = ['AN','AP','AR','AS','BR','CH','CT','DN','DD','DL','GA','GJ','HR','HP','JK','JH','KA','KL','LD','MP','MH','MN','ML','MZ','NL','OD','OR','PY','PB','RJ','SK','TN','TG','TS','TR','UP','UK','UA','WB']
+    if text[:2].upper() not in state_codes:
+        if re.match(r"^[0-9]{2}BH", text):
+             return re.match(r"^[0-9]{2}BH[0-9]{4}[A-Z]{1,2}$", text) is not None
+        return False
+    return bool(re.match(r"^[A-Z]{2}[0-9]{1,2}[A-Z]{1,3}[0-9]{1,4}$", text) or re.match(r"^[A-Z]{2}[0-9]{1,2}[0-9]{4}$", text))
+
+def _random_candidates(n, seed=0):
+    rng = np.random.default_rng(seed)
+    alphabet = np.array(list("0123456789ABDHKLMOPSTUWZ"))
+    prefixes = ["MH", "KA", "DL", "XX", "22BH", "TN0", ""]
+    return [prefixes[rng.integers(len(prefixes))] + "".join(rng.choice(alphabet, rng.integers(2, 10))) for _ in range(n)]
+
+def test_grammar_matches_legacy_indian_format():
+    print(">>> Testing compiled grammar against the legacy Indian format check...")
+    known = ["MH12AB1234", "KA01MJ2022", "DL8CAF5030", "TN091234", "22BH1234AA", "22BH12345", "XX12AB1234", "MH12", "", "MH12AB12345"]
+    candidates = known + _random_candidates(20000)
+    assert plate_grammar.validate(candidates) == [_legacy_indian_format(t) for t in candidates]
+    assert plate_grammar.region_of("22BH1234AA") == "IN-BH" and plate_grammar.region_of("MH12AB1234") == "IN"
+
+def test_format_declarations_compile():
+    print(">>> Testing format declaration compiler...")
+    assert compile_format("D{2} BH D{4} L{1,2}") == "[0-9]{2}BH[0-9]{4}[A-Z]{1,2}"
+    assert compile_format("R D L{3}", ["AB", "ABC"]) == "(?:ABC|AB)[0-9][A-Z]{3}"
+    try:
+        compile_format("R D{4}")
+        assert False, "R without codes must be rejected"
+    except ValueError:
+        pass
+
+def test_undeclared_codes_rejected():
+    print(">>> Testing that only declared state codes match...")
+    for text in ["ZZ12AB1234", "QQ091234", "MX12AB1234"]:
+        assert not plate_grammar.is_valid(text) and plate_grammar.region_of(text) is None
+    assert plate_grammar.correct("ZZ12AB1234", 2) == [], "No swap turns ZZ into a state code"
+    grammar = PlateGrammar({"T": {"codes": ["AB"], "formats": ["R D{4}"]}})
+    assert grammar.validate(["AB1234", "AC1234"]) == [True, False]
+
+def test_corrections_are_format_aware():
+    print(">>> Testing confusable-character corrections...")
+    assert plate_grammar.correct("MH12AB1234") == [("MH12AB1234", 0, "IN")]
+    assert plate_grammar.correct("MHI2AB1234", 1) == [("MH12AB1234", 1, "IN")]
+    assert plate_grammar.correct("0L8CA5030", 2) == [("DL8CA5030", 1, "IN")], "Only the state slot needs a letter"
+    assert plate_grammar.correct("ZZBH1234AB", 1) == []
+    assert plate_grammar.correct("ZZBH1234AB", 2) == [("22BH1234AB", 2, "IN-BH")]
+    assert plate_grammar.correct("STOPHERE", 2) == []
+
+def test_extra_regions_from_declarations():
+    print(">>> Testing region declarations from PLATE_FORMATS_PATH...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "plate_formats.json")
+        with open(path, "w") as f:
+            json.dump({"LK": {"codes": ["WP", "CP", "SP"], "formats": ["R L{2,3} D{4}"]}}, f)
+        old = settings.PLATE_FORMATS_PATH, settings.PLATE_REGIONS
+        settings.PLATE_FORMATS_PATH, settings.PLATE_REGIONS = path, "IN,LK"
+        try:
+            grammar = load_grammar()
+        finally:
+            settings.PLATE_FORMATS_PATH, settings.PLATE_REGIONS = old
+    assert grammar.validate(["WPCAB1234", "MH12AB1234", "22BH1234AA", "XPCAB1234"]) == [True, True, False, False]
+    assert grammar.region_of("WPCAB1234") == "LK"
+    try:
+        PlateGrammar(PLATE_FORMATS, ["IN", "MARS"])
+        assert False, "Unknown regions must be rejected"
+    except ValueError:
+        pass
+
+def test_validation_throughput():
+    print(">>> Testing validation cost per candidate...")
+    candidates = _random_candidates(50000, seed=1)
+    t0 = time.perf_counter()
+    plate_grammar.validate(candidates)
+    grammar_us = (time.perf_counter() - t0) / len(candidates) * 1e6
+    t0 = time.perf_counter()
+    [_legacy_indian_format(t) for t in candidates]
+    legacy_us = (time.perf_counter() - t0) / len(candidates) * 1e6
+    print(f"Grammar {grammar_us:.2f} us/candidate, legacy {legacy_us:.2f} us/candidate")
+    assert grammar_us < legacy_us
+
+if __name__ == "__main__":
+    test_grammar_matches_legacy_indian_format()
+    test_format_declarations_compile()
+    test_undeclared_codes_rejected()
+    test_corrections_are_format_aware()
+    test_extra_regions_from_declarations()
+    test_validation_throughput()
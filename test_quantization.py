@@ -0,0 +1,82 @@
+import sys
+import os
+import tempfile
+import cv2
+import numpy as np
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.core.config import settings
+from app.services.quantization_service import (
+    map50, recall50, letterbox, sample_frames, stored_videos, write_report, is_approved
+)
+
+def _write_clip(path, n_frames=40):
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (160, 120))
+    for i in range(n_frames):
+        out.write(np.full((120, 160, 3), i * 5, dtype=np.uint8))
+    out.release()
+
+def test_map_and_recall_drift():
+    print(">>> Testing mAP / recall drift metrics...")
+    ref = [np.array([[10, 10, 50, 50, 0.9, 2], [100, 100, 160, 160, 0.8, 7]], dtype=np.float32),
+           np.array([[20, 20, 60, 60, 0.7, 2]], dtype=np.float32)]
+    assert map50(ref, ref) == 1.0, "Identical detections: no drift"
+
+    shifted = [ref[0] + np.array([2, 2, 2, 2, 0, 0], dtype=np.float32), ref[1]]
+    assert map50(shifted, ref) == 1.0, "Small jitter still matches at IoU 0.5"
+
+    missing = [ref[0][:1], ref[1]] # Quantized model lost the truck
+    print(f"mAP with a missed truck: {map50(missing, ref):.3f}")
+    assert map50(missing, ref) == 0.5
+    wrong_class = [ref[0][:, :].copy(), ref[1]]
+    wrong_class[0][0, 5] = 3
+    assert map50(wrong_class, ref) < 1.0, "Class changes count as misses"
+
+    assert recall50(ref, ref) == 1.0
+    assert abs(recall50(missing, ref) - 2 / 3) < 1e-9
+    assert recall50([np.empty((0, 6))], [np.empty((0, 6))]) == 1.0
+
+def test_letterbox_matches_export_input():
+    print(">>> Testing calibration preprocessing...")
+    x = letterbox(np.zeros((720, 1280, 3), dtype=np.uint8), 640)
+    assert x.shape == (1, 3, 640, 640) and x.dtype == np.float32
+    assert abs(x[0, 0, 0, 0] - 114 / 255.0) < 1e-6, "Padding uses the ultralytics grey"
+    assert x[0, 0, 320, 320] == 0.0
+
+def test_frame_sampling_and_gate():
+    print(">>> Testing stored-video sampling and the INT8 approval gate...")
+    old_storage = settings.STORAGE_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.STORAGE_PATH = tmp
+        try:
+            _write_clip(os.path.join(tmp, "1_gate.avi"))
+            _write_clip(os.path.join(tmp, "out_1_gate.avi")) # Rendered output, not source footage
+            videos = stored_videos()
+            assert [os.path.basename(v) for v in videos] == ["1_gate.avi"]
+            calib = sample_frames(videos, 4, phase=0.5)
+            evals = sample_frames(videos, 4, phase=0.25)
+            assert len(calib) == len(evals) == 4
+            assert all(not np.array_equal(c, e) for c, e in zip(calib, evals)), "Calibration and eval frames differ"
+            assert all(np.array_equal(a, b) for a, b in zip(calib, sample_frames(videos, 4, phase=0.5))), "Deterministic"
+
+            weights = os.path.join(tmp, "yolov8n.pt")
+            with open(weights, "wb") as f:
+                f.write(b"weights-v1")
+            assert not is_approved(weights), "Never approved without a harness run"
+            assert not write_report(weights, {"map_drift": 0.10})["approved"]
+            assert not is_approved(weights)
+            assert write_report(weights, {"map_drift": 0.005, "plate_recall_drift": 0.01})["approved"]
+            assert is_approved(weights)
+            with open(weights, "wb") as f:
+                f.write(b"weights-v2")
+            assert not is_approved(weights), "Retrained weights need a new harness run"
+        finally:
+            settings.STORAGE_PATH = old_storage
+
+if __name__ == "__main__":
+    test_map_and_recall_drift()
+    test_letterbox_matches_export_input()
+    test_frame_sampling_and_gate()
+    print(">>> Quantization Tests PASSED.")
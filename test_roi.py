@@ -2,12 +2,14 @@ import cv2
 import numpy as np
 import os
 import sys
+import json
+import tempfile
 
 # Add local app to path
 sys.path.append(os.getcwd())
 
-from app.services.ai_service import AIService
 from app.core.config import settings
+from app.services.roi_service import ROIRegion, ROIAgent, roi_manager
 
 def test_roi_mask():
     print(">>> Testing ROI Mask Logic (v2.3.5)...")
@@ -21,9 +23,9 @@ def test_roi_mask():
     cv2.imwrite(mask_path, mask)
     print(f"Created dummy mask at {mask_path}")
 
-    # 2. Initialize AIService
-    ai = AIService()
-    ai._load_roi_mask() # Reload to pick up new file
+    # 2. Resolve the default ROI (v5.1: ROI Agent, resolved per DetectionSession)
+    roi_manager.reload() # Reload to pick up new file
+    roi = roi_manager.region_for(None)
     
     # 3. Create a dummy frame
     frame = np.zeros((1000, 1000, 3), dtype=np.uint8)
@@ -43,28 +45,83 @@ def test_roi_mask():
     # Or just mock the vehicle_model.track return
     
     print(f"Applying mask to boxes...")
-    # Manually run the filtering logic from detect_vehicles
-    h, w = frame.shape[:2]
+    # Run the vectorized filter used by DetectionSession._apply_roi
     boxes = [box_keep, box_filter]
-    
-    filtered = []
-    for box in boxes:
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-        if 0 <= cx < w and 0 <= cy < h:
-            if ai.roi_mask[cy, cx] > 0:
-                filtered.append(box)
+    keep = roi.contains(np.array([box.xyxy[0] for box in boxes]), frame.shape)
+    filtered = [box for box, k in zip(boxes, keep) if k]
                 
     print(f"Boxes before: {len(boxes)}, After: {len(filtered)}")
     
-    if len(filtered) == 1 and filtered[0] == box_keep:
-        print(">>> ROI Mask Verification PASSED.")
-    else:
-        print(f">>> ROI Mask Verification FAILED. Kept {len(filtered)} boxes.")
+    try:
+        if len(filtered) == 1 and filtered[0] == box_keep:
+            print(">>> ROI Mask Verification PASSED.")
+        else:
+            print(f">>> ROI Mask Verification FAILED. Kept {len(filtered)} boxes.")
+        assert len(filtered) == 1 and filtered[0] == box_keep
+    finally:
+        # Cleanup
+        if os.path.exists(mask_path):
+            os.remove(mask_path)
+        roi_manager.reload()
+
+def _loop_filter(mask, xyxy):
+    """The pre-v5.1 per-box loop, as reference."""
+    h, w = mask.shape
+    keep = []
+    for x1, y1, x2, y2 in xyxy.astype(int):
+        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+        keep.append(0 <= cx < w and 0 <= cy < h and mask[cy, cx] > 0)
+    return np.array(keep)
+
+def test_vectorized_filter_matches_loop():
+    print(">>> Testing vectorized ROI filter against the per-box loop...")
+    mask = np.zeros((360, 640), dtype=np.uint8)
+    mask[100:300, 200:500] = 255
+    region = ROIRegion("cam", mask=mask)
+    rng = np.random.default_rng(0)
+    xy = rng.integers(-50, 700, (500, 2))
+    xyxy = np.concatenate([xy, xy + rng.integers(5, 80, (500, 2))], axis=1).astype(np.float32)
+    assert (region.contains(xyxy, (360, 640)) == _loop_filter(mask, xyxy)).all()
+
+def test_mask_cached_per_resolution():
+    print(">>> Testing per-resolution mask cache...")
+    mask = np.zeros((540, 960), dtype=np.uint8)
+    mask[:, 480:] = 255
+    region = ROIRegion("cam", mask=mask)
+    full_hd = region.mask_for((1080, 1920))
+    small = region.mask_for((360, 640))
+    assert full_hd.shape == (1080, 1920) and small.shape == (360, 640)
+    assert region.mask_for((1080, 1920)) is full_hd, "Switching resolutions must not rebuild the mask"
+    assert region.rect_for((1080, 1920)) == (960, 0, 1920, 1080)
+
+def test_polygon_roi_per_camera():
+    print(">>> Testing polygon ROIs per camera...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "roi_polygons.json")
+        with open(path, "w") as f:
+            json.dump({
+                "gate_a": {"size": [1920, 1080], "polygons": [[[0, 540], [1920, 540], [1920, 1080], [0, 1080]]]},
+                "gate_b": {"polygons": [[[0.5, 0], [1, 0], [1, 1], [0.5, 1]]]}, # Normalized
+            }, f)
+        old_poly, old_mask = settings.ROI_POLYGONS_PATH, settings.ROI_MASK_PATH
+        settings.ROI_POLYGONS_PATH, settings.ROI_MASK_PATH = path, os.path.join(tmp, "missing.png")
+        try:
+            agent = ROIAgent()
+            a, b = agent.region_for("gate_a"), agent.region_for("gate_b")
+            assert agent.region_for("gate_a") is a, "Regions are built once"
+            assert agent.region_for("unknown") is None, "No polygon and no mask: full frame"
+        finally:
+            settings.ROI_POLYGONS_PATH, settings.ROI_MASK_PATH = old_poly, old_mask
 
-    # Cleanup
-    if os.path.exists(mask_path):
-        os.remove(mask_path)
+    boxes = np.array([[100, 100, 200, 200], [100, 800, 200, 900], [1500, 100, 1600, 200]], dtype=np.float32)
+    assert a.contains(boxes, (1080, 1920)).tolist() == [False, True, False]
+    assert b.contains(boxes, (1080, 1920)).tolist() == [False, False, True]
+    # Same polygon at 720p: rasterized at that size, not resampled
+    assert a.contains(boxes * (2 / 3), (720, 1280)).tolist() == [False, True, False]
+    assert a.rect_for((720, 1280)) == (0, 360, 1280, 720)
 
 if __name__ == "__main__":
     test_roi_mask()
+    test_vectorized_filter_matches_loop()
+    test_mask_cached_per_resolution()
+    test_polygon_roi_per_camera()
@@ -0,0 +1,154 @@
+import sys
+import os
+import numpy as np
+
+# Add local app to path
+sys.path.append(os.getcwd())
+
+from app.services.slicing_service import slice_grid, nms, SliceEngine, SlicingPlanner
+
+class FakeBoxes:
+    def __init__(self, data): self.data = data
+    def cpu(self): return self
+    def numpy(self): return self
+
+class FakeResult:
+    def __init__(self, data): self.boxes = FakeBoxes(np.asarray(data, dtype=np.float32).reshape(-1, 6))
+
+class FakeModel:
+    """Sees one 40x40 car at frame pixels (700, 100) wherever it lands in an image."""
+    def __init__(self, frame_origin):
+        self.frame_origin = frame_origin
+        self.calls = []
+
+    def predict(self, images, **kwargs):
+        self.calls.append(len(images))
+        results = []
+        for img in images:
+            ox, oy = self.frame_origin(img)
+            x, y = 700 - ox, 100 - oy
+            h, w = img.shape[:2]
+            if 0 <= x and x + 40 <= w and 0 <= y and y + 40 <= h:
+                results.append(FakeResult([[x, y, x + 40, y + 40, 0.9, 2]]))
+            else:
+                results.append(FakeResult([]))
+        return results
+
+def test_grid_covers_frame():
+    print(">>> Testing slice grid...")
+    grid = slice_grid(1920, 1080, 640, 640, 0.2)
+    print(f"Tiles: {len(grid)}")
+    assert grid[:, 0].min() == 0 and grid[:, 2].max() == 1920
+    assert grid[:, 1].min() == 0 and grid[:, 3].max() == 1080
+    assert ((grid[:, 2] - grid[:, 0]) == 640).all()
+
+def test_nms_merges_truncated_tile_boxes():
+    print(">>> Testing vectorized NMS (IOS)...")
+    dets = np.array([
+        [100, 100, 200, 200, 0.9, 2],
+        [100, 100, 150, 200, 0.6, 2], # Same car cut at a tile edge
+        [400, 400, 450, 450, 0.8, 3],
+    ], dtype=np.float32)
+    keep = nms(dets, 0.5)
+    assert sorted(keep.tolist()) == [0, 2]
+    assert nms(dets, 0.5, metric="IOU").tolist() == [0, 2, 1], "Plain IoU keeps the truncated box"
+
+def test_engine_single_pass_frame_coordinates():
+    print(">>> Testing slice engine (one batched pass, frame coordinates)...")
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    origins = {}
+    grid = slice_grid(1920, 1080, 640, 640, 0.2)
+    model = FakeModel(lambda img: origins.get(img.__array_interface__['data'][0], (0, 0)))
+    for x1, y1, x2, y2 in grid:
+        origins[frame[y1:y2, x1:x2].__array_interface__['data'][0]] = (x1, y1)
+    engine = SliceEngine(model, 640, 640, 0.2)
+    dets = engine.predict_batch([frame], conf=0.25)[0]
+    print(f"Merged: {dets.tolist()}, calls: {model.calls}")
+    assert model.calls == [len(grid) + 1], "All tiles + full frame in one forward pass"
+    assert dets.shape == (1, 6) and dets[0, :4].tolist() == [700, 100, 740, 140]
+
+def test_planner_tiles_only_far_field():
+    print(">>> Testing perspective-aware slicing planner...")
+    planner = SlicingPlanner((1080, 1920), 640, 640, 0.2, 640, warmup_frames=10, replan_frames=100)
+    assert len(planner.tiles) == len(planner.full_grid), "Full grid until the first plan"
+    for i in range(10):
+        planner.observe(np.array([
+            [300 + i, 120, 360 + i, 160, 0.8, 2],  # Far field: 40px tall -> ~13px in the full pass
+            [800, 700, 1100, 1000, 0.9, 2],        # Near field: large, full pass handles it
+        ], dtype=np.float32))
+    print(f"Band: {planner.band}, tiles: {len(planner.tiles)}/{len(planner.full_grid)}")
+    assert planner.replans == 1
+    assert len(planner.tiles) < len(planner.full_grid)
+    assert planner.tiles[:, 1].min() <= 120 and planner.tiles[:, 3].max() >= 160
+    assert planner.tiles[:, 3].max() < 700, "Near field must not be tiled"
+
+def test_planner_respects_roi_and_empty_far_field():
+    print(">>> Testing planner ROI restriction...")
+    roi = np.zeros((540, 960), dtype=np.uint8) # Half-resolution mask, like a stored ROI png
+    roi[:, 480:] = 255
+    planner = SlicingPlanner((1080, 1920), 640, 640, 0.2, 640, roi_mask=roi, warmup_frames=1)
+    planner.observe(np.array([[1200, 100, 1260, 140, 0.8, 2]], dtype=np.float32))
+    assert planner.tiles[:, 0].min() >= 960, "Tiles stay inside the ROI's columns"
+
+    planner = SlicingPlanner((1080, 1920), 640, 640, 0.2, 640, warmup_frames=1)
+    planner.observe(np.array([[800, 700, 1100, 1000, 0.9, 2]], dtype=np.float32))
+    assert len(planner.tiles) == 0, "No small vehicles: full-frame pass only"
+
+def test_engine_reports_saved_tiles():
+    print(">>> Testing adaptive engine telemetry...")
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    model = FakeModel(lambda img: (0, 0))
+    engine = SliceEngine(model, 640, 640, 0.2, plan=True, planner_args={"warmup_frames": 1})
+    engine.predict_batch([frame], conf=0.25) # Warmup: full grid; the 40px car is small at 640
+    engine.predict_batch([frame], conf=0.25)
+    stats = engine.stats()
+    print(f"Stats: {stats}")
+    assert model.calls[1] < model.calls[0]
+    assert stats["tiles_per_frame"] < stats["full_grid_tiles_per_frame"]
+    assert stats["estimated_saved_sec"] >= 0 and "full@1920x1080" in stats["layouts"]
+
+def test_empty_band_probes_full_grid_before_replan():
+    print(">>> Testing that an empty far field keeps probing for small vehicles...")
+    planner = SlicingPlanner((1080, 1920), 640, 640, 0.2, 640, warmup_frames=1, replan_frames=5)
+    near = np.array([[800, 700, 1100, 1000, 0.9, 2]], dtype=np.float32)
+    far = np.array([[300, 120, 360, 160, 0.8, 2]], dtype=np.float32)
+    assert len(planner.next_tiles()) == len(planner.full_grid)
+    planner.observe(near)
+    assert len(planner.tiles) == 0, "Warmup saw no small vehicles"
+
+    layouts = []
+    for _ in range(5):
+        tiles = planner.next_tiles()
+        layouts.append(len(tiles))
+        # The far-field car only becomes detectable when tiles cover it
+        planner.observe(np.concatenate([near, far]) if len(tiles) else near)
+    print(f"Tiles per frame: {layouts}, band: {planner.band}")
+    assert layouts == [0, 0, 0, 0, len(planner.full_grid)], "One full-grid frame per replan period"
+    assert planner.probes == 1 and planner.replans == 2
+    assert 0 < len(planner.tiles) < len(planner.full_grid) and planner.band[0] <= 120
+
+def test_planners_are_per_camera():
+    print(">>> Testing that cameras sharing a resolution learn their own layouts...")
+    planners = {}
+    args = {"warmup_frames": 1}
+    cam_a = SliceEngine(None, 640, 640, 0.2, plan=True, planner_args=args, planners=planners, scope="cam-a")
+    cam_b = SliceEngine(None, 640, 640, 0.2, plan=True, planner_args=args, planners=planners, scope="cam-b")
+    shape = (1080, 1920, 3)
+    cam_a.planner_for(shape).observe(np.array([[300, 120, 360, 160, 0.8, 2]], dtype=np.float32)) # Distant car
+    cam_b.planner_for(shape).observe(np.array([[800, 700, 1100, 1000, 0.9, 2]], dtype=np.float32)) # Near only
+    a, b = cam_a.planner_for(shape), cam_b.planner_for(shape)
+    print(f"cam-a band {a.band} ({len(a.tiles)} tiles), cam-b band {b.band} ({len(b.tiles)} tiles)")
+    assert a is not b and len(planners) == 2
+    assert len(a.tiles) > 0 and len(b.tiles) == 0
+    assert list(cam_a.stats()["layouts"]) == ["full@1920x1080"], "Stats cover the engine's own camera"
+
+if __name__ == "__main__":
+    test_grid_covers_frame()
+    test_nms_merges_truncated_tile_boxes()
+    test_engine_single_pass_frame_coordinates()
+    test_planner_tiles_only_far_field()
+    test_planner_respects_roi_and_empty_far_field()
+    test_empty_band_probes_full_grid_before_replan()
+    test_engine_reports_saved_tiles()
+    test_planners_are_per_camera()
+    print(">>> Slicing Tests PASSED.")